@@ -0,0 +1,157 @@
+"""
+Per-user activity counters
+Single-row analytics reads backed by counters bumped on every write
+"""
+
+from datetime import datetime, time as dt_time
+
+from django.contrib.auth.models import User
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.utils import timezone
+
+from .models import (
+    Call, Contact, Conversation, GroupMembership, Message,
+    MessageReaction, Status, StatusView, UserActivity
+)
+
+TODAY_FIELDS = ('messages_today', 'calls_today', 'statuses_today')
+
+# Counter field -> (queryset factory, lookup naming the counted user, aggregate)
+COUNTER_QUERIES = {
+    'contacts': [(lambda: Contact.objects, 'user', Count('id'))],
+    'groups': [(lambda: GroupMembership.objects, 'user', Count('id'))],
+    'conversations': [
+        (lambda: Conversation.objects, 'user1', Count('id')),
+        (lambda: Conversation.objects, 'user2', Count('id')),
+    ],
+    'messages_sent': [(lambda: Message.objects, 'sender', Count('id'))],
+    'messages_received': [(lambda: Message.objects, 'receiver', Count('id'))],
+    'reactions_given': [(lambda: MessageReaction.objects, 'user', Count('id'))],
+    'reactions_received': [(lambda: MessageReaction.objects, 'message__sender', Count('id'))],
+    'calls_made': [(lambda: Call.objects, 'caller', Count('id'))],
+    'calls_received': [(lambda: Call.objects, 'receiver', Count('id'))],
+    'call_duration': [
+        (lambda: Call.objects.filter(status='completed'), 'caller', Sum('duration')),
+        (lambda: Call.objects.filter(status='completed'), 'receiver', Sum('duration')),
+    ],
+    'statuses_posted': [(lambda: Status.objects, 'user', Count('id'))],
+    'status_views_given': [(lambda: StatusView.objects, 'user', Count('id'))],
+    'status_views_received': [(lambda: StatusView.objects, 'status__user', Count('id'))],
+}
+
+TODAY_QUERIES = {
+    'messages_today': (lambda: Message.objects, 'sender', 'created_at'),
+    'calls_today': (lambda: Call.objects, 'caller', 'started_at'),
+    'statuses_today': (lambda: Status.objects, 'user', 'created_at'),
+}
+
+
+def bump(user_id, today=(), **deltas):
+    """
+    Apply counter deltas for one user in a single UPDATE
+
+    Fields named in `today` are also incremented in the today bucket, which
+    starts over from zero the first time it is written on a new day.
+    """
+    if not user_id or not (deltas or today):
+        return
+
+    current_day = timezone.localdate()
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    for field in today:
+        updates[field] = Case(
+            When(today=current_day, then=F(field) + 1),
+            default=Value(1),
+        )
+    if today:
+        for field in TODAY_FIELDS:
+            if field not in today:
+                updates[field] = Case(
+                    When(today=current_day, then=F(field)),
+                    default=Value(0),
+                )
+        updates['today'] = current_day
+
+    updated = UserActivity.objects.filter(user_id=user_id).update(**updates)
+    # A missing row only needs creating for increments; decrements for a
+    # missing row come from cascades while the user itself is being deleted
+    if not updated and (today or any(delta > 0 for delta in deltas.values())):
+        UserActivity.objects.get_or_create(user_id=user_id)
+        UserActivity.objects.filter(user_id=user_id).update(**updates)
+
+
+def bump_many(user_ids, **deltas):
+    """Apply the same counter deltas to many users in one UPDATE (no today buckets)"""
+    user_ids = set(user_ids)
+    if not user_ids or not deltas:
+        return
+
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    UserActivity.objects.filter(user_id__in=user_ids).update(**updates)
+    if any(delta > 0 for delta in deltas.values()):
+        missing = user_ids - set(UserActivity.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        if missing:
+            UserActivity.objects.bulk_create([UserActivity(user_id=user_id) for user_id in missing], ignore_conflicts=True)
+            UserActivity.objects.filter(user_id__in=missing).update(**updates)
+
+
+def today_counts(activity):
+    """Return the today bucket, or zeros if it belongs to an earlier day"""
+    if activity.today != timezone.localdate():
+        return dict.fromkeys(TODAY_FIELDS, 0)
+    return {field: getattr(activity, field) for field in TODAY_FIELDS}
+
+
+def rebuild(user_ids=None, chunk_size=1000):
+    """
+    Recompute counters with grouped aggregates, chunk_size users at a time
+
+    Used for backfills; returns the number of users rebuilt.
+    """
+    users = User.objects.order_by('id').values_list('id', flat=True)
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+
+    current_day = timezone.localdate()
+    start_of_day = timezone.make_aware(datetime.combine(current_day, dt_time.min))
+    fields = list(COUNTER_QUERIES) + list(TODAY_QUERIES)
+    total = 0
+    last_id = 0
+
+    while True:
+        ids = list(users.filter(id__gt=last_id)[:chunk_size])
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        rows = {
+            user_id: UserActivity(user_id=user_id, today=current_day)
+            for user_id in ids
+        }
+        for activity in rows.values():
+            for field in fields:
+                setattr(activity, field, 0)
+
+        for field, queries in COUNTER_QUERIES.items():
+            for queryset, lookup, aggregate in queries:
+                grouped = queryset().filter(**{f'{lookup}__in': ids}).values(lookup).annotate(n=aggregate)
+                for row in grouped:
+                    activity = rows[row[lookup]]
+                    setattr(activity, field, getattr(activity, field) + (row['n'] or 0))
+
+        for field, (queryset, lookup, date_field) in TODAY_QUERIES.items():
+            grouped = queryset().filter(
+                **{f'{lookup}__in': ids, f'{date_field}__gte': start_of_day}
+            ).values(lookup).annotate(n=Count('id'))
+            for row in grouped:
+                setattr(rows[row[lookup]], field, row['n'])
+
+        UserActivity.objects.bulk_create(
+            rows.values(),
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=fields + ['today'],
+        )
+        total += len(rows)
+
+    return total
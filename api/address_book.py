@@ -0,0 +1,127 @@
+"""
+Address book sync
+Matches uploaded phone numbers against profiles' E.164 numbers and adds the matches as contacts,
+with digest-checked incremental re-syncs
+"""
+
+import hashlib
+
+from django.db import transaction
+
+from . import activity, contact_graph
+from .models import AddressBookSync, Contact, UserProfile
+from .phone import KNOWN_COUNTRIES, to_e164
+
+MAX_NUMBERS = 5000
+
+
+class SyncConflict(Exception):
+    """The client's base digest doesn't match the stored address book; a full sync is needed"""
+
+
+def digest(numbers):
+    """SHA-256 of a set of E.164 numbers, independent of upload order"""
+    return hashlib.sha256(','.join(sorted(numbers)).encode()).hexdigest()
+
+
+def default_country_code(user):
+    """Country code of the user's own number, used for numbers uploaded without one"""
+    own = UserProfile.objects.filter(user=user).values_list('phone_e164', flat=True).first()
+    for code, length, _ in KNOWN_COUNTRIES:
+        if own and own[1:].startswith(code) and len(own) - 1 == length:
+            return code
+    return None
+
+
+def normalize(numbers, country_code=None):
+    """(set of E.164 numbers, count of numbers that couldn't be normalized)"""
+    normalized, invalid = set(), 0
+    for number in numbers:
+        e164 = to_e164(str(number), country_code)
+        if e164:
+            normalized.add(e164)
+        else:
+            invalid += 1
+    return normalized, invalid
+
+
+def add_matches(user, numbers):
+    """
+    Add every user whose profile number is in numbers as a contact
+
+    One indexed lookup on phone_e164, then one bulk insert of the contacts that
+    don't exist yet. Returns the matched profiles as (user_id, phone_e164, username).
+    """
+    if not numbers:
+        return []
+
+    matches = list(
+        UserProfile.objects.filter(phone_e164__in=list(numbers)).exclude(user=user)
+        .values_list('user_id', 'phone_e164', 'user__username')
+    )
+    matched_ids = {user_id for user_id, _, _ in matches}
+    existing = set(
+        Contact.objects.filter(user=user, contact_id__in=matched_ids).values_list('contact_id', flat=True)
+    )
+    new = matched_ids - existing
+
+    if new:
+        Contact.objects.bulk_create(
+            [Contact(user=user, contact_id=contact_id) for contact_id in sorted(new)],
+            ignore_conflicts=True
+        )
+        # bulk_create skips the Contact signals
+        activity.bump(user.id, contacts=len(new))
+        contact_graph.invalidate(user.id)
+        transaction.on_commit(lambda: contact_graph.invalidate(user.id))
+
+    return matches
+
+
+def sync(user, numbers=None, added=(), removed=(), base_digest=None, country_code=None):
+    """
+    Sync a user's address book; returns a result dict
+
+    A full sync passes numbers. An incremental sync passes added/removed
+    numbers with base_digest, the digest returned by the previous sync, and
+    raises SyncConflict if it doesn't match what's stored; only the added
+    numbers are matched. A book whose digest hasn't changed costs no lookups.
+    """
+    country_code = country_code or default_country_code(user)
+
+    with transaction.atomic():
+        previous = AddressBookSync.objects.select_for_update().filter(user=user).first()
+        stored = set(previous.numbers.split(',')) if previous and previous.numbers else set()
+
+        if numbers is not None:
+            book, invalid = normalize(numbers, country_code)
+        else:
+            if previous is None or base_digest != previous.digest:
+                raise SyncConflict('Address book changed since the last sync')
+            new_numbers, invalid = normalize(added, country_code)
+            gone, gone_invalid = normalize(removed, country_code)
+            invalid += gone_invalid
+            book = (stored - gone) | new_numbers
+
+        new_digest = digest(book)
+        unchanged = previous is not None and new_digest == previous.digest
+        full = numbers is not None
+        matches = [] if unchanged else add_matches(user, book if full else book - stored)
+
+        if not unchanged:
+            AddressBookSync.objects.update_or_create(
+                user=user,
+                defaults={
+                    'numbers': ','.join(sorted(book)),
+                    'digest': new_digest,
+                    'matched': len(matches) if full else previous.matched + len(matches),
+                }
+            )
+
+    return {
+        'digest': new_digest,
+        'unchanged': unchanged,
+        'numbers': len(book),
+        'invalid': invalid,
+        'matches': [{'username': username, 'phone_number': e164} for _, e164, username in matches],
+    }
@@ -1,11 +1,28 @@
 from django.contrib import admin
 from django.contrib.auth.models import User, Group as DjangoGroup
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from .models import (
     UserProfile, Conversation, Message, MessageReaction,
     Call, Status, StatusView, Contact, Group, GroupMembership,
-    APILog, SystemStats
+    APILog, SystemStats, SystemCounter, UserActivity, MessageVolumeSeries, CohortReport,
+    ActiveUserSketch, AnomalyAlert, AddressBookSync
 )
+from . import search
+from .pagination import EstimatedCountPaginator
+
+def related_count(model, field):
+    """
+    Correlated COUNT(*) of model rows whose `field` points at the outer row
+    
+    Used as a changelist annotation: the database only evaluates it for the
+    rows on the current page, unlike a JOIN + GROUP BY over the whole table.
+    """
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+        total=Count('*')
+    ).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
 
 # Customize User Admin
 class UserProfileInline(admin.StackedInline):
@@ -37,7 +54,8 @@ class CustomUserAdmin(BaseUserAdmin):
     list_filter = ('is_active', 'groups', 'date_joined', 'profile__is_online')
     search_fields = ('username', 'email', 'first_name', 'last_name')
     ordering = ('-date_joined',)
-    
+    list_select_related = ('profile',)
+
     fieldsets = (
         ('Basic Information', {
             'fields': ('username', 'password', 'email', 'first_name', 'last_name')
@@ -59,11 +77,14 @@ class CustomUserAdmin(BaseUserAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('groups')
+    
     def get_groups(self, obj):
         groups = obj.groups.all()
         return ', '.join([g.name for g in groups]) if groups else 'None'
     get_groups.short_description = 'Groups'
-    
+
     def get_total_messages(self, obj):
         return obj.profile.total_messages if hasattr(obj, 'profile') else 0
     get_total_messages.short_description = 'Messages'
@@ -85,11 +106,16 @@ class ConversationAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
     date_hierarchy = 'created_at'
     ordering = ('-updated_at',)
+    list_select_related = ('user1', 'user2')
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(message_count=related_count(Message, 'conversation'))
     
     def get_message_count(self, obj):
-        return obj.messages.count()
+        return obj.message_count
     get_message_count.short_description = 'Messages'
-    
+    get_message_count.admin_order_field = 'message_count'
+
     def is_archived(self, obj):
         return obj.is_archived_by_user1 or obj.is_archived_by_user2
     is_archived.short_description = 'Archived'
@@ -105,10 +131,24 @@ class ConversationAdmin(admin.ModelAdmin):
 class MessageAdmin(admin.ModelAdmin):
     list_display = ('id', 'sender', 'receiver', 'group', 'message_type', 'short_content', 'is_read', 'is_deleted', 'created_at')
     list_filter = ('message_type', 'is_read', 'is_deleted', 'deleted_for_everyone', 'created_at')
-    search_fields = ('sender__username', 'receiver__username', 'content', 'group__name')
+    # Content is matched through the full-text index in get_search_results
+    search_fields = ('=sender__username', '=receiver__username', '=group__name')
     readonly_fields = ('created_at', 'edited_at')
-    date_hierarchy = 'created_at'
     ordering = ('-created_at',)
+    list_select_related = ('sender', 'receiver', 'group')
+    raw_id_fields = ('conversation', 'group', 'sender', 'receiver', 'reply_to')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # Most relevant content matches considered per admin search
+    search_match_limit = 1000
+    
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            matches = [message_id for message_id, _ in search.search(search_term, limit=self.search_match_limit)]
+            results |= queryset.filter(pk__in=matches)
+        return results, may_have_duplicates
     
     def short_content(self, obj):
         if obj.message_type == 'text' and obj.content:
@@ -146,6 +186,10 @@ class MessageReactionAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
     date_hierarchy = 'created_at'
     ordering = ('-created_at',)
+    list_select_related = ('user', 'message__sender', 'message__receiver', 'message__group')
+    raw_id_fields = ('message', 'user')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 # Group Admin
 @admin.register(Group)
@@ -157,15 +201,24 @@ class GroupAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
     ordering = ('-updated_at',)
     filter_horizontal = ('admins',)
+    list_select_related = ('created_by',)
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            member_count=related_count(GroupMembership, 'group'),
+            admin_count=related_count(Group.admins.through, 'group')
+        )
     
     def get_member_count(self, obj):
-        return obj.members.count()
+        return obj.member_count
     get_member_count.short_description = 'Members'
+    get_member_count.admin_order_field = 'member_count'
     
     def get_admin_count(self, obj):
-        return obj.admins.count()
+        return obj.admin_count
     get_admin_count.short_description = 'Admins'
-    
+    get_admin_count.admin_order_field = 'admin_count'
+
     fieldsets = (
         ('Basic Info', {
             'fields': ('name', 'description', 'avatar', 'created_by')
@@ -190,6 +243,7 @@ class GroupMembershipAdmin(admin.ModelAdmin):
     readonly_fields = ('joined_at',)
     date_hierarchy = 'joined_at'
     ordering = ('-joined_at',)
+    list_select_related = ('group', 'user')
 
 # Call Admin
 @admin.register(Call)
@@ -200,7 +254,8 @@ class CallAdmin(admin.ModelAdmin):
     readonly_fields = ('started_at', 'answered_at', 'ended_at')
     date_hierarchy = 'started_at'
     ordering = ('-started_at',)
-    
+    list_select_related = ('caller', 'receiver', 'group')
+
     fieldsets = (
         ('Participants', {
             'fields': ('caller', 'receiver', 'group')
@@ -219,11 +274,12 @@ class StatusAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'status_type', 'short_content', 'privacy', 'get_view_count', 'created_at', 'expires_at')
     list_filter = ('status_type', 'privacy', 'created_at')
     search_fields = ('user__username', 'content')
-    readonly_fields = ('created_at', 'expires_at')
+    readonly_fields = ('view_count', 'created_at', 'expires_at')
     date_hierarchy = 'created_at'
     ordering = ('-created_at',)
     filter_horizontal = ('visible_to', 'hidden_from')
-    
+    list_select_related = ('user',)
+
     def short_content(self, obj):
         if obj.status_type == 'text' and obj.content:
             return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
@@ -231,9 +287,10 @@ class StatusAdmin(admin.ModelAdmin):
     short_content.short_description = 'Content'
     
     def get_view_count(self, obj):
-        return obj.viewed_by.count()
+        return obj.view_count
     get_view_count.short_description = 'Views'
-    
+    get_view_count.admin_order_field = 'view_count'
+
     fieldsets = (
         ('User', {
             'fields': ('user',)
@@ -245,7 +302,7 @@ class StatusAdmin(admin.ModelAdmin):
             'fields': ('privacy', 'visible_to', 'hidden_from')
         }),
         ('Timestamps', {
-            'fields': ('created_at', 'expires_at')
+            'fields': ('view_count', 'created_at', 'expires_at')
         }),
     )
 
@@ -258,6 +315,10 @@ class StatusViewAdmin(admin.ModelAdmin):
     readonly_fields = ('viewed_at',)
     date_hierarchy = 'viewed_at'
     ordering = ('-viewed_at',)
+    list_select_related = ('status__user', 'user')
+    raw_id_fields = ('status', 'user')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 # Contact Admin
 @admin.register(Contact)
@@ -268,7 +329,8 @@ class ContactAdmin(admin.ModelAdmin):
     readonly_fields = ('added_at',)
     date_hierarchy = 'added_at'
     ordering = ('-added_at',)
-    
+    list_select_related = ('user', 'contact')
+
     fieldsets = (
         ('Users', {
             'fields': ('user', 'contact', 'nickname')
@@ -288,9 +350,12 @@ class APILogAdmin(admin.ModelAdmin):
     list_filter = ('method', 'status_code', 'created_at')
     search_fields = ('endpoint', 'user__username', 'ip_address')
     readonly_fields = ('created_at',)
-    date_hierarchy = 'created_at'
     ordering = ('-created_at',)
-    
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
     fieldsets = (
         ('Request Info', {
             'fields': ('endpoint', 'method', 'user', 'ip_address')
@@ -327,15 +392,75 @@ class SystemStatsAdmin(admin.ModelAdmin):
         }),
     )
 
+# System Counter Admin
+@admin.register(SystemCounter)
+class SystemCounterAdmin(admin.ModelAdmin):
+    list_display = ('name', 'shard', 'value', 'updated_at')
+    list_filter = ('name',)
+    readonly_fields = ('updated_at',)
+    ordering = ('name', 'shard')
+
+# User Activity Admin
+@admin.register(UserActivity)
+class UserActivityAdmin(admin.ModelAdmin):
+    list_display = ('user', 'messages_sent', 'messages_received', 'calls_made', 'statuses_posted', 'updated_at')
+    search_fields = ('user__username',)
+    readonly_fields = ('updated_at',)
+    list_select_related = ('user',)
+
+# Message Volume Series Admin
+@admin.register(MessageVolumeSeries)
+class MessageVolumeSeriesAdmin(admin.ModelAdmin):
+    list_display = ('scope', 'scope_id', 'resolution', 'period_start', 'updated_at')
+    list_filter = ('scope', 'resolution')
+    readonly_fields = ('updated_at',)
+    ordering = ('-period_start',)
+
+# Cohort Report Admin
+@admin.register(CohortReport)
+class CohortReportAdmin(admin.ModelAdmin):
+    list_display = ('generated_at', 'weeks')
+    readonly_fields = ('weeks', 'data', 'generated_at')
+
+# Active User Sketch Admin
+@admin.register(ActiveUserSketch)
+class ActiveUserSketchAdmin(admin.ModelAdmin):
+    list_display = ('date', 'updated_at')
+    exclude = ('registers',)
+    readonly_fields = ('date', 'updated_at')
+    ordering = ('-date',)
+
+# Anomaly Alert Admin
+@admin.register(AnomalyAlert)
+class AnomalyAlertAdmin(admin.ModelAdmin):
+    list_display = ('endpoint', 'metric', 'value', 'expected', 'z_score', 'window_start', 'created_at')
+    list_filter = ('metric', 'created_at')
+    search_fields = ('endpoint',)
+    readonly_fields = ('created_at',)
+    date_hierarchy = 'created_at'
+
+# Address Book Sync Admin
+@admin.register(AddressBookSync)
+class AddressBookSyncAdmin(admin.ModelAdmin):
+    list_display = ('user', 'matched', 'synced_at')
+    search_fields = ('user__username',)
+    exclude = ('numbers',)
+    readonly_fields = ('user', 'digest', 'matched', 'synced_at')
+    list_select_related = ('user',)
+
 # Customize Group Admin
 class CustomGroupAdmin(admin.ModelAdmin):
     list_display = ('name', 'get_user_count')
     search_fields = ('name',)
     filter_horizontal = ('permissions',)
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(user_count=related_count(User.groups.through, 'group'))
+    
     def get_user_count(self, obj):
-        return obj.user_set.count()
+        return obj.user_count
     get_user_count.short_description = 'Users'
+    get_user_count.admin_order_field = 'user_count'
 
 admin.site.unregister(DjangoGroup)
 admin.site.register(DjangoGroup, CustomGroupAdmin)
@@ -0,0 +1,154 @@
+"""
+Traffic and latency anomaly detection
+Exponentially weighted means and variances of per-minute request rate and latency for each
+endpoint, fed from request logging; readings beyond the z-score threshold raise alerts
+"""
+
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+
+from .models import AnomalyAlert
+
+logger = logging.getLogger(__name__)
+
+# Endpoints idle longer than this restart from their current reading
+MAX_IDLE_MINUTES = 60
+
+
+class EWMA:
+    """Exponentially weighted mean and variance of a series"""
+
+    __slots__ = ('mean', 'var', 'samples')
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.samples = 0
+
+    def update(self, value, alpha):
+        if not self.samples:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            increment = alpha * diff
+            self.mean += increment
+            self.var = (1 - alpha) * (self.var + diff * increment)
+        self.samples += 1
+
+    def z_score(self, value, min_std):
+        return (value - self.mean) / max(math.sqrt(self.var), min_std)
+
+
+class _EndpointState:
+    __slots__ = ('minute', 'requests', 'latency_total', 'rate', 'latency', 'alerted')
+
+    def __init__(self, minute):
+        self.minute = minute
+        self.requests = 0
+        self.latency_total = 0.0
+        self.rate = EWMA()
+        self.latency = EWMA()
+        # metric -> minute of the last alert, for the cooldown
+        self.alerted = {}
+
+
+_states = {}
+_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _minute_start(minute):
+    return datetime.fromtimestamp(minute * 60, tz=dt_timezone.utc)
+
+
+def _check(state, endpoint, metric, ewma, value, min_std, minute, alerts):
+    """Queue an alert if value is an upward outlier for ewma (before it absorbs value)"""
+    if ewma.samples < _setting('ANOMALY_WARMUP_MINUTES', 10):
+        return
+
+    z = ewma.z_score(value, min_std)
+    if z < _setting('ANOMALY_Z_THRESHOLD', 4.0):
+        return
+
+    last = state.alerted.get(metric)
+    if last is not None and minute - last < _setting('ANOMALY_COOLDOWN_MINUTES', 5):
+        return
+
+    state.alerted[metric] = minute
+    alerts.append(AnomalyAlert(
+        endpoint=endpoint, metric=metric, value=round(value, 2),
+        expected=round(ewma.mean, 2), z_score=round(z, 2), window_start=_minute_start(minute)
+    ))
+
+
+def _close_minutes(state, endpoint, minute, alerts):
+    """Fold every finished minute up to (not including) minute into the averages"""
+    alpha = _setting('ANOMALY_ALPHA', 0.1)
+
+    if state.requests:
+        mean_latency = state.latency_total / state.requests
+        # Poisson noise floor for counts; 10% of the mean (at least 1ms) for latency
+        _check(state, endpoint, 'rate', state.rate, state.requests,
+               max(math.sqrt(state.rate.mean), 1.0), state.minute, alerts)
+        _check(state, endpoint, 'latency', state.latency, mean_latency,
+               max(0.1 * state.latency.mean, 1.0), state.minute, alerts)
+        state.latency.update(mean_latency, alpha)
+    state.rate.update(state.requests, alpha)
+
+    # Minutes with no requests at all count as zero traffic
+    idle = min(minute - state.minute - 1, MAX_IDLE_MINUTES)
+    for _ in range(max(idle, 0)):
+        state.rate.update(0, alpha)
+
+    state.minute = minute
+    state.requests = 0
+    state.latency_total = 0.0
+
+
+def observe(endpoint, response_time, now=None):
+    """Record one request; closes the previous minute for this endpoint when a new one starts"""
+    minute = int((now if now is not None else time.time()) // 60)
+    alerts = []
+
+    with _lock:
+        state = _states.get(endpoint)
+        if state is None:
+            state = _states[endpoint] = _EndpointState(minute)
+        elif minute > state.minute:
+            _close_minutes(state, endpoint, minute, alerts)
+
+        state.requests += 1
+        state.latency_total += response_time
+
+    for alert in alerts:
+        logger.warning(
+            f"Anomaly: {alert.metric} on {alert.endpoint} = {alert.value} "
+            f"(expected {alert.expected}, z={alert.z_score})"
+        )
+    if alerts:
+        AnomalyAlert.objects.bulk_create(alerts)
+    return alerts
+
+
+def snapshot():
+    """Current running averages for every endpoint seen by this worker"""
+    with _lock:
+        return [
+            {
+                'endpoint': endpoint,
+                'requests_per_minute': round(state.rate.mean, 2),
+                'requests_per_minute_std': round(math.sqrt(state.rate.var), 2),
+                'latency_ms': round(state.latency.mean, 2),
+                'latency_ms_std': round(math.sqrt(state.latency.var), 2),
+                'minutes_observed': state.rate.samples,
+            }
+            for endpoint, state in sorted(_states.items())
+        ]
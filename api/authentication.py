@@ -0,0 +1,25 @@
+"""
+REST framework authentication
+"""
+
+from rest_framework import authentication, exceptions
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """Use the user TokenAuthenticationMiddleware resolved from a bearer token"""
+
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        django_request = request._request
+        error = getattr(django_request, 'token_error', None)
+        if error:
+            raise exceptions.AuthenticationFailed(error)
+
+        claims = getattr(django_request, 'token_claims', None)
+        if claims is None:
+            return None
+        return django_request.user, claims
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,145 @@
+"""
+Authorization cache
+Per-user profile role and auth group names kept in a versioned per-process LRU,
+so admin and role checks are set lookups instead of queries
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from .models import UserProfile
+
+ADMIN_GROUP = 'Admin'
+
+# Bumped when a group is renamed or deleted, which changes every member's groups
+GLOBAL_VERSION_KEY = 'authz:version'
+
+
+class _Entry:
+    __slots__ = ('version', 'expires', 'role', 'groups')
+
+    def __init__(self, version, expires, role, groups):
+        self.version = version
+        self.expires = expires
+        self.role = role
+        self.groups = groups
+
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+def _capacity():
+    return getattr(settings, 'AUTHZ_CACHE_SIZE', 10000)
+
+
+def _version_key(user_id):
+    return f'authz:version:{user_id}'
+
+
+def _versions(keys):
+    """
+    Current versions of keys, giving any missing key a fresh one
+
+    An entry loaded under a missing version would otherwise keep matching
+    once a later invalidation's version is itself evicted.
+    """
+    versions = cache.get_many(keys)
+    unversioned = [key for key in keys if versions.get(key) is None]
+    if unversioned:
+        for key in unversioned:
+            cache.add(key, uuid.uuid4().hex, None)
+        versions.update(cache.get_many(unversioned))
+    return versions
+
+
+def invalidate(user_id):
+    """Drop a user's cached roles here and, through a new version, in every other worker"""
+    cache.set(_version_key(user_id), uuid.uuid4().hex, None)
+    with _lock:
+        _entries.pop(user_id, None)
+
+
+def invalidate_all():
+    """Drop every user's cached roles, e.g. after a group is renamed"""
+    cache.set(GLOBAL_VERSION_KEY, uuid.uuid4().hex, None)
+    with _lock:
+        _entries.clear()
+
+
+def load(user_ids):
+    """
+    {user_id: entry} for user_ids, loading stale or missing users with two queries
+
+    Entries are trusted for AUTHZ_CACHE_LOCAL_TTL seconds at most, so a
+    version change this worker never sees (e.g. with a per-process cache
+    backend) only delays a role change by that long.
+    """
+    user_ids = set(user_ids)
+    keys = [GLOBAL_VERSION_KEY] + [_version_key(user_id) for user_id in user_ids]
+    versions = _versions(keys)
+    current = {
+        user_id: (versions.get(GLOBAL_VERSION_KEY), versions.get(_version_key(user_id))) for user_id in user_ids
+    }
+    now = time.monotonic()
+
+    found, missing = {}, []
+    with _lock:
+        for user_id in user_ids:
+            entry = _entries.get(user_id)
+            if entry is not None and entry.version == current[user_id] and entry.expires > now:
+                _entries.move_to_end(user_id)
+                found[user_id] = entry
+            else:
+                missing.append(user_id)
+
+    if missing:
+        roles = dict(UserProfile.objects.filter(user_id__in=missing).values_list('user_id', 'role'))
+        groups = {user_id: set() for user_id in missing}
+        for user_id, name in User.groups.through.objects.filter(user_id__in=missing).values_list(
+            'user_id', 'group__name'
+        ):
+            groups[user_id].add(name)
+
+        capacity = _capacity()
+        expires = now + getattr(settings, 'AUTHZ_CACHE_LOCAL_TTL', 30)
+        with _lock:
+            for user_id in missing:
+                found[user_id] = _entries[user_id] = _Entry(
+                    current[user_id], expires, roles.get(user_id), frozenset(groups[user_id])
+                )
+                _entries.move_to_end(user_id)
+            while len(_entries) > capacity:
+                _entries.popitem(last=False)
+
+    return found
+
+
+def role(user_id):
+    """The user's profile role, or None without a profile"""
+    return load([user_id])[user_id].role
+
+
+def groups(user_id):
+    """Names of the auth groups the user belongs to"""
+    return load([user_id])[user_id].groups
+
+
+def has_role(user_id, name):
+    return role(user_id) == name
+
+
+def is_admin(user_id):
+    """True if the user is in the Admin group"""
+    return ADMIN_GROUP in groups(user_id)
+
+
+def admin_ids(user_ids):
+    """The subset of user_ids in the Admin group, with at most one load for the lot"""
+    return {user_id for user_id, entry in load(user_ids).items() if ADMIN_GROUP in entry.groups}
@@ -0,0 +1,143 @@
+"""
+Weekly signup cohort retention
+Streams (user, week) activity out of the database and builds the cohort matrix with NumPy
+"""
+
+import logging
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from .models import CohortReport, Message
+
+logger = logging.getLogger(__name__)
+
+FETCH_CHUNK = 50000
+DEFAULT_WEEKS = 12
+# 1970-01-01 was a Thursday; shift so week numbers start on Mondays like TruncWeek
+_EPOCH_MONDAY_OFFSET = 3 * 86400
+_WEEK = 7 * 86400
+
+
+def week_number(seconds):
+    """Monday-based week numbers for epoch-second arrays"""
+    return ((np.asarray(seconds, dtype=np.float64) + _EPOCH_MONDAY_OFFSET) // _WEEK).astype(np.int64)
+
+
+def week_start(number):
+    return datetime.fromtimestamp(int(number) * _WEEK - _EPOCH_MONDAY_OFFSET, tz=dt_timezone.utc).date()
+
+
+def _columns(rows, dtypes):
+    """Drain a values_list iterator chunk by chunk into one array per column"""
+    parts = [[] for _ in dtypes]
+    while True:
+        chunk = list(islice(rows, FETCH_CHUNK))
+        if not chunk:
+            break
+        for i, column in enumerate(zip(*chunk)):
+            parts[i].append(np.array(column, dtype=dtypes[i]))
+    return [np.concatenate(p) if p else np.empty(0, dtype=dtypes[i]) for i, p in enumerate(parts)]
+
+
+def _timestamps(values):
+    return [value.timestamp() for value in values]
+
+
+def compute(weeks=DEFAULT_WEEKS, now=None):
+    """
+    Build the retention payload for the last `weeks` signup cohorts
+
+    A user is retained in week k of their cohort if they sent a message in
+    that calendar week; engagement is messages per retained user.
+    """
+    now = now or timezone.now()
+    current = int(week_number([now.timestamp()])[0])
+    first = current - weeks + 1
+    since = datetime.fromtimestamp(first * _WEEK - _EPOCH_MONDAY_OFFSET, tz=dt_timezone.utc)
+
+    # Cohort membership: one row per user who joined in the window
+    user_ids, joined = _columns(
+        User.objects.filter(date_joined__gte=since).order_by('id').values_list('id', 'date_joined').iterator(
+            chunk_size=FETCH_CHUNK
+        ),
+        (np.int64, object)
+    )
+    cohort = week_number(_timestamps(joined)) - first
+
+    # Activity: one (sender, week, messages) row per active user-week, grouped in the database
+    senders, active_weeks, messages = _columns(
+        Message.objects.filter(created_at__gte=since, sender__date_joined__gte=since)
+        .annotate(week=TruncWeek('created_at', tzinfo=dt_timezone.utc))
+        .values('sender_id', 'week').annotate(messages=Count('id'))
+        .order_by().values_list('sender_id', 'week', 'messages').iterator(chunk_size=FETCH_CHUNK),
+        (np.int64, object, np.int64)
+    )
+
+    sizes = np.bincount(cohort, minlength=weeks)
+    active = np.zeros((weeks, weeks), dtype=np.int64)
+    volume = np.zeros((weeks, weeks), dtype=np.int64)
+
+    if len(senders) and len(user_ids):
+        # user_ids is sorted, so each sender's cohort is a binary search away
+        position = np.searchsorted(user_ids, senders).clip(max=len(user_ids) - 1)
+        known = user_ids[position] == senders
+        sender_cohort = cohort[position[known]]
+        offset = week_number(_timestamps(active_weeks[known])) - first - sender_cohort
+        valid = (offset >= 0) & (offset < weeks)
+
+        cell = sender_cohort[valid] * weeks + offset[valid]
+        active = np.bincount(cell, minlength=weeks * weeks).reshape(weeks, weeks)
+        volume = np.bincount(cell, weights=messages[known][valid], minlength=weeks * weeks).reshape(weeks, weeks)
+
+    # Cohort i has only been observed for weeks - i weeks
+    observed = np.arange(weeks)[None, :] < (weeks - np.arange(weeks))[:, None]
+    retention = np.divide(active, sizes[:, None], out=np.zeros(active.shape), where=sizes[:, None] > 0)
+    engagement = np.divide(volume, active, out=np.zeros(active.shape), where=active > 0)
+
+    # Average retention per week offset, weighted by the sizes of cohorts that reached it
+    reached = observed * sizes[:, None]
+    average = np.divide(
+        (active * observed).sum(axis=0), reached.sum(axis=0),
+        out=np.zeros(weeks), where=reached.sum(axis=0) > 0
+    )
+
+    cohorts = []
+    for i in range(weeks):
+        span = weeks - i
+        cohorts.append({
+            'week': week_start(first + i).isoformat(),
+            'users': int(sizes[i]),
+            'active_users': active[i, :span].tolist(),
+            'retention': [round(float(value), 4) for value in retention[i, :span]],
+            'messages': [int(value) for value in volume[i, :span]],
+            'messages_per_active_user': [round(float(value), 2) for value in engagement[i, :span]],
+        })
+
+    return {
+        'weeks': weeks,
+        'total_users': int(sizes.sum()),
+        'average_retention': [round(float(value), 4) for value in average],
+        'cohorts': cohorts,
+    }
+
+
+def build(weeks=DEFAULT_WEEKS):
+    """Compute and store a new report, replacing earlier ones"""
+    data = compute(weeks)
+    with transaction.atomic():
+        report = CohortReport.objects.create(weeks=weeks, data=data)
+        CohortReport.objects.exclude(pk=report.pk).delete()
+    logger.info(f"Cohort report built for {data['total_users']} users over {weeks} weeks")
+    return report
+
+
+def latest():
+    """The most recent stored report, or None before the first run"""
+    return CohortReport.objects.order_by('-generated_at').first()
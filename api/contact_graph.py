@@ -0,0 +1,166 @@
+"""
+Contact graph cache
+Per-user sorted arrays of contact, blocked and favorite ids kept in a per-process LRU,
+so block, mutual-contact and favorite checks are binary searches instead of queries
+"""
+
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Contact
+
+
+class _Entry:
+    __slots__ = ('version', 'expires', 'contacts', 'blocked', 'favorites')
+
+    def __init__(self, version, expires, contacts, blocked, favorites):
+        self.version = version
+        self.expires = expires
+        self.contacts = contacts
+        self.blocked = blocked
+        self.favorites = favorites
+
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+def _capacity():
+    return getattr(settings, 'CONTACT_GRAPH_CACHE_SIZE', 10000)
+
+
+def _version_key(user_id):
+    return f'contact_graph:version:{user_id}'
+
+
+def _contains(ids, value):
+    i = bisect_left(ids, value)
+    return i < len(ids) and ids[i] == value
+
+
+def _versions(keys):
+    """
+    Current versions of keys, giving any missing key a fresh one
+
+    An entry loaded under a missing version would otherwise keep matching
+    once a later invalidation's version is itself evicted.
+    """
+    versions = cache.get_many(keys)
+    unversioned = [key for key in keys if versions.get(key) is None]
+    if unversioned:
+        for key in unversioned:
+            cache.add(key, uuid.uuid4().hex, None)
+        versions.update(cache.get_many(unversioned))
+    return versions
+
+
+def invalidate(user_id):
+    """Drop a user's cached edges here and, through a new version, in every other worker"""
+    cache.set(_version_key(user_id), uuid.uuid4().hex, None)
+    with _lock:
+        _entries.pop(user_id, None)
+
+
+def _build(version, expires, rows):
+    contacts, blocked, favorites = [], [], []
+    for contact_id, is_blocked, is_favorite in rows:
+        (blocked if is_blocked else contacts).append(contact_id)
+        if is_favorite and not is_blocked:
+            favorites.append(contact_id)
+    return _Entry(
+        version, expires, array('q', sorted(contacts)), array('q', sorted(blocked)), array('q', sorted(favorites))
+    )
+
+
+def load(user_ids):
+    """
+    {user_id: entry} for user_ids, loading stale or missing users with one query
+
+    Entries are trusted for CONTACT_GRAPH_CACHE_LOCAL_TTL seconds at most, so
+    a version change this worker never sees (e.g. with a per-process cache
+    backend) only delays a block or unblock by that long.
+    """
+    user_ids = set(user_ids)
+    versions = _versions([_version_key(user_id) for user_id in user_ids])
+    now = time.monotonic()
+
+    found, missing = {}, []
+    with _lock:
+        for user_id in user_ids:
+            entry = _entries.get(user_id)
+            if entry is not None and entry.version == versions.get(_version_key(user_id)) and entry.expires > now:
+                _entries.move_to_end(user_id)
+                found[user_id] = entry
+            else:
+                missing.append(user_id)
+
+    if missing:
+        rows = {user_id: [] for user_id in missing}
+        for user_id, contact_id, is_blocked, is_favorite in Contact.objects.filter(user_id__in=missing).values_list(
+            'user_id', 'contact_id', 'is_blocked', 'is_favorite'
+        ):
+            rows[user_id].append((contact_id, is_blocked, is_favorite))
+
+        capacity = _capacity()
+        expires = now + getattr(settings, 'CONTACT_GRAPH_CACHE_LOCAL_TTL', 30)
+        with _lock:
+            for user_id, edges in rows.items():
+                found[user_id] = _entries[user_id] = _build(versions.get(_version_key(user_id)), expires, edges)
+                _entries.move_to_end(user_id)
+            while len(_entries) > capacity:
+                _entries.popitem(last=False)
+
+    return found
+
+
+def contacts(user_id):
+    """Sorted ids of the user's (unblocked) contacts"""
+    return load([user_id])[user_id].contacts
+
+
+def blocked(user_id):
+    """Sorted ids of the users this user has blocked"""
+    return load([user_id])[user_id].blocked
+
+
+def is_contact(user_id, other_id):
+    return _contains(contacts(user_id), other_id)
+
+
+def is_mutual(user_id, other_id):
+    entries = load([user_id, other_id])
+    return _contains(entries[user_id].contacts, other_id) and _contains(entries[other_id].contacts, user_id)
+
+
+def is_favorite(user_id, other_id):
+    return _contains(load([user_id])[user_id].favorites, other_id)
+
+
+def is_blocked(user_id, other_id):
+    """True if either user has blocked the other"""
+    entries = load([user_id, other_id])
+    return _contains(entries[user_id].blocked, other_id) or _contains(entries[other_id].blocked, user_id)
+
+
+def reachable_contacts(user_id):
+    """
+    (contacts, mutual) for a user, leaving out contacts who have blocked them
+
+    mutual holds the contacts that also have the user as a contact. The
+    reverse edges come from one query for the rows pointing at the user,
+    rather than loading every contact's whole graph.
+    """
+    own = contacts(user_id)
+    reverse = dict(
+        Contact.objects.filter(contact_id=user_id, user_id__in=list(own)).values_list('user_id', 'is_blocked')
+    )
+    reachable = [contact_id for contact_id in own if not reverse.get(contact_id)]
+    mutual = [contact_id for contact_id in reachable if contact_id in reverse]
+    return reachable, mutual
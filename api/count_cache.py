@@ -0,0 +1,194 @@
+"""
+Shared table count cache
+Serves table totals from the system counters (or, opted in, database statistics), and the filtered
+counts the counters can't maintain from the Django cache, refreshing stale entries in the background
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections
+from django.utils import timezone
+
+from . import counters
+from .models import APILog, Call, Conversation, Group, Message, MessageReaction
+
+logger = logging.getLogger(__name__)
+
+# Count name -> system counter kept in step by the model signals
+COUNTER_NAMES = {
+    'users': 'users',
+    'messages': 'messages',
+    'conversations': 'conversations',
+    'reactions': 'reactions',
+    'groups': 'groups',
+    'calls': 'calls',
+    'api_logs': 'api_calls',
+}
+
+# Count name -> model whose table statistics can stand in for the total (COUNT_CACHE_APPROXIMATE)
+TABLE_MODELS = {
+    'users': User,
+    'messages': Message,
+    'conversations': Conversation,
+    'reactions': MessageReaction,
+    'groups': Group,
+    'calls': Call,
+    'api_logs': APILog,
+}
+
+# Count name -> function counting it against the database
+COUNT_QUERIES = {
+    'admin_users': lambda: User.objects.filter(groups__name='Admin').count(),
+    'active_statuses': lambda: counters.active_statuses(),
+    'api_calls_today': lambda: APILog.objects.filter(created_at__date=timezone.now().date()).count(),
+}
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _ttl():
+    return getattr(settings, 'COUNT_CACHE_TTL', 60)
+
+
+def _cache_key(name):
+    return f'count_cache:{name}'
+
+
+def _approximate(name):
+    return name in TABLE_MODELS and name in getattr(settings, 'COUNT_CACHE_APPROXIMATE', ())
+
+
+def approximate_count(model):
+    """
+    Row estimate for a whole table from the database's own statistics
+
+    Returns None when the backend has no usable estimate (e.g. the table
+    has never been analyzed).
+    """
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s',
+                [table]
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+        else:
+            return None
+        row = cursor.fetchone()
+
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def compute(name):
+    """Count name: from table statistics if opted in and available, else the counter or a query"""
+    if _approximate(name):
+        estimate = approximate_count(TABLE_MODELS[name])
+        if estimate is not None:
+            return estimate
+    if name in COUNTER_NAMES:
+        return counters.get_counters().get(COUNTER_NAMES[name], 0)
+    return COUNT_QUERIES[name]()
+
+
+def refresh(name):
+    """Recount name and store it in the cache; returns the new value"""
+    value = compute(name)
+    # Kept well past the TTL so readers can be served a stale value while it refreshes
+    cache.set(_cache_key(name), (value, time.time()), _ttl() * 10)
+    return value
+
+
+def _refresh_names(names):
+    try:
+        for name in names:
+            try:
+                refresh(name)
+            except Exception as e:
+                logger.warning(f"Count refresh failed for {name}: {e}")
+    finally:
+        with _refreshing_lock:
+            _refreshing.difference_update(names)
+
+
+def _refresh_worker(names):
+    try:
+        _refresh_names(names)
+    finally:
+        # Connections are per thread; don't leave this one open
+        connections.close_all()
+
+
+def _refresh_in_background(names):
+    with _refreshing_lock:
+        names = [name for name in names if name not in _refreshing]
+        _refreshing.update(names)
+
+    if not names:
+        return
+
+    if getattr(settings, 'COUNT_CACHE_BACKGROUND_REFRESH', True):
+        threading.Thread(target=_refresh_worker, args=(names,), daemon=True).start()
+    else:
+        _refresh_names(names)
+
+
+def get_counts(names):
+    """
+    Return {name: count} for the given names
+
+    Table totals come from the system counters (one aggregate query), so
+    every view reports the same numbers. Filtered counts, and totals listed
+    in COUNT_CACHE_APPROXIMATE (estimated from the database's statistics),
+    are cached: cached values are returned as-is, stale ones are refreshed
+    in a background thread and only names never counted before are
+    computed inline.
+    """
+    live = [name for name in names if name in COUNTER_NAMES and not _approximate(name)]
+    counts = {}
+    if live:
+        totals = counters.get_counters()
+        counts = {name: totals.get(COUNTER_NAMES[name], 0) for name in live}
+
+    keys = {name: _cache_key(name) for name in names if name not in counts}
+    cached = cache.get_many(list(keys.values()))
+    now = time.time()
+
+    stale = []
+    for name, key in keys.items():
+        entry = cached.get(key)
+        if entry is None:
+            counts[name] = refresh(name)
+            continue
+
+        value, computed_at = entry
+        counts[name] = value
+        if now - computed_at > _ttl():
+            stale.append(name)
+
+    if stale:
+        _refresh_in_background(stale)
+
+    return counts
+
+
+def get_count(name):
+    return get_counts([name])[name]
@@ -0,0 +1,102 @@
+"""
+Incrementally maintained system counters
+Keeps dashboard totals current from model signals so reads never run COUNT(*) on large tables
+"""
+
+import random
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import (
+    UserProfile, Conversation, Message, MessageReaction,
+    Call, Status, Group, APILog, SystemCounter, SystemStats
+)
+
+# Each counter is spread over this many rows; writers pick one at random
+COUNTER_SHARDS = 8
+
+# Counter name -> queryset used to recount it from scratch
+COUNTER_SOURCES = {
+    'users': lambda: User.objects.all(),
+    'online_users': lambda: UserProfile.objects.filter(is_online=True),
+    'messages': lambda: Message.objects.all(),
+    'conversations': lambda: Conversation.objects.all(),
+    'reactions': lambda: MessageReaction.objects.all(),
+    'groups': lambda: Group.objects.all(),
+    'calls': lambda: Call.objects.all(),
+    'statuses': lambda: Status.objects.all(),
+    'api_calls': lambda: APILog.objects.all(),
+}
+
+
+def increment(name, delta=1):
+    """Add delta to a counter using a single UPDATE on one of its shards"""
+    if not delta:
+        return
+
+    shard = random.randrange(COUNTER_SHARDS)
+    updated = SystemCounter.objects.filter(name=name, shard=shard).update(
+        value=F('value') + delta
+    )
+    if not updated:
+        counter, created = SystemCounter.objects.get_or_create(
+            name=name, shard=shard, defaults={'value': delta}
+        )
+        if not created:
+            SystemCounter.objects.filter(pk=counter.pk).update(value=F('value') + delta)
+
+
+def get_counters():
+    """Return every counter as {name: value} with a single aggregate query"""
+    totals = dict.fromkeys(COUNTER_SOURCES, 0)
+    for row in SystemCounter.objects.values('name').annotate(total=Sum('value')):
+        totals[row['name']] = row['total'] or 0
+    return totals
+
+
+def active_statuses(now=None):
+    """
+    Number of statuses that haven't expired yet
+
+    Expiry happens with time rather than writes, so this can't be a counter;
+    it's a range count on the expires_at index instead.
+    """
+    return Status.objects.filter(expires_at__gt=now or timezone.now()).count()
+
+
+def rebuild_counters():
+    """
+    Recount every counter from its table and reset the shards
+
+    Expensive - meant for backfills and drift repair, not the request path.
+    """
+    with transaction.atomic():
+        for name, source in COUNTER_SOURCES.items():
+            SystemCounter.objects.filter(name=name).exclude(shard=0).delete()
+            SystemCounter.objects.update_or_create(
+                name=name, shard=0, defaults={'value': source().count()}
+            )
+    return get_counters()
+
+
+def snapshot_system_stats(date=None):
+    """Write the current counters into the SystemStats row for date (today by default)"""
+    date = date or timezone.now().date()
+    counters = get_counters()
+
+    stats, _ = SystemStats.objects.update_or_create(
+        date=date,
+        defaults={
+            'total_users': counters['users'],
+            'active_users': counters['online_users'],
+            'total_messages': counters['messages'],
+            'total_groups': counters['groups'],
+            'total_calls': counters['calls'],
+            'total_statuses': active_statuses(),
+            'total_api_calls': counters['api_calls'],
+        }
+    )
+    return stats
@@ -0,0 +1,90 @@
+"""
+Background flushing
+Runs the flush functions of in-process write buffers on a timer in a daemon thread, and once more
+at process exit, so buffered updates reach the database even when a worker stops getting requests
+"""
+
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for due flushes
+TICK = 1
+
+# flush function -> (interval setting name, default seconds)
+_flushers = {}
+_last_run = {}
+_lock = threading.Lock()
+_thread = None
+
+
+def _interval(flush):
+    name, default = _flushers[flush]
+    return getattr(settings, name, default)
+
+
+def _run_due():
+    now = time.monotonic()
+    with _lock:
+        due = [flush for flush in _flushers if now - _last_run.get(flush, now) >= _interval(flush)]
+        for flush in _flushers:
+            _last_run.setdefault(flush, now)
+        for flush in due:
+            _last_run[flush] = now
+
+    for flush in due:
+        try:
+            flush()
+        except Exception as e:
+            logger.warning(f"Background flush {flush.__module__}.{flush.__name__} failed: {e}")
+
+
+def _loop():
+    while True:
+        time.sleep(TICK)
+        try:
+            _run_due()
+        finally:
+            # Connections are per thread; don't hold this one open between ticks
+            connections.close_all()
+
+
+def flush_all():
+    """Run every registered flush now (also called at process exit)"""
+    with _lock:
+        flushers = list(_flushers)
+    for flush in flushers:
+        try:
+            flush()
+        except Exception as e:
+            logger.warning(f"Flush {flush.__module__}.{flush.__name__} failed: {e}")
+
+
+def register(flush, interval_setting, default):
+    """
+    Run flush every interval_setting seconds in the background and at exit
+
+    Called from the buffering code path, so the thread only starts in
+    processes that actually buffer something. BACKGROUND_FLUSH = False
+    (as in the tests) starts neither the thread nor the exit hook; the
+    buffers are then only flushed when flush_all() or their own flush()
+    is called.
+    """
+    global _thread
+
+    if flush in _flushers:
+        return
+    with _lock:
+        if flush in _flushers:
+            return
+        _flushers[flush] = (interval_setting, default)
+        if _thread is None and getattr(settings, 'BACKGROUND_FLUSH', True):
+            atexit.register(flush_all)
+            _thread = threading.Thread(target=_loop, name='api-flusher', daemon=True)
+            _thread.start()
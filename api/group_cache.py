@@ -0,0 +1,123 @@
+"""
+Group membership cache
+Per-group sorted arrays of member and admin ids, with the send setting, kept in a per-process LRU,
+so group sends and reads check permissions with binary searches instead of queries
+"""
+
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Group, GroupMembership
+
+
+class _Entry:
+    __slots__ = ('version', 'expires', 'name', 'only_admins_can_send', 'members', 'admins')
+
+    def __init__(self, version, expires, name, only_admins_can_send, members, admins):
+        self.version = version
+        self.expires = expires
+        self.name = name
+        self.only_admins_can_send = only_admins_can_send
+        self.members = members
+        self.admins = admins
+
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+def _capacity():
+    return getattr(settings, 'GROUP_CACHE_SIZE', 10000)
+
+
+def _version_key(group_id):
+    return f'group_cache:version:{group_id}'
+
+
+def _contains(ids, value):
+    i = bisect_left(ids, value)
+    return i < len(ids) and ids[i] == value
+
+
+def _version(group_id):
+    # A missing version gets a fresh one, so a later eviction reads as a change rather than a match
+    key = _version_key(group_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate(group_id):
+    """Drop a group's cached members here and, through a new version, in every other worker"""
+    cache.set(_version_key(group_id), uuid.uuid4().hex, None)
+    with _lock:
+        _entries.pop(group_id, None)
+
+
+def forget(group_id):
+    """Invalidate a group now and again after commit, for writes that change its members or settings"""
+    invalidate(group_id)
+    # Again after commit, in case another worker reloaded the old members in between
+    transaction.on_commit(lambda: invalidate(group_id))
+
+
+def get(group_id):
+    """
+    Entry for a group, loading it with three queries if missing or stale; raises Group.DoesNotExist
+
+    Entries are trusted for GROUP_CACHE_LOCAL_TTL seconds at most, so a
+    version change this worker never sees only delays a membership change
+    by that long.
+    """
+    group_id = int(group_id)
+    version = _version(group_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(group_id)
+        if entry is not None and entry.version == version and entry.expires > now:
+            _entries.move_to_end(group_id)
+            return entry
+
+    row = Group.objects.filter(id=group_id).values_list('name', 'only_admins_can_send').first()
+    if row is None:
+        raise Group.DoesNotExist(f'Group {group_id} does not exist')
+    members = GroupMembership.objects.filter(group_id=group_id).values_list('user_id', flat=True)
+    admins = Group.admins.through.objects.filter(group_id=group_id).values_list('user_id', flat=True)
+    entry = _Entry(
+        version, now + getattr(settings, 'GROUP_CACHE_LOCAL_TTL', 30), row[0], row[1],
+        array('q', sorted(members)), array('q', sorted(admins))
+    )
+
+    with _lock:
+        _entries[group_id] = entry
+        _entries.move_to_end(group_id)
+        while len(_entries) > _capacity():
+            _entries.popitem(last=False)
+    return entry
+
+
+def is_member(group_id, user_id):
+    return _contains(get(group_id).members, user_id)
+
+
+def is_admin(group_id, user_id):
+    return _contains(get(group_id).admins, user_id)
+
+
+def send_denial(entry, user_id):
+    """Why user_id may not send to the group, or None if they may"""
+    if not _contains(entry.members, user_id):
+        return 'You are not a member of this group'
+    if entry.only_admins_can_send and not _contains(entry.admins, user_id):
+        return 'Only admins can send messages in this group'
+    return None
@@ -0,0 +1,197 @@
+"""
+Heavy-hitter detection on API traffic
+Space-Saving top-k summaries per minute for client IPs, users and endpoints, kept per worker
+and shared through the Django cache so the dashboard sees traffic from every process
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ('ip', 'user', 'endpoint')
+MAX_WINDOW_MINUTES = 15
+# Upper bound on worker processes whose summaries are read back per minute
+MAX_WORKERS = 64
+
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-k summary over at most `capacity` items
+
+    Each tracked count overestimates the true count by at most its error, and
+    any item seen more than total/capacity times is guaranteed to be tracked.
+    """
+
+    __slots__ = ('capacity', 'counts', 'errors')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, item, weight=1):
+        counts = self.counts
+        if item in counts:
+            counts[item] += weight
+            return
+
+        if len(counts) < self.capacity:
+            counts[item] = weight
+            self.errors[item] = 0
+            return
+
+        # Evict the smallest counter; the newcomer inherits its count as error
+        victim = min(counts, key=counts.__getitem__)
+        floor = counts.pop(victim)
+        del self.errors[victim]
+        counts[item] = floor + weight
+        self.errors[item] = floor
+
+    def floor(self):
+        """Largest count an untracked item could have"""
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def merge(self, other):
+        """Combine with another summary (e.g. another minute or worker) in place"""
+        own_floor, other_floor = self.floor(), other.floor()
+        items = set(self.counts) | set(other.counts)
+
+        counts, errors = {}, {}
+        for item in items:
+            counts[item] = self.counts.get(item, own_floor) + other.counts.get(item, other_floor)
+            errors[item] = self.errors.get(item, own_floor) + other.errors.get(item, other_floor)
+
+        keep = sorted(counts, key=counts.__getitem__, reverse=True)[:self.capacity]
+        self.counts = {item: counts[item] for item in keep}
+        self.errors = {item: errors[item] for item in keep}
+        return self
+
+    def top(self, n):
+        items = sorted(self.counts, key=self.counts.__getitem__, reverse=True)[:n]
+        return [{'key': item, 'count': self.counts[item], 'error': self.errors[item]} for item in items]
+
+    def to_dict(self):
+        return {item: (count, self.errors[item]) for item, count in self.counts.items()}
+
+    @classmethod
+    def from_dict(cls, capacity, data):
+        summary = cls(capacity)
+        for item, (count, error) in data.items():
+            summary.counts[item] = count
+            summary.errors[item] = error
+        return summary
+
+
+# minute -> {dimension: SpaceSaving} for this worker
+_minutes = {}
+_dirty = set()
+_slots = {}
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+
+
+def _capacity():
+    return getattr(settings, 'HEAVY_HITTERS_CAPACITY', 100)
+
+
+def _slot_key(minute, slot):
+    return f'heavy_hitters:{minute}:{slot}'
+
+
+def record(ip=None, user=None, endpoint=None):
+    """Count one request against the current minute"""
+    minute = int(time.time() // 60)
+
+    with _lock:
+        summaries = _minutes.get(minute)
+        if summaries is None:
+            summaries = _minutes[minute] = {name: SpaceSaving(_capacity()) for name in DIMENSIONS}
+            for old in [m for m in _minutes if m <= minute - MAX_WINDOW_MINUTES]:
+                del _minutes[old]
+                _slots.pop(old, None)
+
+        for name, value in (('ip', ip), ('user', user), ('endpoint', endpoint)):
+            if value:
+                summaries[name].add(value)
+        _dirty.add(minute)
+
+    if time.monotonic() - _last_flush >= getattr(settings, 'HEAVY_HITTERS_FLUSH_INTERVAL', 5):
+        flush()
+
+
+def flush():
+    """Publish this worker's changed minutes to the shared cache"""
+    # Another thread of this worker is already publishing
+    if not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _publish()
+    finally:
+        _flush_lock.release()
+
+
+def _publish():
+    global _last_flush
+
+    with _lock:
+        _last_flush = time.monotonic()
+        minutes = {minute: _minutes[minute] for minute in _dirty if minute in _minutes}
+        payloads = {
+            minute: (WORKER_ID, {name: summary.to_dict() for name, summary in summaries.items()})
+            for minute, summaries in minutes.items()
+        }
+        _dirty.clear()
+
+    timeout = (MAX_WINDOW_MINUTES + 5) * 60
+    for minute, payload in payloads.items():
+        try:
+            slot = _slots.get(minute)
+            if slot is None:
+                # Claim this worker's slot for the minute with one atomic increment
+                counter = f'heavy_hitters:{minute}:workers'
+                cache.add(counter, 0, timeout)
+                slot = _slots[minute] = cache.incr(counter) - 1
+            if slot >= MAX_WORKERS:
+                logger.warning(f"No free heavy-hitter slot for minute {minute}")
+                continue
+            cache.set(_slot_key(minute, slot), payload, timeout)
+        except Exception as e:
+            logger.warning(f"Heavy-hitter flush failed: {e}")
+
+
+def top(minutes=5, limit=10):
+    """Top IPs, users and endpoints over the last `minutes` minutes, across all workers"""
+    flush()
+
+    minutes = max(1, min(minutes, MAX_WINDOW_MINUTES))
+    current = int(time.time() // 60)
+    keys = [
+        _slot_key(minute, slot)
+        for minute in range(current - minutes + 1, current + 1)
+        for slot in range(MAX_WORKERS)
+    ]
+
+    capacity = _capacity()
+    combined = {name: SpaceSaving(capacity) for name in DIMENSIONS}
+    workers = set()
+    for worker_id, summaries in cache.get_many(keys).values():
+        workers.add(worker_id)
+        for name, data in summaries.items():
+            combined[name].merge(SpaceSaving.from_dict(capacity, data))
+
+    return {
+        'window_minutes': minutes,
+        'workers': len(workers),
+        **{name: combined[name].top(limit) for name in DIMENSIONS}
+    }
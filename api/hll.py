@@ -0,0 +1,138 @@
+"""
+Distinct active user estimates
+Per-day HyperLogLog sketches fed from request logging, merged across days and worker processes
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import flusher
+from .models import ActiveUserSketch
+
+logger = logging.getLogger(__name__)
+
+PRECISION = 14
+REGISTERS = 1 << PRECISION
+# Bias correction constant for m >= 128
+ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+WINDOWS = {'daily': 1, 'weekly': 7, 'monthly': 30}
+
+# Registers updated in this process and not yet written: date -> uint8 array
+_pending = {}
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def empty():
+    return np.zeros(REGISTERS, dtype=np.uint8)
+
+
+def position(identity):
+    """(register index, rank) for an identity string"""
+    value = int.from_bytes(hashlib.blake2b(identity.encode(), digest_size=8).digest(), 'big')
+    index = value >> (64 - PRECISION)
+    rest = value & ((1 << (64 - PRECISION)) - 1)
+    # Rank: position of the first set bit in the remaining 50 bits
+    return index, (64 - PRECISION) - rest.bit_length() + 1
+
+
+def estimate(registers):
+    """Cardinality estimate for one (possibly merged) register array"""
+    raw = ALPHA * REGISTERS * REGISTERS / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * REGISTERS and zeros:
+        # Linear counting is more accurate for small cardinalities
+        return REGISTERS * math.log(REGISTERS / zeros)
+    return raw
+
+
+def _decode(blob):
+    if not blob:
+        return empty()
+    return np.frombuffer(bytes(blob), dtype=np.uint8).copy()
+
+
+def record_active(identity, day=None):
+    """Add identity to the sketch for day (today by default)"""
+    if not identity:
+        return
+
+    day = day or timezone.now().date()
+    index, rank = position(identity)
+
+    with _pending_lock:
+        registers = _pending.get(day)
+        if registers is None:
+            registers = _pending[day] = empty()
+        if registers[index] < rank:
+            registers[index] = rank
+
+    # Also flushed on a timer and at exit, so a quiet worker's registers still get merged
+    flusher.register(flush, 'ACTIVE_USER_SKETCH_FLUSH_INTERVAL', 10)
+    if time.monotonic() - _last_flush >= getattr(settings, 'ACTIVE_USER_SKETCH_FLUSH_INTERVAL', 10):
+        flush()
+
+
+def flush():
+    """Merge pending registers into the stored sketches (register-wise max)"""
+    global _last_flush
+
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+
+    if not pending:
+        return
+
+    try:
+        with transaction.atomic():
+            stored = {
+                sketch.date: sketch
+                for sketch in ActiveUserSketch.objects.select_for_update().filter(date__in=list(pending))
+            }
+            for day, registers in pending.items():
+                sketch = stored.get(day)
+                if sketch is None:
+                    ActiveUserSketch.objects.create(date=day, registers=registers.tobytes())
+                else:
+                    sketch.registers = np.maximum(_decode(sketch.registers), registers).tobytes()
+                    sketch.save(update_fields=['registers', 'updated_at'])
+    except Exception as e:
+        # Put the registers back so the next flush retries them
+        logger.warning(f"Active user sketch flush failed: {e}")
+        with _pending_lock:
+            for day, registers in pending.items():
+                _pending[day] = np.maximum(_pending.get(day, empty()), registers)
+
+
+def merged(since, until):
+    """Union of the stored and pending sketches for days in [since, until]"""
+    registers = empty()
+    for blob in ActiveUserSketch.objects.filter(date__gte=since, date__lte=until).values_list('registers', flat=True):
+        np.maximum(registers, _decode(blob), out=registers)
+
+    with _pending_lock:
+        for day, pending in _pending.items():
+            if since <= day <= until:
+                np.maximum(registers, pending, out=registers)
+    return registers
+
+
+def active_users(today=None):
+    """Estimated distinct active users for the daily, weekly and monthly windows ending today"""
+    today = today or timezone.now().date()
+    return {
+        name: int(round(estimate(merged(today - timedelta(days=days - 1), today))))
+        for name, days in WINDOWS.items()
+    }
+
@@ -0,0 +1,39 @@
+"""
+Fill UserProfile.phone_e164 for profiles saved before it existed
+
+Profiles normalize their number on save; this catches up rows written
+earlier or through bulk updates.
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.models import UserProfile
+from api.phone import to_e164
+
+
+class Command(BaseCommand):
+    help = 'Normalize profile phone numbers to E.164 for address book matching'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Profiles updated per query')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        profiles = UserProfile.objects.exclude(phone_number__isnull=True).exclude(phone_number='')
+        changed = []
+        total = 0
+
+        for profile in profiles.only('id', 'phone_number', 'phone_e164').iterator(chunk_size=batch_size):
+            e164 = to_e164(profile.phone_number)
+            if e164 != profile.phone_e164:
+                profile.phone_e164 = e164
+                changed.append(profile)
+            if len(changed) >= batch_size:
+                UserProfile.objects.bulk_update(changed, ['phone_e164'])
+                total += len(changed)
+                changed = []
+
+        if changed:
+            UserProfile.objects.bulk_update(changed, ['phone_e164'])
+            total += len(changed)
+        self.stdout.write(self.style.SUCCESS(f'Normalized {total} phone numbers'))
@@ -0,0 +1,83 @@
+"""
+Benchmark the vectorized latency aggregation on synthetic APILog columns,
+and optionally the database fetch of a real APILog window
+
+Examples:
+    python manage.py benchmark_latency --rows 10000000
+    python manage.py benchmark_latency --db --hours 24
+"""
+
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import latency
+
+
+class Command(BaseCommand):
+    help = 'Time latency percentile aggregation over N synthetic log rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000, help='Synthetic rows to aggregate')
+        parser.add_argument('--endpoints', type=int, default=40, help='Distinct endpoints')
+        parser.add_argument('--hours', type=int, default=24, help='Window length in hours')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs (best is reported)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--db', action='store_true',
+                            help='Also time fetching the last --hours of APILog rows from the database')
+
+    def handle(self, *args, **options):
+        rows, hours = options['rows'], options['hours']
+        if options['db']:
+            self.benchmark_fetch(hours, options['repeat'])
+        rng = np.random.default_rng(options['seed'])
+        start = timezone.now() - timedelta(hours=hours)
+
+        self.stdout.write(f'Generating {rows:,} rows over {options["endpoints"]} endpoints...')
+        names = [f'/api/endpoint-{i}/' for i in range(options['endpoints'])]
+        # Skewed traffic: a few endpoints take most of the requests
+        weights = 1.0 / np.arange(1, len(names) + 1)
+        columns = (
+            rng.choice(len(names), size=rows, p=weights / weights.sum()).astype(np.int32),
+            names,
+            rng.choice(np.array([200, 201, 400, 404, 500], dtype=np.int16), size=rows,
+                       p=[0.85, 0.08, 0.03, 0.03, 0.01]),
+            rng.lognormal(mean=4.0, sigma=0.8, size=rows),
+            start.timestamp() + rng.uniform(0, hours * 3600, size=rows),
+        )
+
+        for label, by_endpoint in (('per endpoint + per hour', False), ('with endpoint x hour cells', True)):
+            timings = []
+            for _ in range(options['repeat']):
+                began = time.perf_counter()
+                payload = latency.summarize(*columns, start=start, hours=hours, hourly_by_endpoint=by_endpoint)
+                timings.append(time.perf_counter() - began)
+            self.stdout.write(f'{label}: best {min(timings) * 1000:.0f} ms over {options["repeat"]} runs')
+
+        overall = payload['overall']
+        self.stdout.write(self.style.SUCCESS(
+            f'overall p50={overall["p50_ms"]} p90={overall["p90_ms"]} p99={overall["p99_ms"]} '
+            f'error_rate={overall["error_rate"]}'
+        ))
+
+    def benchmark_fetch(self, hours, repeat):
+        until = timezone.now()
+        since = until - timedelta(hours=hours)
+        timings = []
+        for _ in range(repeat):
+            began = time.perf_counter()
+            columns = latency.load_window(since, until)
+            fetched = time.perf_counter()
+            latency.summarize(*columns, start=since, hours=hours)
+            timings.append((fetched - began, time.perf_counter() - fetched))
+
+        fetch, aggregate = min(timings)
+        count = len(columns[3])
+        rate = count / fetch if fetch else 0
+        self.stdout.write(
+            f'database window: {count:,} rows fetched in {fetch * 1000:.0f} ms ({rate:,.0f} rows/s), '
+            f'aggregated in {aggregate * 1000:.0f} ms'
+        )
@@ -0,0 +1,18 @@
+"""
+Delete revoked refresh tokens that have expired anyway
+
+Schedule daily, e.g. with cron:
+    0 4 * * * python manage.py prune_revoked_tokens
+"""
+
+from django.core.management.base import BaseCommand
+
+from api import tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked refresh tokens past their expiry'
+
+    def handle(self, *args, **options):
+        deleted = tokens.prune_revoked()
+        self.stdout.write(self.style.SUCCESS(f"Removed {deleted} expired token revocations"))
@@ -0,0 +1,26 @@
+"""
+Delete expired statuses with their views and audience rows
+
+Schedule every few minutes, e.g. with cron:
+    */10 * * * * python manage.py reap_statuses
+"""
+
+from django.core.management.base import BaseCommand
+
+from api import status_reaper
+
+
+class Command(BaseCommand):
+    help = 'Delete statuses past their expiry grace period or retention in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Statuses deleted per transaction')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+
+    def handle(self, *args, **options):
+        metrics = status_reaper.reap(batch_size=options['batch_size'], max_batches=options['max_batches'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {metrics['statuses']} statuses, {metrics['views']} views and "
+            f"{metrics['audience']} audience rows in {metrics['batches']} batches "
+            f"({metrics['duration_ms']}ms, slowest batch {metrics['max_batch_ms']}ms)"
+        ))
@@ -0,0 +1,34 @@
+"""
+Recompute per-user activity counters from the underlying tables
+
+Use after bulk imports or to backfill users created before the counters existed.
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api import activity, status_feed
+
+
+class Command(BaseCommand):
+    help = 'Rebuild UserActivity counters with grouped aggregate queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', action='append', help='Only rebuild these users (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Users per aggregate batch')
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['username']:
+            user_ids = list(
+                User.objects.filter(username__in=options['username']).values_list('id', flat=True)
+            )
+            if not user_ids:
+                raise CommandError('No matching users')
+
+        total = activity.rebuild(user_ids=user_ids, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt activity counters for {total} users'))
+
+        if not options['username']:
+            statuses = status_feed.rebuild_view_counts()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt view counts for {statuses} statuses'))
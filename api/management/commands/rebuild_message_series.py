@@ -0,0 +1,35 @@
+"""
+Recompute message volume series from the Message table
+
+Use after bulk imports, or to backfill history recorded before the series existed.
+Run with --prune-marks periodically (e.g. daily from cron) to drop stale sender marks:
+    0 3 * * * python manage.py rebuild_message_series --prune-marks
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import timeseries
+
+
+class Command(BaseCommand):
+    help = 'Rebuild hourly/daily message volume series and prune sender marks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Only rebuild this many days back (from the start of that month)')
+        parser.add_argument('--prune-marks', action='store_true', help='Only prune stale sender marks')
+
+    def handle(self, *args, **options):
+        if options['prune_marks']:
+            deleted = timeseries.prune_marks()
+            self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} sender marks'))
+            return
+
+        since = None
+        if options['days']:
+            since = timezone.now() - timedelta(days=options['days'])
+
+        rows = timeseries.rebuild(since=since)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} series rows'))
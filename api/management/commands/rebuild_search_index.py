@@ -0,0 +1,23 @@
+"""
+Rebuild the full-text message search index
+
+The index is created after migrate and kept in sync by database triggers
+(SQLite) or a generated column (Postgres); run this after restoring a
+database or bulk-loading messages with triggers disabled.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = 'Create and repopulate the message full-text search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias')
+
+    def handle(self, *args, **options):
+        if not search.rebuild(options['database']):
+            raise CommandError('Full-text search needs SQLite (FTS5) or PostgreSQL')
+        self.stdout.write(self.style.SUCCESS('Message search index rebuilt'))
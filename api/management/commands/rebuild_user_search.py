@@ -0,0 +1,22 @@
+"""
+Rebuild the user directory search index
+
+Users are indexed on save; run this after deploying the index, restoring a
+database or bulk-loading users (bulk_create and update() skip signals).
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from api import user_search
+
+
+class Command(BaseCommand):
+    help = 'Re-index usernames, names and emails for the user directory search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users indexed per transaction')
+
+    def handle(self, *args, **options):
+        total = user_search.rebuild(User.objects.all(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} users for search'))
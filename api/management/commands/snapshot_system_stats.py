@@ -0,0 +1,41 @@
+"""
+Close out the daily SystemStats row from the incrementally maintained counters
+
+Schedule once a day shortly before midnight (UTC), e.g. with cron:
+    55 23 * * * python manage.py snapshot_system_stats
+"""
+
+from datetime import date as date_cls
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import counters
+
+
+class Command(BaseCommand):
+    help = 'Write the current system counters into the SystemStats row for a day'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to write (YYYY-MM-DD), defaults to today')
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Recount every counter from its table first (slow, repairs drift)'
+        )
+
+    def handle(self, *args, **options):
+        day = None
+        if options['date']:
+            try:
+                day = date_cls.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['date']}")
+
+        if options['rebuild']:
+            counters.rebuild_counters()
+            self.stdout.write('Counters rebuilt from tables')
+
+        stats = counters.snapshot_system_stats(day)
+        self.stdout.write(self.style.SUCCESS(
+            f'Stats for {stats.date}: {stats.total_users} users, '
+            f'{stats.total_messages} messages, {stats.total_api_calls} API calls'
+        ))
@@ -0,0 +1,64 @@
+"""
+Bulk group membership
+Adds and removes many group members with one username lookup and one write,
+reporting usernames that don't exist
+"""
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from . import activity, group_cache
+from .models import GroupMembership
+
+MAX_MEMBERS = 5000
+
+
+def resolve(usernames):
+    """({username: user_id}, sorted unknown usernames) with one IN query"""
+    usernames = {str(username) for username in usernames if username}
+    found = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+    return found, sorted(usernames - set(found))
+
+
+def add(group, user_ids, admin_ids=()):
+    """
+    Make user_ids members of group; returns the ids that weren't members yet
+
+    Existing memberships are left as they are. bulk_create skips the
+    GroupMembership signals, so the members' group counters are bumped here.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return set()
+
+    with transaction.atomic():
+        existing = set(
+            GroupMembership.objects.filter(group=group, user_id__in=user_ids).values_list('user_id', flat=True)
+        )
+        new = user_ids - existing
+        GroupMembership.objects.bulk_create(
+            [GroupMembership(group=group, user_id=user_id, is_admin=user_id in admin_ids) for user_id in sorted(new)],
+            ignore_conflicts=True
+        )
+        activity.bump_many(new, groups=1)
+        # bulk_create also skips the signals that invalidate the group membership cache
+        group_cache.forget(group.id)
+    return new
+
+
+def remove(group, user_ids):
+    """
+    Remove user_ids from group; returns the ids that were members
+
+    A regular delete, so the GroupMembership post_delete signals adjust the
+    members' group counters and drop the cached members.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return set()
+
+    with transaction.atomic():
+        memberships = GroupMembership.objects.filter(group=group, user_id__in=user_ids)
+        removed = set(memberships.values_list('user_id', flat=True))
+        memberships.delete()
+    return removed
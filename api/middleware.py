@@ -0,0 +1,144 @@
+"""
+Request middleware for the API
+"""
+
+import json
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from . import heavy_hitters, tokens
+
+# Request params that name the acting user, in order of preference
+ACTING_USER_PARAMS = ('username', 'sender', 'admin_username')
+# Every param a view takes as the calling user; with a bearer token they must name the token's user
+CALLER_PARAMS = ('username', 'sender', 'caller', 'creator', 'admin', 'admin_username')
+# Endpoints whose username param is not the caller (credentials, or the profile being looked up)
+CALLER_UNCHECKED_PATHS = ('/api/signup/', '/api/login/', '/api/token/refresh/', '/api/user-profile/')
+# JSON bodies larger than this are not inspected for a username
+MAX_INSPECTED_BODY = 4096
+
+
+def _client_ip(request):
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded:
+        return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+def _request_data(request, max_body=MAX_INSPECTED_BODY):
+    """Form or JSON body params of a request, without consuming the body stream (max_body=None: any size)"""
+    if request.method != 'POST':
+        return {}
+    if request.content_type in ('application/x-www-form-urlencoded', 'multipart/form-data'):
+        return request.POST
+    length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if request.content_type == 'application/json' and 0 < length and (max_body is None or length <= max_body):
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return {}
+
+
+def _resolve_acting_username(request):
+    claims = getattr(request, 'token_claims', None)
+    if claims is not None:
+        return claims['u']
+
+    for param in ACTING_USER_PARAMS:
+        if request.GET.get(param):
+            return request.GET[param]
+
+    data = _request_data(request)
+    for param in ACTING_USER_PARAMS:
+        if data.get(param):
+            return str(data[param])
+
+    # Only a request carrying a session cookie is worth a session read
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.username
+    return None
+
+
+def _named_callers(request):
+    """[(param, username)] for every caller param of the request"""
+    if request.path in CALLER_UNCHECKED_PATHS:
+        return []
+    # The whole body is read, so a large request can't hide a different caller
+    sources = (request.GET, _request_data(request, max_body=None))
+    return [(param, str(source[param])) for source in sources for param in CALLER_PARAMS if source.get(param)]
+
+
+def acting_username(request):
+    """
+    Username of the user making the request, if it can be told
+
+    The bearer token's user, else the first username-like request param,
+    else the session user. The session is only read when the request has a
+    session cookie and named no user. Resolved once per request; views pass
+    their DRF request and get the value the middleware already worked out.
+    """
+    request = getattr(request, '_request', request)
+    if not hasattr(request, '_acting_username'):
+        request._acting_username = _resolve_acting_username(request)
+    return request._acting_username
+
+
+class HeavyHitterMiddleware:
+    """Feed every API request into the per-worker heavy-hitter summaries"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Read before the view so the body is cached for it
+        username = acting_username(request) if request.path.startswith('/api/') else None
+        response = self.get_response(request)
+
+        if request.path.startswith('/api/'):
+            heavy_hitters.record(ip=_client_ip(request), user=username, endpoint=request.path)
+        return response
+
+
+class TokenAuthenticationMiddleware:
+    """
+    Authenticate requests carrying a signed bearer token
+
+    The token is verified by signature alone, so an authenticated request
+    costs neither a password hash nor a session or user query. Requests
+    without a token keep the session user; invalid tokens are reported as
+    request.token_error and rejected by SignedTokenAuthentication.
+
+    Views name their caller with params such as username or sender. With a
+    token, those params must name the token's user (403 otherwise). With
+    REQUIRE_TOKEN_AUTH, API requests naming a caller must carry a token.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.token_claims = None
+        request.token_error = None
+
+        token = tokens.bearer_token(request)
+        if token:
+            try:
+                request.token_claims = tokens.verify_access(token)
+            except tokens.InvalidToken as e:
+                request.token_error = str(e)
+            else:
+                request.user = tokens.token_user(request.token_claims)
+
+        if request.path.startswith('/api/'):
+            if request.token_claims is not None:
+                for param, username in _named_callers(request):
+                    if username != request.token_claims['u']:
+                        return JsonResponse({'error': f'{param} does not match the authenticated user'}, status=403)
+            elif getattr(settings, 'REQUIRE_TOKEN_AUTH', False) and _named_callers(request):
+                return JsonResponse({'error': request.token_error or 'Bearer token required'}, status=401)
+        return self.get_response(request)
@@ -2,7 +2,21 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 
-class UserProfile(models.Model):
+from .phone import to_e164
+
+class LoadedValuesMixin:
+    """Remember tracked field values as loaded from the database so signal handlers can see what changed"""
+    tracked_fields = ()
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: getattr(instance, name) for name in cls.tracked_fields if name in field_names
+        }
+        return instance
+
+class UserProfile(LoadedValuesMixin, models.Model):
     """Extended user profile with additional fields"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     role = models.CharField(max_length=20, choices=[('user', 'User'), ('admin', 'Admin')], default='user')
@@ -13,6 +27,8 @@ class UserProfile(models.Model):
     avatar = models.URLField(blank=True, null=True)
     status = models.CharField(max_length=200, blank=True, default='Hey there! I am using White Beat')
     phone_number = models.CharField(max_length=20, blank=True, null=True)
+    phone_e164 = models.CharField(max_length=16, blank=True, null=True, db_index=True, editable=False,
+                                  help_text='phone_number normalized to E.164, for address book matching')
     bio = models.TextField(blank=True, null=True)
     is_online = models.BooleanField(default=False)
     last_seen = models.DateTimeField(null=True, blank=True)
@@ -34,10 +50,19 @@ class UserProfile(models.Model):
         default='everyone'
     )
     
+    tracked_fields = ('is_online',)
+    
     class Meta:
         verbose_name = 'User Profile'
         verbose_name_plural = 'User Profiles'
     
+    def save(self, *args, **kwargs):
+        self.phone_e164 = to_e164(self.phone_number)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'phone_e164'}
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.user.username} ({self.role})"
 
@@ -180,7 +205,7 @@ class MessageReaction(models.Model):
     def __str__(self):
         return f"{self.user.username} reacted {self.get_reaction_type_display()} to message {self.message.id}"
 
-class Call(models.Model):
+class Call(LoadedValuesMixin, models.Model):
     """Track voice and video calls"""
     CALL_TYPES = [
         ('audio', 'Audio Call'),
@@ -212,6 +237,8 @@ class Call(models.Model):
     # WebRTC signaling data
     room_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
     
+    tracked_fields = ('status', 'duration')
+    
     class Meta:
         verbose_name = 'Call'
         verbose_name_plural = 'Calls'
@@ -248,6 +275,7 @@ class Status(models.Model):
     hidden_from = models.ManyToManyField(User, related_name='hidden_statuses', blank=True)
     
     viewed_by = models.ManyToManyField(User, through='StatusView', related_name='viewed_statuses')
+    view_count = models.PositiveIntegerField(default=0, help_text='Maintained from StatusView rows')
     
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
@@ -256,6 +284,13 @@ class Status(models.Model):
         verbose_name = 'Status'
         verbose_name_plural = 'Statuses'
         ordering = ['-created_at']
+        indexes = [
+            # Active statuses of a set of authors (the status feed)
+            models.Index(fields=['user', 'expires_at'], name='status_user_expires_idx'),
+            # Expired and over-retention statuses for the reaper
+            models.Index(fields=['expires_at'], name='status_expires_idx'),
+            models.Index(fields=['created_at'], name='status_created_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.expires_at:
@@ -311,6 +346,11 @@ class APILog(models.Model):
         verbose_name = 'API Log'
         verbose_name_plural = 'API Logs'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='apilog_created_idx'),
+            models.Index(fields=['endpoint', 'created_at'], name='apilog_endpoint_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='apilog_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.method} {self.endpoint} - {self.status_code}"
@@ -334,3 +374,190 @@ class SystemStats(models.Model):
     
     def __str__(self):
         return f"Stats for {self.date}"
+
+class SystemCounter(models.Model):
+    """Incrementally maintained system-wide totals, split into shards to spread write contention"""
+    name = models.CharField(max_length=50)
+    shard = models.PositiveSmallIntegerField(default=0)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = [['name', 'shard']]
+        verbose_name = 'System Counter'
+        verbose_name_plural = 'System Counters'
+    
+    def __str__(self):
+        return f"{self.name}[{self.shard}] = {self.value}"
+
+class UserActivity(models.Model):
+    """Per-user activity counters maintained by the write paths, read by user analytics"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='activity')
+    
+    contacts = models.IntegerField(default=0)
+    groups = models.IntegerField(default=0)
+    conversations = models.IntegerField(default=0)
+    
+    messages_sent = models.IntegerField(default=0)
+    messages_received = models.IntegerField(default=0)
+    reactions_given = models.IntegerField(default=0)
+    reactions_received = models.IntegerField(default=0)
+    
+    calls_made = models.IntegerField(default=0)
+    calls_received = models.IntegerField(default=0)
+    call_duration = models.BigIntegerField(default=0, help_text='Completed call duration in seconds')
+    
+    statuses_posted = models.IntegerField(default=0)
+    status_views_given = models.IntegerField(default=0)
+    status_views_received = models.IntegerField(default=0)
+    
+    # "Today" bucket, reset whenever a write lands on a new day
+    today = models.DateField(null=True, blank=True)
+    messages_today = models.IntegerField(default=0)
+    calls_today = models.IntegerField(default=0)
+    statuses_today = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'User Activity'
+        verbose_name_plural = 'User Activity'
+    
+    def __str__(self):
+        return f"Activity for {self.user.username}"
+
+class MessageVolumeSeries(models.Model):
+    """
+    One block of a message-volume time series
+    
+    Hourly series store one row per day (24 buckets), daily series one row per
+    month (31 buckets). counts and senders are little-endian uint32 arrays.
+    """
+    SCOPES = (
+        ('global', 'Global'),
+        ('conversation', 'Conversation'),
+        ('group', 'Group'),
+        ('user', 'User'),
+    )
+    
+    RESOLUTIONS = (
+        ('hour', 'Hourly'),
+        ('day', 'Daily'),
+    )
+    
+    scope = models.CharField(max_length=20, choices=SCOPES)
+    scope_id = models.BigIntegerField(default=0)
+    resolution = models.CharField(max_length=10, choices=RESOLUTIONS)
+    period_start = models.DateField()
+    
+    counts = models.BinaryField()
+    senders = models.BinaryField()
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = [['scope', 'scope_id', 'resolution', 'period_start']]
+        verbose_name = 'Message Volume Series'
+        verbose_name_plural = 'Message Volume Series'
+    
+    def __str__(self):
+        return f"{self.scope}:{self.scope_id} {self.resolution} from {self.period_start}"
+
+class SeriesSenderMark(models.Model):
+    """Records that a user already sent in a series bucket, so active senders are counted once"""
+    scope = models.CharField(max_length=20)
+    scope_id = models.BigIntegerField(default=0)
+    resolution = models.CharField(max_length=10)
+    bucket_start = models.DateTimeField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    
+    class Meta:
+        unique_together = [['scope', 'scope_id', 'resolution', 'bucket_start', 'user']]
+        indexes = [models.Index(fields=['bucket_start'], name='seriesmark_bucket_idx')]
+    
+    def __str__(self):
+        return f"{self.user_id} in {self.scope}:{self.scope_id} {self.resolution} {self.bucket_start}"
+
+class CohortReport(models.Model):
+    """Weekly signup cohort retention matrix, rebuilt by the build_cohorts command"""
+    weeks = models.PositiveSmallIntegerField()
+    data = models.JSONField()
+    generated_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        get_latest_by = 'generated_at'
+        verbose_name = 'Cohort Report'
+        verbose_name_plural = 'Cohort Reports'
+    
+    def __str__(self):
+        return f"Cohorts ({self.weeks} weeks) at {self.generated_at}"
+
+class ActiveUserSketch(models.Model):
+    """HyperLogLog registers of the distinct users active on one day (one byte per register)"""
+    date = models.DateField(unique=True)
+    registers = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Active User Sketch'
+        verbose_name_plural = 'Active User Sketches'
+    
+    def __str__(self):
+        return f"Active users sketch for {self.date}"
+
+class AnomalyAlert(models.Model):
+    """A per-minute request rate or latency reading that deviated from its running average"""
+    METRICS = (
+        ('rate', 'Request rate'),
+        ('latency', 'Latency'),
+    )
+    
+    endpoint = models.CharField(max_length=200)
+    metric = models.CharField(max_length=20, choices=METRICS)
+    value = models.FloatField()
+    expected = models.FloatField()
+    z_score = models.FloatField()
+    window_start = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['created_at', 'id'], name='anomaly_created_idx')]
+    
+    def __str__(self):
+        return f"{self.metric} anomaly on {self.endpoint} (z={self.z_score:.1f})"
+
+class UserSearchTerm(models.Model):
+    """Lowercased username, name and email tokens of a user, for indexed prefix search"""
+    term = models.CharField(max_length=150)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveSmallIntegerField(default=1, help_text='Relevance of the field the term came from')
+    
+    class Meta:
+        unique_together = [['term', 'user']]
+    
+    def __str__(self):
+        return f"{self.term} -> {self.user_id}"
+
+class AddressBookSync(models.Model):
+    """Last address book a user uploaded, for incremental re-syncs"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='address_book_sync')
+    numbers = models.TextField(blank=True, default='', help_text='Sorted E.164 numbers, comma separated')
+    digest = models.CharField(max_length=64, help_text='SHA-256 of numbers')
+    matched = models.PositiveIntegerField(default=0)
+    synced_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Address Book Sync'
+        verbose_name_plural = 'Address Book Syncs'
+    
+    def __str__(self):
+        return f"{self.user.username}'s address book ({self.digest[:8]})"
+
+class RevokedToken(models.Model):
+    """A refresh token that was used or revoked, kept until it would have expired anyway"""
+    jti = models.CharField(max_length=32, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"Revoked token {self.jti}"
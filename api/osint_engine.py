@@ -10,6 +10,8 @@ from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
 import re
 
+from . import phone as phone_numbers
+
 logger = logging.getLogger(__name__)
 
 
@@ -103,25 +105,21 @@ class OSINTEngine:
             Phone number details
         """
         # Remove non-numeric characters
-        clean_phone = re.sub(r'\D', '', phone)
+        clean_phone = phone_numbers.clean(phone)
         
         result = {
             'phone': phone,
             'clean_phone': clean_phone,
+            'e164': phone_numbers.to_e164(phone),
             'length': len(clean_phone),
             'valid': len(clean_phone) >= 10,
         }
         
         # Detect country code
-        if clean_phone.startswith('91') and len(clean_phone) == 12:
-            result['country'] = 'India'
-            result['country_code'] = '+91'
-        elif clean_phone.startswith('1') and len(clean_phone) == 11:
-            result['country'] = 'USA/Canada'
-            result['country_code'] = '+1'
-        elif clean_phone.startswith('44') and len(clean_phone) == 12:
-            result['country'] = 'UK'
-            result['country_code'] = '+44'
+        country_code, country = phone_numbers.country_of(clean_phone)
+        if country_code:
+            result['country'] = country
+            result['country_code'] = f'+{country_code}'
         
         return result
     
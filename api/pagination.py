@@ -0,0 +1,117 @@
+"""
+Pagination helpers
+Keyset (cursor) pages addressed by the sort key of the last row seen instead of an OFFSET,
+and an offset paginator that avoids exact COUNT(*) on very large tables
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .count_cache import approximate_count
+
+# Filtered result sets are counted exactly up to this many rows
+ESTIMATED_COUNT_LIMIT = 10000
+
+
+def encode_cursor(values):
+    """Serialize a list of sort-key values into an opaque URL-safe cursor"""
+    encoded = [
+        {'dt': value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(encoded).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        encoded = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(encoded, list):
+        raise ValueError('Invalid cursor')
+
+    values = []
+    for value in encoded:
+        if isinstance(value, dict):
+            value = parse_datetime(value.get('dt', ''))
+            if value is None:
+                raise ValueError('Invalid cursor')
+        values.append(value)
+    return values
+
+
+def after_cursor(fields, values, descending=True):
+    """Q matching rows strictly past the cursor position in (fields) order"""
+    op = 'lt' if descending else 'gt'
+    condition = Q()
+    for i, field in enumerate(fields):
+        clause = Q(**{f'{field}__{op}': values[i]})
+        for previous_field, previous_value in zip(fields[:i], values[:i]):
+            clause &= Q(**{previous_field: previous_value})
+        condition |= clause
+    return condition
+
+
+def _sort_value(row, field):
+    if isinstance(row, dict):
+        return row[field]
+    value = row
+    for part in field.split('__'):
+        value = getattr(value, part)
+    return value
+
+
+def paginate(queryset, fields, cursor=None, limit=50, descending=True):
+    """
+    Return (rows, next_cursor) for one page of queryset ordered by fields
+
+    fields must end with a unique column (usually 'id') so the order is total.
+    next_cursor is None on the last page.
+    """
+    ordering = [f'-{field}' if descending else field for field in fields]
+    queryset = queryset.order_by(*ordering)
+
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(fields):
+            raise ValueError('Invalid cursor')
+        queryset = queryset.filter(after_cursor(fields, values, descending))
+
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor([_sort_value(rows[-1], field) for field in fields])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for very large tables (e.g. the admin changelists of Message and APILog)
+
+    Unfiltered lists use the database's table statistics instead of COUNT(*).
+    Filtered lists are counted with a bounded subquery, so at most
+    ESTIMATED_COUNT_LIMIT rows are scanned and later pages are reached by
+    narrowing the filter.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return super().count
+
+        if not queryset.query.where:
+            estimate = approximate_count(queryset.model)
+            if estimate is not None and estimate > ESTIMATED_COUNT_LIMIT:
+                return estimate
+
+        return queryset.order_by()[:ESTIMATED_COUNT_LIMIT].count()
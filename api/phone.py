@@ -0,0 +1,58 @@
+"""
+Phone number normalization
+E.164 formatting of user-entered numbers, for matching address books against profiles
+"""
+
+import re
+
+# (country code, total digits with country code, country) recognised without a leading +
+KNOWN_COUNTRIES = [
+    ('91', 12, 'India'),
+    ('1', 11, 'USA/Canada'),
+    ('44', 12, 'UK'),
+]
+
+# E.164 allows at most 15 digits; shorter than 8 is not a dialable international number
+MIN_DIGITS = 8
+MAX_DIGITS = 15
+
+
+def clean(number):
+    """Digits of a number with all formatting removed"""
+    return re.sub(r'\D', '', number or '')
+
+
+def country_of(digits):
+    """(country code, country) for a full international number in digits, or (None, None)"""
+    for code, length, country in KNOWN_COUNTRIES:
+        if digits.startswith(code) and len(digits) == length:
+            return code, country
+    return None, None
+
+
+def to_e164(number, default_country_code=None):
+    """
+    '+<digits>' for a user-entered number, or None if it can't be normalized
+
+    Numbers written with + or a 00 international prefix keep their country
+    code; bare numbers that look like a known country's full number are taken
+    as-is; anything else is a national number in default_country_code, with
+    its trunk prefix (leading 0) dropped.
+    """
+    number = (number or '').strip()
+    digits = clean(number)
+    if not digits:
+        return None
+
+    if number.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif not country_of(digits)[0]:
+        if not default_country_code:
+            return None
+        digits = clean(default_country_code) + digits.lstrip('0')
+
+    if not MIN_DIGITS <= len(digits) <= MAX_DIGITS:
+        return None
+    return '+' + digits
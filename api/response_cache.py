@@ -0,0 +1,141 @@
+"""
+Response cache for admin dashboard endpoints
+Stale-while-revalidate with single-flight computation, invalidated by TTL or an explicit version bump
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'response_cache:version'
+
+
+class _Flight:
+    """One in-progress computation that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate():
+    """Bump the cache version so every cached dashboard response is recomputed"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+def _cache_key(namespace, params):
+    digest = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f'response_cache:{namespace}:v{_version()}:{digest}'
+
+
+def _compute_and_store(key, compute):
+    ttl = _setting('RESPONSE_CACHE_TTL', 30)
+    stale_ttl = _setting('RESPONSE_CACHE_STALE_TTL', 300)
+    wait = _setting('RESPONSE_CACHE_WAIT', 10)
+    lock_key = f'{key}:lock'
+
+    # Another worker process may already be computing this key
+    locked = cache.add(lock_key, 1, wait)
+    if not locked:
+        deadline = time.time() + wait
+        while time.time() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+
+    try:
+        payload = compute()
+        cache.set(key, (payload, time.time()), ttl + stale_ttl)
+        return payload
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def _single_flight(key, compute):
+    """Run compute once per key at a time; concurrent callers share its result"""
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if not flight.done.wait(_setting('RESPONSE_CACHE_WAIT', 10)):
+            return compute()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = _compute_and_store(key, compute)
+        return flight.result
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def _revalidate(key, compute):
+    try:
+        _single_flight(key, compute)
+    except Exception as e:
+        logger.warning(f"Background revalidation failed for {key}: {e}")
+    finally:
+        connections.close_all()
+
+
+def get_or_compute(namespace, params, compute):
+    """
+    Return the cached payload for (namespace, params), computing it if needed
+
+    Fresh entries are returned directly. Entries older than RESPONSE_CACHE_TTL
+    are still returned, but trigger one background recomputation. On a miss,
+    concurrent identical requests wait for a single computation.
+    """
+    key = _cache_key(namespace, params)
+    entry = cache.get(key)
+
+    if entry is None:
+        return _single_flight(key, compute)
+
+    payload, computed_at = entry
+    if time.time() - computed_at > _setting('RESPONSE_CACHE_TTL', 30):
+        with _flights_lock:
+            in_flight = key in _flights
+        if not in_flight:
+            threading.Thread(target=_revalidate, args=(key, compute), daemon=True).start()
+
+    return payload
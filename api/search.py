@@ -0,0 +1,165 @@
+"""
+Full-text message search
+SQLite FTS5 (external-content table kept in sync by triggers) or a Postgres tsvector column,
+with ranked keyset pagination scoped to the caller's conversations and groups
+"""
+
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from .models import Message
+
+FTS_TABLE = 'api_message_fts'
+SEARCH_COLUMN = 'search_vector'
+MAX_TERMS = 8
+
+SQLITE_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        content, content='api_message', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    # Recreated on every install, so databases with older trigger definitions pick up changes
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    # Messages deleted for everyone are dropped from the index, like get_messages hides them
+    # ("delete for me" leaves them visible to the other participant); edits replace the indexed text
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON api_message BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content) SELECT new.id, new.content WHERE NOT new.deleted_for_everyone;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON api_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content)
+            SELECT 'delete', old.id, old.content WHERE NOT old.deleted_for_everyone;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF content, deleted_for_everyone ON api_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content)
+            SELECT 'delete', old.id, old.content WHERE NOT old.deleted_for_everyone;
+        INSERT INTO {FTS_TABLE}(rowid, content) SELECT new.id, new.content WHERE NOT new.deleted_for_everyone;
+    END""",
+]
+
+POSTGRES_SCHEMA = [
+    f"""ALTER TABLE api_message ADD COLUMN IF NOT EXISTS {SEARCH_COLUMN} tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(content, ''))) STORED""",
+    f"CREATE INDEX IF NOT EXISTS api_message_search_idx ON api_message USING GIN ({SEARCH_COLUMN})",
+]
+
+
+def vendor(using='default'):
+    """'sqlite' or 'postgresql' when the index is supported on this database, else None"""
+    name = connections[using].vendor
+    return name if name in ('sqlite', 'postgresql') else None
+
+
+def install(using='default'):
+    """Create the index structures (idempotent; run after migrations)"""
+    statements = {'sqlite': SQLITE_SCHEMA, 'postgresql': POSTGRES_SCHEMA}.get(vendor(using))
+    if not statements:
+        return False
+
+    with connections[using].cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    return True
+
+
+def rebuild(using='default'):
+    """Re-index every message not deleted for everyone (SQLite); Postgres keeps its generated column current"""
+    if vendor(using) != 'sqlite':
+        return install(using)
+
+    install(using)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('delete-all')")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, content) "
+            f"SELECT id, content FROM api_message WHERE NOT deleted_for_everyone"
+        )
+    return True
+
+
+def terms(query):
+    """Words of a user query, stripped of any search syntax"""
+    return re.findall(r'\w+', query or '')[:MAX_TERMS]
+
+
+def _match_expression(words, backend):
+    # Every word must match; the last one may be a prefix (search-as-you-type)
+    if backend == 'sqlite':
+        quoted = [f'"{word}"' for word in words]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+    return ' & '.join(words[:-1] + [f'{words[-1]}:*'])
+
+
+def _ranked_sql(backend, scoped, after):
+    """SQL selecting (id, score) of matching messages, best (lowest score) first"""
+    if backend == 'sqlite':
+        inner = (
+            f"SELECT m.id AS id, bm25({FTS_TABLE}) AS score "
+            f"FROM {FTS_TABLE} JOIN api_message m ON m.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND NOT m.deleted_for_everyone"
+        )
+    else:
+        inner = (
+            f"SELECT m.id AS id, -ts_rank_cd(m.{SEARCH_COLUMN}, to_tsquery('simple', %s)) AS score "
+            f"FROM api_message m "
+            f"WHERE m.{SEARCH_COLUMN} @@ to_tsquery('simple', %s) AND NOT m.deleted_for_everyone"
+        )
+
+    if scoped:
+        inner += (
+            " AND (m.conversation_id IN "
+            "(SELECT id FROM api_conversation WHERE user1_id = %s OR user2_id = %s)"
+            " OR m.group_id IN (SELECT group_id FROM api_groupmembership WHERE user_id = %s))"
+        )
+
+    sql = f"SELECT id, score FROM ({inner}) ranked"
+    if after:
+        sql += " WHERE score > %s OR (score = %s AND id > %s)"
+    return sql + " ORDER BY score, id LIMIT %s"
+
+
+def _search_unindexed(words, user_id, after, limit, using):
+    """Unranked substring fallback for databases without a supported index"""
+    messages = Message.objects.using(using).filter(deleted_for_everyone=False)
+    for word in words:
+        messages = messages.filter(content__icontains=word)
+    if user_id is not None:
+        messages = messages.filter(
+            Q(conversation__user1_id=user_id) | Q(conversation__user2_id=user_id) |
+            Q(group__groupmembership__user_id=user_id)
+        )
+    if after:
+        messages = messages.filter(id__gt=after[0])
+    ids = messages.distinct().order_by('id').values_list('id', flat=True)[:limit]
+    return [(message_id, 0.0) for message_id in ids]
+
+
+def search(query, user_id=None, after=None, limit=20, using='default'):
+    """
+    Ranked (message_id, score) pairs for query, best match first
+
+    user_id restricts results to that user's conversations and groups
+    (None searches everything, for admin use). after is the last
+    (message_id, score) pair of the previous page.
+    """
+    backend = vendor(using)
+    words = terms(query)
+    if not words:
+        return []
+    if not backend:
+        return _search_unindexed(words, user_id, after, limit, using)
+
+    expression = _match_expression(words, backend)
+    params = [expression] if backend == 'sqlite' else [expression, expression]
+    if user_id is not None:
+        params += [user_id, user_id, user_id]
+    if after:
+        params += [after[1], after[1], after[0]]
+    params.append(limit)
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(_ranked_sql(backend, user_id is not None, after), params)
+        return cursor.fetchall()
@@ -0,0 +1,334 @@
+"""
+Model signal handlers
+Keeps denormalized counters in step with writes made anywhere (views, admin, shell)
+"""
+
+from django.contrib.auth.models import Group as DjangoGroup, User
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_migrate, post_save, post_delete
+from django.dispatch import receiver
+
+from . import activity, authz, contact_graph, counters, group_cache, search, timeseries, user_cache, user_search
+from .models import (
+    UserProfile, Conversation, Message, MessageReaction,
+    Call, Status, StatusView, Contact, Group, GroupMembership,
+    APILog, UserActivity
+)
+
+# Model -> system counter tracking its row count
+COUNTED_MODELS = {
+    User: 'users',
+    Message: 'messages',
+    Conversation: 'conversations',
+    MessageReaction: 'reactions',
+    Group: 'groups',
+    Call: 'calls',
+    Status: 'statuses',
+    APILog: 'api_calls',
+}
+
+
+def _count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.increment(COUNTED_MODELS[sender])
+
+
+def _count_deleted(sender, instance, **kwargs):
+    counters.increment(COUNTED_MODELS[sender], -1)
+
+
+for _model in COUNTED_MODELS:
+    post_save.connect(_count_created, sender=_model, dispatch_uid=f'count_created_{_model.__name__}')
+    post_delete.connect(_count_deleted, sender=_model, dispatch_uid=f'count_deleted_{_model.__name__}')
+
+
+@receiver(post_save, sender=UserProfile)
+def track_online_users(sender, instance, created, raw=False, **kwargs):
+    """Keep the online_users counter in step with is_online transitions"""
+    if raw:
+        return
+
+    loaded = getattr(instance, '_loaded_values', {})
+    was_online = False if created else loaded.get('is_online', instance.is_online)
+    if instance.is_online != was_online:
+        counters.increment('online_users', 1 if instance.is_online else -1)
+
+    # The same instance may be saved again later in the request
+    instance._loaded_values = {**loaded, 'is_online': instance.is_online}
+
+
+@receiver(post_delete, sender=UserProfile)
+def untrack_online_user(sender, instance, **kwargs):
+    if instance.is_online:
+        counters.increment('online_users', -1)
+
+
+# ============= USERNAME RESOLUTION CACHE =============
+
+def _forget_cached_user(user_id, username=None):
+    user_cache.invalidate(user_id, username)
+    # Again after commit, in case another request cached the old row in between
+    transaction.on_commit(lambda: user_cache.invalidate(user_id, username))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Logins only touch last_login, which isn't cached
+    if raw or (update_fields and not set(user_cache.USER_FIELDS).intersection(update_fields)):
+        return
+    _forget_cached_user(instance.pk, instance.username)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and not set(user_cache.PROFILE_FIELDS).intersection(update_fields)):
+        return
+    _forget_cached_user(instance.user_id)
+
+
+# ============= AUTHORIZATION CACHE =============
+
+def _forget_roles(user_id):
+    authz.invalidate(user_id)
+    transaction.on_commit(lambda: authz.invalidate(user_id))
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_role(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and 'role' not in update_fields):
+        return
+    _forget_roles(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_roles(sender, instance, created=True, raw=False, **kwargs):
+    # Only new and deleted users; a reused id mustn't inherit cached roles
+    if raw or not created:
+        return
+    _forget_roles(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _forget_roles(instance.pk)
+    elif pk_set:
+        for user_id in pk_set:
+            _forget_roles(user_id)
+    else:
+        # group.user_set.clear() doesn't say which users left
+        authz.invalidate_all()
+        transaction.on_commit(authz.invalidate_all)
+
+
+@receiver(post_save, sender=DjangoGroup)
+@receiver(post_delete, sender=DjangoGroup)
+def invalidate_group_roles(sender, instance, created=False, raw=False, **kwargs):
+    # A new group has no members yet; renames and deletes change members' group names
+    if raw or created:
+        return
+    authz.invalidate_all()
+    transaction.on_commit(authz.invalidate_all)
+
+
+# ============= PER-USER ACTIVITY =============
+
+@receiver(post_save, sender=User)
+def create_user_activity(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserActivity.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Message)
+def count_message_sent(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        activity.bump(instance.sender_id, today=('messages_today',), messages_sent=1)
+        activity.bump(instance.receiver_id, messages_received=1)
+
+
+@receiver(post_save, sender=Message)
+def record_message_volume(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeseries.record_message_on_commit(instance)
+
+
+@receiver(post_delete, sender=Message)
+def uncount_message(sender, instance, **kwargs):
+    activity.bump(instance.sender_id, messages_sent=-1)
+    activity.bump(instance.receiver_id, messages_received=-1)
+
+
+def _reaction_owner_id(reaction):
+    return Message.objects.filter(pk=reaction.message_id).values_list('sender_id', flat=True).first()
+
+
+@receiver(post_save, sender=MessageReaction)
+def count_reaction(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        activity.bump(instance.user_id, reactions_given=1)
+        activity.bump(instance.message.sender_id, reactions_received=1)
+
+
+@receiver(post_delete, sender=MessageReaction)
+def uncount_reaction(sender, instance, **kwargs):
+    activity.bump(instance.user_id, reactions_given=-1)
+    activity.bump(_reaction_owner_id(instance), reactions_received=-1)
+
+
+def _completed_duration(status, duration):
+    return duration if status == 'completed' else 0
+
+
+@receiver(post_save, sender=Call)
+def count_call(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    if created:
+        activity.bump(instance.caller_id, today=('calls_today',), calls_made=1)
+        activity.bump(instance.receiver_id, calls_received=1)
+        previous = 0
+    else:
+        loaded = getattr(instance, '_loaded_values', {})
+        previous = _completed_duration(loaded.get('status'), loaded.get('duration', 0))
+
+    delta = _completed_duration(instance.status, instance.duration) - previous
+    if delta:
+        activity.bump(instance.caller_id, call_duration=delta)
+        activity.bump(instance.receiver_id, call_duration=delta)
+
+    instance._loaded_values = {'status': instance.status, 'duration': instance.duration}
+
+
+@receiver(post_delete, sender=Call)
+def uncount_call(sender, instance, **kwargs):
+    duration = _completed_duration(instance.status, instance.duration)
+    activity.bump(instance.caller_id, calls_made=-1, call_duration=-duration)
+    activity.bump(instance.receiver_id, calls_received=-1, call_duration=-duration)
+
+
+@receiver(post_save, sender=Status)
+def count_status(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        activity.bump(instance.user_id, today=('statuses_today',), statuses_posted=1)
+
+
+@receiver(post_delete, sender=Status)
+def uncount_status(sender, instance, **kwargs):
+    activity.bump(instance.user_id, statuses_posted=-1)
+
+
+@receiver(post_save, sender=StatusView)
+def count_status_view(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        activity.bump(instance.user_id, status_views_given=1)
+        activity.bump(instance.status.user_id, status_views_received=1)
+        Status.objects.filter(pk=instance.status_id).update(view_count=F('view_count') + 1)
+
+
+@receiver(post_delete, sender=StatusView)
+def uncount_status_view(sender, instance, **kwargs):
+    owner_id = Status.objects.filter(pk=instance.status_id).values_list('user_id', flat=True).first()
+    activity.bump(instance.user_id, status_views_given=-1)
+    activity.bump(owner_id, status_views_received=-1)
+    Status.objects.filter(pk=instance.status_id, view_count__gt=0).update(view_count=F('view_count') - 1)
+
+
+def _invalidate_contact_graph(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    contact_graph.invalidate(instance.user_id)
+    # Again after commit, in case another worker reloaded the old edges in between
+    transaction.on_commit(lambda: contact_graph.invalidate(instance.user_id))
+
+
+post_save.connect(_invalidate_contact_graph, sender=Contact, dispatch_uid='contact_graph_saved')
+post_delete.connect(_invalidate_contact_graph, sender=Contact, dispatch_uid='contact_graph_deleted')
+
+
+@receiver(post_save, sender=Contact)
+def count_contact(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        activity.bump(instance.user_id, contacts=1)
+
+
+@receiver(post_delete, sender=Contact)
+def uncount_contact(sender, instance, **kwargs):
+    activity.bump(instance.user_id, contacts=-1)
+
+
+# ============= GROUP MEMBERSHIP CACHE =============
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_cached_group(sender, instance, raw=False, **kwargs):
+    if not raw:
+        group_cache.forget(instance.pk)
+
+
+@receiver(post_save, sender=GroupMembership)
+@receiver(post_delete, sender=GroupMembership)
+def invalidate_cached_group_members(sender, instance, raw=False, **kwargs):
+    if not raw:
+        group_cache.forget(instance.group_id)
+
+
+@receiver(m2m_changed, sender=Group.admins.through)
+def invalidate_cached_group_admins(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            group_cache.forget(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        for group_id in pk_set:
+            group_cache.forget(group_id)
+    elif action == 'pre_clear':
+        # user.admin_groups.clear(): the groups are only known beforehand
+        for group_id in instance.admin_groups.values_list('id', flat=True):
+            group_cache.forget(group_id)
+
+
+@receiver(post_save, sender=GroupMembership)
+def count_membership(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        activity.bump(instance.user_id, groups=1)
+
+
+@receiver(post_delete, sender=GroupMembership)
+def uncount_membership(sender, instance, **kwargs):
+    activity.bump(instance.user_id, groups=-1)
+
+
+@receiver(post_save, sender=Conversation)
+def count_conversation(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        activity.bump(instance.user1_id, conversations=1)
+        activity.bump(instance.user2_id, conversations=1)
+
+
+@receiver(post_delete, sender=Conversation)
+def uncount_conversation(sender, instance, **kwargs):
+    activity.bump(instance.user1_id, conversations=-1)
+    activity.bump(instance.user2_id, conversations=-1)
+
+
+# ============= SEARCH INDEX =============
+
+@receiver(post_migrate, dispatch_uid='api_install_search_index')
+def install_search_index(sender, using='default', **kwargs):
+    if sender.name == 'api':
+        search.install(using)
+
+
+@receiver(post_save, sender=User)
+def index_user_search_terms(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Logins only touch last_login; skip saves that leave the indexed fields alone
+    if raw or (update_fields and not user_search.INDEXED_FIELDS.intersection(update_fields)):
+        return
+    user_search.index_user(instance)
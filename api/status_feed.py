@@ -0,0 +1,151 @@
+"""
+Status feed
+Active statuses of the viewer's contacts that their privacy settings let the viewer see,
+grouped by author, with stored view counts and the viewer's seen set
+"""
+
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import activity, contact_graph
+from .models import Status, StatusView
+
+
+def visible_statuses(viewer_id, now=None):
+    """
+    Unexpired statuses the viewer may see, from authors in the viewer's contacts
+
+    Authors who blocked the viewer are skipped. 'contacts' and 'except' statuses
+    need the author to have the viewer as a contact too; 'selected' needs the
+    viewer in visible_to and 'except' needs them absent from hidden_from.
+    """
+    now = now or timezone.now()
+    authors, mutual = contact_graph.reachable_contacts(viewer_id)
+    
+    selected = Exists(Status.visible_to.through.objects.filter(status_id=OuterRef('pk'), user_id=viewer_id))
+    hidden = Exists(Status.hidden_from.through.objects.filter(status_id=OuterRef('pk'), user_id=viewer_id))
+    
+    return Status.objects.filter(user_id__in=list(authors), expires_at__gt=now).filter(
+        Q(privacy='everyone') |
+        Q(privacy='contacts', user_id__in=mutual) |
+        Q(selected, privacy='selected') |
+        (Q(privacy='except', user_id__in=mutual) & ~Q(hidden))
+    )
+
+
+def feed(viewer_id, now=None):
+    """
+    [{'user': ..., 'statuses': [...], 'has_unseen': bool}] ordered by each author's newest status
+
+    Two queries however many statuses exist outside the viewer's contacts:
+    the visible statuses with their authors, and the viewer's seen set.
+    """
+    statuses = list(visible_statuses(viewer_id, now).select_related('user__profile').order_by('-created_at', '-id'))
+    seen = set(
+        StatusView.objects.filter(user_id=viewer_id, status_id__in=[s.id for s in statuses])
+        .values_list('status_id', flat=True)
+    )
+
+    # Ordered by newest status, so authors come out in most-recent-first order
+    groups = {}
+    for status_obj in statuses:
+        group = groups.get(status_obj.user_id)
+        if group is None:
+            author = status_obj.user
+            profile = getattr(author, 'profile', None)
+            group = groups[status_obj.user_id] = {
+                'user': {
+                    'username': author.username,
+                    'avatar': profile.avatar if profile else None
+                },
+                'latest_at': status_obj.created_at.isoformat(),
+                'has_unseen': False,
+                'statuses': []
+            }
+
+        has_viewed = status_obj.id in seen
+        group['has_unseen'] |= not has_viewed
+        group['statuses'].append({
+            'id': status_obj.id,
+            'status_type': status_obj.status_type,
+            'content': status_obj.content,
+            'media_url': status_obj.media_url,
+            'background_color': status_obj.background_color,
+            'created_at': status_obj.created_at.isoformat(),
+            'expires_at': status_obj.expires_at.isoformat(),
+            'has_viewed': has_viewed,
+            'view_count': status_obj.view_count
+        })
+
+    return list(groups.values())
+
+
+def _insert_views(viewer_id, status_ids):
+    """
+    Insert the viewer's views of status_ids; returns the ids actually inserted
+
+    One bulk insert normally does it. If a concurrent request recorded one
+    of the views first, the ids are retried one per savepoint, so the
+    unique (status, user) constraint tells exactly which rows are ours.
+    """
+    try:
+        with transaction.atomic():
+            StatusView.objects.bulk_create(
+                [StatusView(status_id=status_id, user_id=viewer_id) for status_id in status_ids]
+            )
+        return list(status_ids)
+    except IntegrityError:
+        pass
+    
+    inserted = []
+    for status_id in status_ids:
+        try:
+            with transaction.atomic():
+                StatusView.objects.bulk_create([StatusView(status_id=status_id, user_id=viewer_id)])
+        except IntegrityError:
+            continue
+        inserted.append(status_id)
+    return inserted
+
+
+def record_views(viewer_id, status_ids, now=None, visible_only=True):
+    """
+    Record that the viewer saw status_ids; returns {status_id: view_count} for those recorded
+    
+    With visible_only, only statuses visible_statuses() lets the viewer see
+    are recorded; otherwise any existing status is. Ids are deduplicated and
+    checked against the viewer's earlier views in memory, then written with
+    one bulk insert. Only the views this call actually inserted are added to
+    the counters.
+    """
+    statuses = visible_statuses(viewer_id, now) if visible_only else Status.objects.all()
+    statuses = dict(statuses.filter(id__in=set(status_ids)).values_list('id', 'user_id'))
+    seen = set(
+        StatusView.objects.filter(user_id=viewer_id, status_id__in=list(statuses))
+        .values_list('status_id', flat=True)
+    )
+    new = [status_id for status_id in statuses if status_id not in seen]
+    
+    if new:
+        with transaction.atomic():
+            inserted = _insert_views(viewer_id, new)
+            if inserted:
+                Status.objects.filter(id__in=inserted).update(view_count=F('view_count') + 1)
+                # bulk_create skips the StatusView signals, so the activity counters are bumped here
+                activity.bump(viewer_id, status_views_given=len(inserted))
+                for owner_id, received in Counter(statuses[status_id] for status_id in inserted).items():
+                    activity.bump(owner_id, status_views_received=received)
+    
+    return dict(Status.objects.filter(id__in=list(statuses)).values_list('id', 'view_count'))
+
+
+def rebuild_view_counts():
+    """Recompute Status.view_count from StatusView rows; returns statuses updated"""
+    views = StatusView.objects.filter(status_id=OuterRef('pk')).order_by().values('status_id').annotate(n=Count('id'))
+    return Status.objects.update(
+        view_count=Coalesce(Subquery(views.values('n'), output_field=IntegerField()), Value(0))
+    )
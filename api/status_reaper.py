@@ -0,0 +1,140 @@
+"""
+Expired status reaper
+Deletes expired statuses with their views and audience rows in bounded batches,
+keeping the system and per-user counters in step without per-row signals
+"""
+
+import logging
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from . import activity, counters
+from .models import Status, StatusView
+
+logger = logging.getLogger(__name__)
+
+AUDIENCE_TABLES = (Status.visible_to.through, Status.hidden_from.through)
+# Ids per DELETE statement, well under every backend's bound-parameter limit
+DELETE_CHUNK = 500
+
+
+def cutoffs(now=None):
+    """
+    (expired_before, created_before) for statuses due for deletion
+
+    Statuses are kept for the grace period after they expire, and none outlive
+    the retention period counted from creation (None disables that cap).
+    """
+    now = now or timezone.now()
+    grace = getattr(settings, 'STATUS_REAPER_GRACE_MINUTES', 60)
+    retention = getattr(settings, 'STATUS_REAPER_RETENTION_DAYS', 7)
+    return (
+        now - timedelta(minutes=grace),
+        now - timedelta(days=retention) if retention else None,
+    )
+
+
+def _delete_rows(model, field, ids):
+    """
+    DELETE model rows whose field is in ids with plain SQL; returns the rows deleted
+
+    QuerySet.delete() would collect the rows and fire the per-row delete
+    signals, which adjust the same counters the reaper adjusts in aggregate.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.get_field(field).column)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for i in range(0, len(ids), DELETE_CHUNK):
+            chunk = ids[i:i + DELETE_CHUNK]
+            cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(chunk))})", chunk)
+            deleted += cursor.rowcount
+    return deleted
+
+
+def _delete_batch(ids):
+    """Delete statuses by id with their dependent rows; returns (statuses, views, audience rows) removed"""
+    views = StatusView.objects.filter(status_id__in=ids)
+    given = views.values_list('user_id').annotate(n=Count('id')).order_by()
+    received = views.values_list('status__user_id').annotate(n=Count('id')).order_by()
+    posted = Status.objects.filter(id__in=ids).values_list('user_id').annotate(n=Count('id')).order_by()
+
+    with transaction.atomic():
+        # The counters these rows feed are adjusted in aggregate below, so the
+        # per-row delete signals (and the collector that fires them) are skipped
+        deltas = {
+            'status_views_given': Counter(dict(given)),
+            'status_views_received': Counter(dict(received)),
+            'statuses_posted': Counter(dict(posted)),
+        }
+        removed_views = _delete_rows(StatusView, 'status', ids)
+        removed_audience = sum(_delete_rows(table, 'status', ids) for table in AUDIENCE_TABLES)
+        removed = _delete_rows(Status, 'id', ids)
+
+        for user_id in set().union(*deltas.values()):
+            activity.bump(user_id, **{field: -counts[user_id] for field, counts in deltas.items() if counts[user_id]})
+        counters.increment('statuses', -removed)
+
+    return removed, removed_views, removed_audience
+
+
+def _due(field, before, batch_size):
+    return list(
+        Status.objects.filter(**{f'{field}__lt': before})
+        .order_by(field).values_list('id', flat=True)[:batch_size]
+    )
+
+
+def reap(batch_size=None, max_batches=None, now=None):
+    """
+    Delete due statuses batch by batch; returns the run's metrics
+
+    Each batch is one short transaction over at most batch_size statuses,
+    found through the expires_at (then created_at) index.
+    """
+    batch_size = batch_size or getattr(settings, 'STATUS_REAPER_BATCH_SIZE', 1000)
+    expired_before, created_before = cutoffs(now)
+    metrics = {
+        'statuses': 0, 'views': 0, 'audience': 0,
+        'batches': 0, 'duration_ms': 0.0, 'max_batch_ms': 0.0,
+    }
+
+    passes = [('expires_at', expired_before)]
+    if created_before:
+        passes.append(('created_at', created_before))
+
+    for field, before in passes:
+        while max_batches is None or metrics['batches'] < max_batches:
+            started = time.monotonic()
+            ids = _due(field, before, batch_size)
+            if not ids:
+                break
+
+            removed, views, audience = _delete_batch(ids)
+            elapsed = (time.monotonic() - started) * 1000
+
+            metrics['statuses'] += removed
+            metrics['views'] += views
+            metrics['audience'] += audience
+            metrics['batches'] += 1
+            metrics['duration_ms'] += elapsed
+            metrics['max_batch_ms'] = max(metrics['max_batch_ms'], elapsed)
+            logger.info(
+                f"Status reaper batch: {removed} statuses, {views} views, "
+                f"{audience} audience rows in {elapsed:.1f}ms"
+            )
+            if len(ids) < batch_size:
+                break
+
+    if metrics['statuses']:
+        counters.increment('statuses_reaped', metrics['statuses'])
+        counters.increment('status_views_reaped', metrics['views'])
+    metrics['duration_ms'] = round(metrics['duration_ms'], 1)
+    metrics['max_batch_ms'] = round(metrics['max_batch_ms'], 1)
+    return metrics
@@ -1,8 +1,15 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
 from rest_framework import status
+from django.contrib.auth.models import User
 
-class APITestCase(TestCase):
+
+@override_settings(BACKGROUND_FLUSH=False)
+class BaseTestCase(TestCase):
+    """No background flush thread or exit hook; tests flush the write buffers themselves"""
+
+
+class APITestCase(BaseTestCase):
     def setUp(self):
         self.client = APIClient()
     
@@ -34,4 +41,1322 @@ class APITestCase(TestCase):
         """Test admin stats endpoint"""
         response = self.client.get('/api/admin/stats/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('total_users', response.data)
\ No newline at end of file
+        self.assertIn('total_users', response.data)
+
+class SystemCounterTestCase(BaseTestCase):
+    def test_counters_follow_writes(self):
+        """Counters track creates and deletes without recounting"""
+        from .counters import get_counters
+        from .models import Message
+        
+        alice = User.objects.create_user(username='alice', password='pw')
+        bob = User.objects.create_user(username='bob', password='pw')
+        message = Message.objects.create(sender=alice, receiver=bob, content='hi')
+        
+        totals = get_counters()
+        self.assertEqual(totals['users'], 2)
+        self.assertEqual(totals['messages'], 1)
+        
+        message.delete()
+        self.assertEqual(get_counters()['messages'], 0)
+    
+    def test_snapshot_writes_daily_row(self):
+        """Snapshot closes out today's SystemStats row from the counters"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .counters import snapshot_system_stats
+        from .models import Status
+        
+        alice = User.objects.create_user(username='alice', password='pw')
+        Status.objects.create(user=alice, status_type='text', content='now')
+        Status.objects.create(user=alice, status_type='text', content='old', expires_at=timezone.now() - timedelta(hours=1))
+        stats = snapshot_system_stats()
+        self.assertEqual(stats.total_users, 1)
+        # Only statuses that haven't expired, as before the counters
+        self.assertEqual(stats.total_statuses, 1)
+
+
+class UserActivityTestCase(BaseTestCase):
+    def setUp(self):
+        from .models import UserProfile
+        
+        self.client = APIClient()
+        self.alice = User.objects.create_user(username='alice', password='pw')
+        self.bob = User.objects.create_user(username='bob', password='pw')
+        UserProfile.objects.create(user=self.alice)
+        UserProfile.objects.create(user=self.bob)
+    
+    def test_analytics_reads_counters(self):
+        """Sends and reactions show up in the analytics counters"""
+        response = self.client.post('/api/send-message/', {
+            'sender': 'alice', 'receiver': 'bob', 'content': 'hi'
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.post('/api/react-message/', {
+            'message_id': response.data['message']['id'], 'username': 'bob', 'reaction_type': 'like'
+        })
+        
+        analytics = self.client.get('/api/analytics/', {'username': 'alice'}).json()['analytics']
+        self.assertEqual(analytics['messages_sent'], 1)
+        self.assertEqual(analytics['messages_today'], 1)
+        self.assertEqual(analytics['total_conversations'], 1)
+        self.assertEqual(analytics['total_reactions_received'], 1)
+    
+    def test_rebuild_matches_counters(self):
+        """Rebuilding from the tables gives the same numbers"""
+        from . import activity
+        from .models import Message, UserActivity
+        
+        Message.objects.create(sender=self.alice, receiver=self.bob, content='hi')
+        before = UserActivity.objects.get(user=self.bob).messages_received
+        UserActivity.objects.filter(user=self.bob).update(messages_received=0)
+        activity.rebuild()
+        self.assertEqual(UserActivity.objects.get(user=self.bob).messages_received, before)
+
+
+class CountCacheTestCase(BaseTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        
+        cache.clear()
+        self.client = APIClient()
+    
+    def test_readiness_reports_cached_counts(self):
+        """Readiness reads totals from the counters and serves filtered counts from the cache"""
+        from .models import Status
+        
+        alice = User.objects.create_user(username='alice', password='pw')
+        Status.objects.create(user=alice, status_type='text', content='hi')
+        response = self.client.get('/api/health/ready/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stats']['total_users'], 1)
+        self.assertEqual(response.data['stats']['active_statuses'], 1)
+        
+        bob = User.objects.create_user(username='bob', password='pw')
+        Status.objects.create(user=bob, status_type='text', content='hi')
+        response = self.client.get('/api/health/ready/')
+        self.assertEqual(response.data['stats']['total_users'], 2)
+        self.assertEqual(response.data['stats']['active_statuses'], 1)
+    
+    def test_opted_in_totals_use_table_statistics(self):
+        from django.db import connection
+        from django.test import override_settings
+        from . import count_cache
+        
+        for username in ('alice', 'bob'):
+            User.objects.create_user(username=username, password='pw')
+        with override_settings(COUNT_CACHE_APPROXIMATE=['users']):
+            # Without statistics the counter is used
+            self.assertEqual(count_cache.compute('users'), 2)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            User.objects.create_user(username='carol', password='pw')
+            self.assertEqual(count_cache.compute('users'), 2)
+            self.assertEqual(count_cache.get_count('users'), 2)
+        self.assertEqual(count_cache.get_count('users'), 3)
+
+
+class ResponseCacheTestCase(BaseTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        
+        cache.clear()
+    
+    def test_concurrent_requests_compute_once(self):
+        """Identical concurrent requests share one computation"""
+        import threading
+        import time
+        from . import response_cache
+        
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'value': 42}
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                response_cache.get_or_compute('test', {'a': 1}, compute)
+            ))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'value': 42}] * 5)
+    
+    def test_invalidate_forces_recompute(self):
+        """A version bump makes the next read recompute"""
+        from . import response_cache
+        
+        self.assertEqual(response_cache.get_or_compute('test', {}, lambda: 1), 1)
+        self.assertEqual(response_cache.get_or_compute('test', {}, lambda: 2), 1)
+        response_cache.invalidate()
+        self.assertEqual(response_cache.get_or_compute('test', {}, lambda: 2), 2)
+
+
+class APILogExportTestCase(BaseTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from .models import APILog, UserProfile
+        
+        cache.clear()
+        self.client = APIClient()
+        admin = User.objects.create_user(username='boss', password='pw')
+        UserProfile.objects.create(user=admin, role='admin')
+        for i in range(5):
+            APILog.objects.create(
+                endpoint='/api/users/' if i % 2 else '/api/messages/',
+                method='GET', status_code=200, response_time=10.0 + i
+            )
+    
+    def test_cursor_pages_cover_all_rows(self):
+        """Following next_cursor walks every matching row exactly once"""
+        seen = []
+        cursor = None
+        while True:
+            params = {'username': 'boss', 'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get('/api/admin/api-logs/', params).json()
+            seen.extend(log['id'] for log in data['logs'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+    
+    def test_non_positive_limits_return_one_row(self):
+        for limit in (0, -1):
+            response = self.client.get('/api/admin/api-logs/', {'username': 'boss', 'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['logs']), 1)
+    
+    def test_export_streams_filtered_ndjson(self):
+        """Export streams one JSON object per matching row"""
+        import json
+        
+        response = self.client.get('/api/admin/api-logs/export/', {
+            'username': 'boss', 'endpoint': '/api/users/'
+        })
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0])['endpoint'], '/api/users/')
+
+
+class ReactionAnalyticsTestCase(BaseTestCase):
+    def setUp(self):
+        from .models import Message, MessageReaction
+        
+        self.client = APIClient()
+        alice = User.objects.create_user(username='alice', password='pw')
+        message = Message.objects.create(sender=alice, content='hello there')
+        for i in range(3):
+            reactor = User.objects.create_user(username=f'fan{i}', password='pw')
+            MessageReaction.objects.create(
+                message=message, user=reactor, reaction_type='like' if i else 'love'
+            )
+    
+    def test_aggregate_mode_counts_by_type(self):
+        data = self.client.get('/api/message-reactions/', {'username': 'alice', 'mode': 'aggregate'}).json()
+        self.assertEqual(data['total'], 3)
+        self.assertEqual({row['reaction_type']: row['count'] for row in data['counts']}, {'like': 2, 'love': 1})
+        self.assertEqual(data['by_message'][0]['count'], 3)
+    
+    def test_detail_mode_is_paginated(self):
+        data = self.client.get('/api/message-reactions/', {'username': 'alice', 'limit': 2}).json()
+        self.assertEqual(len(data['reactions']), 2)
+        self.assertEqual(data['reactions'][0]['message_content'], 'hello there')
+        
+        rest = self.client.get('/api/message-reactions/', {
+            'username': 'alice', 'limit': 2, 'cursor': data['next_cursor']
+        }).json()
+        self.assertEqual(len(rest['reactions']), 1)
+        self.assertFalse(rest['has_more'])
+        # Existing clients still get the per-type counts in detail mode
+        self.assertEqual({row['reaction_type']: row['count'] for row in rest['counts']}, {'like': 2, 'love': 1})
+    
+    def test_non_positive_limits_return_one_row(self):
+        for limit in (0, -1):
+            response = self.client.get('/api/message-reactions/', {'username': 'alice', 'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['reactions']), 1)
+    
+    def test_bad_days_is_rejected(self):
+        response = self.client.get('/api/message-reactions/', {'username': 'alice', 'mode': 'aggregate', 'days': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class LatencyStatsTestCase(BaseTestCase):
+    def test_group_percentiles_match_numpy(self):
+        """Vectorized per-group percentiles agree with np.percentile on each group"""
+        import numpy as np
+        from . import latency
+        
+        rng = np.random.default_rng(1)
+        groups = rng.integers(0, 5, 2000)
+        times = rng.lognormal(3, 1, 2000)
+        codes = rng.choice(np.array([200, 404, 500], dtype=np.int16), 2000)
+        stats = latency.group_stats(groups, times, codes, 6)
+        
+        for g in range(5):
+            selected = times[groups == g]
+            for p in latency.PERCENTILES:
+                self.assertAlmostEqual(stats[f'p{p}'][g], np.percentile(selected, p), places=6)
+            self.assertAlmostEqual(stats['error_rate'][g], np.mean(codes[groups == g] >= 500))
+        self.assertEqual(stats['count'][5], 0)
+    
+    def test_latency_endpoint(self):
+        from datetime import datetime
+        from .models import APILog, UserProfile
+        
+        admin = User.objects.create_user(username='boss', password='pw')
+        UserProfile.objects.create(user=admin, role='admin')
+        for i in range(10):
+            APILog.objects.create(
+                endpoint='/api/users/', method='GET',
+                status_code=500 if i == 0 else 200, response_time=float(i + 1)
+            )
+        
+        data = APIClient().get('/api/admin/latency/', {'username': 'boss', 'hours': 2}).json()
+        self.assertEqual(data['overall']['count'], 10)
+        # The default window is minute-aligned, so repeated requests share a cache entry
+        until = datetime.fromisoformat(data['until'])
+        self.assertEqual((until.second, until.microsecond), (0, 0))
+        self.assertEqual(data['endpoints'][0]['p50_ms'], 5.5)
+        self.assertEqual(data['endpoints'][0]['error_rate'], 0.1)
+    
+    def test_window_columns_come_from_sql(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import APILog
+        from . import latency
+        
+        for endpoint, code in (('/api/users/', 200), ('/api/messages/', 404), ('/api/users/', 201)):
+            APILog.objects.create(endpoint=endpoint, method='GET', status_code=code, response_time=12.5)
+        now = timezone.now()
+        codes, names, statuses, times, stamps = latency.load_window(now - timedelta(hours=1), now + timedelta(minutes=1))
+        
+        self.assertEqual(names, ['/api/messages/', '/api/users/'])
+        self.assertEqual(sorted(zip(codes.tolist(), statuses.tolist())), [(0, 404), (1, 200), (1, 201)])
+        self.assertEqual(times.tolist(), [12.5] * 3)
+        created = sorted(log.created_at.timestamp() for log in APILog.objects.all())
+        self.assertTrue(all(abs(a - b) < 0.001 for a, b in zip(sorted(stamps.tolist()), created)))
+
+
+class MessageVolumeSeriesTestCase(BaseTestCase):
+    def setUp(self):
+        from .models import UserProfile
+        from . import timeseries
+        
+        timeseries._pending_counts.clear()
+        timeseries._pending_marks.clear()
+        self.client = APIClient()
+        self.alice = User.objects.create_user(username='alice', password='pw')
+        self.bob = User.objects.create_user(username='bob', password='pw')
+        UserProfile.objects.create(user=self.alice, role='admin')
+        UserProfile.objects.create(user=self.bob)
+    
+    def send(self, sender, receiver):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/send-message/', {
+                'sender': sender, 'receiver': receiver, 'content': 'hi'
+            })
+        self.assertEqual(response.status_code, 201)
+    
+    def test_send_message_updates_series(self):
+        """Each committed message lands in the current bucket; senders are counted once"""
+        self.send('alice', 'bob')
+        self.send('alice', 'bob')
+        self.send('bob', 'alice')
+        
+        data = self.client.get('/api/admin/message-volume/', {'username': 'alice', 'buckets': 2}).json()
+        current = data['series'][-1]
+        self.assertEqual((current['messages'], current['active_senders']), (3, 2))
+        self.assertEqual(data['series'][0]['messages'], 0)
+        
+        analytics = self.client.get('/api/analytics/', {'username': 'alice'}).json()
+        self.assertEqual(analytics['activity_chart']['daily'][-1]['messages'], 2)
+    
+    def test_sends_are_buffered_off_the_series_rows(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from . import timeseries
+        
+        self.send('alice', 'bob')
+        with CaptureQueriesContext(connection) as queries:
+            self.send('bob', 'alice')
+        self.assertFalse([q for q in queries if 'api_messagevolumeseries' in q['sql']])
+        
+        # Reads add this process's buffered messages without writing them
+        with CaptureQueriesContext(connection) as queries:
+            current = timeseries.recent_series('global', 0, 'hour', 1)[-1]
+        self.assertEqual([q['sql'].split()[0] for q in queries], ['SELECT'])
+        self.assertEqual((current['messages'], current['active_senders']), (2, 2))
+        
+        timeseries.flush()
+        self.assertFalse(timeseries._pending_counts)
+        self.send('alice', 'bob')
+        current = timeseries.recent_series('global', 0, 'hour', 1)[-1]
+        # alice's buffered send is already counted among the stored senders
+        self.assertEqual((current['messages'], current['active_senders']), (3, 2))
+    
+    def test_rebuild_matches_incremental(self):
+        from . import timeseries
+        
+        self.send('alice', 'bob')
+        self.send('bob', 'alice')
+        before = timeseries.recent_series('global', 0, 'day', 3)
+        timeseries.rebuild()
+        self.assertEqual(timeseries.recent_series('global', 0, 'day', 3), before)
+
+
+class CohortRetentionTestCase(BaseTestCase):
+    def test_cohort_matrix(self):
+        """Users are bucketed by signup week and retained by the weeks they sent messages"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import Message
+        from . import cohorts
+        
+        now = timezone.now()
+        week_ago = now - timedelta(days=7)
+        early = [User.objects.create_user(username=f'early{i}', password='pw') for i in range(4)]
+        User.objects.filter(pk__in=[u.pk for u in early]).update(date_joined=week_ago)
+        late = User.objects.create_user(username='late', password='pw')
+        
+        Message.objects.create(sender=early[0], content='a')
+        Message.objects.create(sender=early[0], content='b')
+        Message.objects.create(sender=early[1], content='c')
+        Message.objects.create(sender=late, content='d')
+        
+        data = cohorts.compute(weeks=2, now=now)
+        first, second = data['cohorts']
+        self.assertEqual((first['users'], second['users']), (4, 1))
+        self.assertEqual(first['retention'], [0.0, 0.5])
+        self.assertEqual(first['messages_per_active_user'], [0.0, 1.5])
+        self.assertEqual(second['retention'], [1.0])
+        
+        report = cohorts.build(weeks=2)
+        self.assertEqual(cohorts.latest().pk, report.pk)
+
+
+class ActiveUserSketchTestCase(BaseTestCase):
+    def setUp(self):
+        from . import hll
+        
+        hll._pending.clear()
+    
+    def test_estimates_within_error(self):
+        """Sketch estimates stay close to the true distinct count and merge across days"""
+        from datetime import date, timedelta
+        from . import hll
+        
+        today = date(2026, 3, 10)
+        for i in range(5000):
+            hll.record_active(f'user{i}', day=today)
+            # Half of them were also active yesterday, plus new users
+            hll.record_active(f'user{i}' if i % 2 else f'other{i}', day=today - timedelta(days=1))
+        hll.flush()
+        
+        counts = hll.active_users(today=today)
+        self.assertAlmostEqual(counts['daily'], 5000, delta=5000 * 0.03)
+        self.assertAlmostEqual(counts['weekly'], 7500, delta=7500 * 0.03)
+    
+    def test_requests_feed_sketch(self):
+        from django.test import override_settings
+        from .models import UserProfile
+        from . import hll
+        
+        UserProfile.objects.create(user=User.objects.create_user(username='alice', password='pw'))
+        with override_settings(ACTIVE_USER_SKETCH_FLUSH_INTERVAL=0):
+            self.client.get('/api/user-profile/', {'username': 'alice'})
+            self.client.get('/api/user-profile/', {'username': 'alice'})
+        self.assertEqual(hll.active_users()['daily'], 1)
+    
+    def test_pending_registers_flushed_by_background_flusher(self):
+        from django.test import override_settings
+        from .models import ActiveUserSketch
+        from . import flusher, hll
+        
+        with override_settings(ACTIVE_USER_SKETCH_FLUSH_INTERVAL=3600):
+            hll.flush()
+            hll.record_active('alice')
+            self.assertFalse(ActiveUserSketch.objects.exists())
+            # What the timer thread and the exit hook run, without a later update
+            flusher.flush_all()
+        self.assertTrue(ActiveUserSketch.objects.exists())
+        self.assertFalse(hll._pending)
+        # The tests run without the background thread
+        self.assertIsNone(flusher._thread)
+
+
+class HeavyHitterTestCase(BaseTestCase):
+    def setUp(self):
+        from . import heavy_hitters
+        
+        heavy_hitters._minutes.clear()
+        heavy_hitters._dirty.clear()
+        heavy_hitters._slots.clear()
+    
+    def test_space_saving_keeps_heavy_items(self):
+        """Items above total/capacity survive eviction, with counts bounded by their error"""
+        from .heavy_hitters import SpaceSaving
+        
+        summary = SpaceSaving(10)
+        for i in range(1000):
+            summary.add('hot' if i % 4 == 0 else f'cold{i}')
+        top = summary.top(1)[0]
+        self.assertEqual(top['key'], 'hot')
+        self.assertLessEqual(top['count'] - top['error'], 250)
+        self.assertGreaterEqual(top['count'], 250)
+        
+        other = SpaceSaving(10)
+        for _ in range(50):
+            other.add('hot')
+        self.assertEqual(summary.merge(other).top(1)[0]['key'], 'hot')
+    
+    def test_dashboard_reports_middleware_traffic(self):
+        from django.core.cache import cache
+        from .models import UserProfile
+        
+        cache.clear()
+        UserProfile.objects.create(user=User.objects.create_user(username='boss', password='pw'), role='admin')
+        for _ in range(3):
+            self.client.get('/api/health/', {'username': 'spammer'})
+        
+        data = self.client.get('/api/admin/heavy-hitters/', {'username': 'boss'}).json()
+        self.assertEqual(data['endpoint'][0], {'key': '/api/health/', 'count': 3, 'error': 0})
+        self.assertEqual(data['user'][0]['key'], 'spammer')
+        self.assertEqual(data['workers'], 1)
+
+
+class AnomalyDetectionTestCase(BaseTestCase):
+    def setUp(self):
+        from . import anomaly
+        
+        anomaly._states.clear()
+    
+    def test_spike_after_warmup_raises_alert(self):
+        """Steady traffic builds a baseline; a burst and a latency jump are flagged once"""
+        from .models import AnomalyAlert
+        from . import anomaly
+        
+        start = 1_000_000 * 60
+        for minute in range(15):
+            for i in range(10 + minute % 3):
+                anomaly.observe('/api/send-message/', 50.0 + i, now=start + minute * 60 + i)
+        self.assertFalse(AnomalyAlert.objects.exists())
+        
+        for i in range(100):
+            anomaly.observe('/api/send-message/', 400.0, now=start + 15 * 60 + i * 0.5)
+        anomaly.observe('/api/send-message/', 50.0, now=start + 16 * 60)
+        
+        self.assertEqual(
+            set(AnomalyAlert.objects.values_list('metric', flat=True)), {'rate', 'latency'}
+        )
+        rate = AnomalyAlert.objects.get(metric='rate')
+        self.assertEqual(rate.value, 100)
+        self.assertGreater(rate.z_score, 4)
+
+
+class AdminChangelistTestCase(BaseTestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='root', password='pw', email='root@example.com')
+        self.client.force_login(self.admin)
+    
+    def changelist_queries(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+    
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Per-row counts are annotations, so page queries stay constant as rows are added"""
+        from .models import Conversation, Group, GroupMembership, Message, Status, StatusView
+        
+        def add_rows(prefix):
+            a = User.objects.create_user(username=f'{prefix}a', password='pw')
+            b = User.objects.create_user(username=f'{prefix}b', password='pw')
+            conversation = Conversation.objects.create(user1=a, user2=b)
+            Message.objects.create(conversation=conversation, sender=a, receiver=b, content='hi')
+            group = Group.objects.create(name=f'{prefix} group', created_by=a)
+            GroupMembership.objects.create(group=group, user=a)
+            group.admins.add(a)
+            status = Status.objects.create(user=a, content='s')
+            StatusView.objects.create(status=status, user=b)
+        
+        urls = [
+            '/admin/api/conversation/', '/admin/api/group/', '/admin/api/status/',
+            '/admin/api/message/', '/admin/auth/user/', '/admin/auth/group/',
+        ]
+        add_rows('one')
+        before = {url: self.changelist_queries(url) for url in urls}
+        for i in range(3):
+            add_rows(f'more{i}')
+        self.assertEqual({url: self.changelist_queries(url) for url in urls}, before)
+    
+    def test_estimated_count_paginator(self):
+        from unittest import mock
+        from .models import APILog
+        from .pagination import EstimatedCountPaginator
+        
+        APILog.objects.create(endpoint='/api/x/', method='GET', status_code=200, response_time=1)
+        with mock.patch('api.pagination.approximate_count', return_value=50_000_000):
+            self.assertEqual(EstimatedCountPaginator(APILog.objects.all(), 100).count, 50_000_000)
+            self.assertEqual(EstimatedCountPaginator(APILog.objects.filter(status_code=200), 100).count, 1)
+
+
+class MessageSearchTestCase(BaseTestCase):
+    def setUp(self):
+        from .models import Conversation, Group, GroupMembership, Message
+        
+        self.client = APIClient()
+        alice = User.objects.create_user(username='alice', password='pw')
+        bob = User.objects.create_user(username='bob', password='pw')
+        eve = User.objects.create_user(username='eve', password='pw')
+        conversation = Conversation.objects.create(user1=alice, user2=bob)
+        self.dinner = Message.objects.create(
+            conversation=conversation, sender=bob, receiver=alice, content='Dinner tomorrow? dinner!'
+        )
+        Message.objects.create(conversation=conversation, sender=alice, receiver=bob, content='sure, dinner works')
+        group = Group.objects.create(name='club', created_by=alice)
+        GroupMembership.objects.create(group=group, user=alice)
+        Message.objects.create(group=group, sender=alice, content='club dinner plans')
+        # Not visible to alice
+        other = Conversation.objects.create(user1=bob, user2=eve)
+        Message.objects.create(conversation=other, sender=eve, receiver=bob, content='secret dinner')
+    
+    def search(self, **params):
+        return self.client.get('/api/search-messages/', {'username': 'alice', **params}).json()
+    
+    def test_search_is_scoped_ranked_and_paginated(self):
+        data = self.search(q='dinner', limit=2)
+        self.assertEqual(data['results'][0]['id'], self.dinner.id)
+        self.assertTrue(data['has_more'])
+        rest = self.search(q='dinner', limit=2, cursor=data['next_cursor'])
+        contents = [r['content'] for r in data['results'] + rest['results']]
+        self.assertEqual(len(contents), 3)
+        self.assertNotIn('secret dinner', contents)
+        
+        self.assertEqual([r['content'] for r in self.search(q='plan')['results']], ['club dinner plans'])
+    
+    def test_index_follows_edit_and_delete(self):
+        self.dinner.content = 'lunch instead'
+        self.dinner.save()
+        self.assertEqual(len(self.search(q='lunch')['results']), 1)
+        self.assertEqual(len(self.search(q='tomorrow')['results']), 0)
+        
+        # Deleted only for the sender: the other participant still sees it, so it stays searchable
+        self.dinner.is_deleted = True
+        self.dinner.save()
+        self.assertEqual(len(self.search(q='lunch')['results']), 1)
+        
+        self.dinner.deleted_for_everyone = True
+        self.dinner.save()
+        self.assertEqual(len(self.search(q='lunch')['results']), 0)
+    
+    def test_admin_search_uses_index(self):
+        self.client.force_login(User.objects.create_superuser(username='root', password='pw', email='r@x.io'))
+        response = self.client.get('/admin/api/message/', {'q': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class UserDirectoryTestCase(BaseTestCase):
+    def setUp(self):
+        from .models import Contact
+        from . import contact_graph
+        
+        contact_graph._entries.clear()
+        self.client = APIClient()
+        self.alice = User.objects.create_user(username='alice', password='pw')
+        User.objects.create_user(username='john_smith', password='pw', first_name='John', last_name='Smith')
+        User.objects.create_user(username='johnny', password='pw', email='jd@example.com')
+        friend = User.objects.create_user(username='jo_friend', password='pw', first_name='Joanna', last_name='Smith')
+        User.objects.create_user(username='zed', password='pw', email='john.smithers@example.com')
+        Contact.objects.create(user=self.alice, contact=friend)
+    
+    def users(self, **params):
+        return self.client.get('/api/users/', {'username': 'alice', **params}).json()
+    
+    def test_search_ranks_contacts_first_and_paginates(self):
+        data = self.users(search='jo', limit=2, fields='username')
+        self.assertEqual(data['users'][0], {'username': 'jo_friend'})
+        self.assertTrue(data['has_more'])
+        rest = self.users(search='jo', limit=2, fields='username', cursor=data['next_cursor'])
+        names = [u['username'] for u in data['users'] + rest['users']]
+        self.assertEqual(sorted(names), ['jo_friend', 'john_smith', 'johnny', 'zed'])
+        self.assertFalse(rest['has_more'])
+        
+        self.assertEqual(
+            sorted(u['username'] for u in self.users(search='smi jo')['users']),
+            ['jo_friend', 'john_smith', 'zed']
+        )
+    
+    def test_short_searches_are_rejected_and_contacts_rank_in_sql(self):
+        from .models import Contact
+        from . import user_search
+        
+        response = self.client.get('/api/users/', {'username': 'alice', 'search': 'j'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            sorted(u['username'] for u in self.users(search='j smith')['users']),
+            ['jo_friend', 'john_smith', 'zed']
+        )
+        
+        # The contact bonus is a subquery on Contact rather than an id list in the SQL
+        zed = User.objects.get(username='zed')
+        Contact.objects.create(user=self.alice, contact=zed)
+        ranked = user_search.matches('smith', viewer_id=self.alice.id)
+        self.assertIn('EXISTS', str(ranked.query).upper())
+        ranked = dict(ranked.values_list('user_id', 'rank'))
+        self.assertGreaterEqual(ranked[zed.id], user_search.CONTACT_BONUS)
+        self.assertLess(ranked[User.objects.get(username='john_smith').id], user_search.CONTACT_BONUS)
+    
+    def test_index_follows_renames_and_listing_is_paged(self):
+        johnny = User.objects.get(username='johnny')
+        johnny.username = 'marcus'
+        johnny.save()
+        self.assertEqual(self.users(search='johnny')['users'], [])
+        self.assertEqual([u['id'] for u in self.users(search='marc')['users']], [johnny.id])
+        
+        listing = self.users(limit=3, fields='id,username')
+        self.assertEqual([u['username'] for u in listing['users']], ['jo_friend', 'john_smith', 'marcus'])
+        self.assertEqual([u['username'] for u in self.users(cursor=listing['next_cursor'])['users']], ['zed'])
+        self.assertEqual(self.client.get('/api/users/', {'username': 'alice', 'fields': 'password'}).status_code, 400)
+
+
+class StatusFeedTestCase(BaseTestCase):
+    def setUp(self):
+        from .models import Contact, Status
+        from . import contact_graph
+        
+        contact_graph._entries.clear()
+        self.client = APIClient()
+        self.viewer = User.objects.create_user(username='viewer', password='pw')
+        self.friend = User.objects.create_user(username='friend', password='pw')
+        one_way = User.objects.create_user(username='oneway', password='pw')
+        stranger = User.objects.create_user(username='stranger', password='pw')
+        for author in (self.friend, one_way):
+            Contact.objects.create(user=self.viewer, contact=author)
+        Contact.objects.create(user=self.friend, contact=self.viewer)
+        
+        self.public = Status.objects.create(user=self.friend, status_type='text', content='hi all')
+        self.except_status = Status.objects.create(user=self.friend, status_type='text', content='not you', privacy='except')
+        self.except_status.hidden_from.add(self.viewer)
+        Status.objects.create(user=one_way, status_type='text', content='contacts only', privacy='contacts')
+        self.selected = Status.objects.create(user=one_way, status_type='text', content='picked', privacy='selected')
+        self.selected.visible_to.add(self.viewer)
+        Status.objects.create(user=stranger, status_type='text', content='not a contact')
+    
+    def feed(self):
+        return self.client.get('/api/statuses/', {'username': 'viewer'}).json()['statuses']
+    
+    def test_feed_applies_contacts_and_privacy(self):
+        feed = self.feed()
+        self.assertEqual([group['user']['username'] for group in feed], ['oneway', 'friend'])
+        self.assertEqual([s['content'] for s in feed[0]['statuses']], ['picked'])
+        self.assertEqual([s['content'] for s in feed[1]['statuses']], ['hi all'])
+        self.assertTrue(feed[1]['has_unseen'])
+    
+    def test_feed_skips_authors_who_blocked_the_viewer(self):
+        from .models import Contact
+        from . import contact_graph
+        
+        Contact.objects.filter(user=self.friend, contact=self.viewer).update(is_blocked=True)
+        contact_graph.invalidate(self.friend.id)
+        self.assertEqual([group['user']['username'] for group in self.feed()], ['oneway'])
+    
+    def test_views_update_stored_counts(self):
+        response = self.client.post('/api/view-status/', {'username': 'viewer', 'status_id': self.public.id}, format='json')
+        self.assertEqual(response.json()['view_count'], 1)
+        self.client.post('/api/view-status/', {'username': 'viewer', 'status_id': self.public.id}, format='json')
+        
+        from .status_feed import feed
+        feed(self.viewer.id)
+        # The viewer's contacts come from the contact graph cache once loaded; edges back to them take one query
+        with self.assertNumQueries(3):
+            groups = feed(self.viewer.id)
+        friend = groups[1]
+        self.assertEqual(friend['statuses'][0]['view_count'], 1)
+        self.assertTrue(friend['statuses'][0]['has_viewed'])
+        self.assertFalse(friend['has_unseen'])
+    
+    def test_batched_views_are_deduplicated(self):
+        from .models import Status, UserActivity
+        
+        ids = [self.public.id, self.selected.id, self.public.id, self.except_status.id]
+        response = self.client.post('/api/view-status/', {'username': 'viewer', 'status_ids': ids}, format='json').json()
+        self.assertEqual(response['view_counts'], {str(self.public.id): 1, str(self.selected.id): 1})
+        self.assertEqual(response['not_found'], [self.except_status.id])
+        
+        self.client.post('/api/view-status/', {'username': 'viewer', 'status_ids': ids}, format='json')
+        self.assertEqual(Status.objects.get(id=self.public.id).view_count, 1)
+        self.assertEqual(UserActivity.objects.get(user=self.viewer).status_views_given, 2)
+        self.assertEqual(UserActivity.objects.get(user=self.friend).status_views_received, 1)
+        
+        owner_views = self.client.get('/api/status-views/', {'username': 'friend', 'mode': 'aggregate'})
+        self.assertEqual(owner_views.json()['status_counts'][0]['count'], 1)
+    
+    def test_single_view_keeps_original_rules(self):
+        from .models import Status
+        
+        stranger_status = Status.objects.get(content='not a contact')
+        own = Status.objects.create(user=self.viewer, status_type='text', content='mine')
+        for status in (stranger_status, own):
+            response = self.client.post('/api/view-status/', {'username': 'viewer', 'status_id': status.id}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['view_count'], 1)
+        response = self.client.post('/api/view-status/', {'username': 'viewer', 'status_id': 999999}, format='json')
+        self.assertEqual(response.status_code, 404)
+    
+    def test_views_inserted_concurrently_are_not_counted_twice(self):
+        from unittest import mock
+        from .models import Status, StatusView, UserActivity
+        from .status_feed import record_views
+        
+        bulk_create = StatusView.objects.bulk_create
+        raced = []
+        
+        def racing_bulk_create(objs, **kwargs):
+            # Another request records the same view between the dedup check and the insert
+            if not raced:
+                raced.append(StatusView.objects.create(status_id=self.public.id, user=self.viewer))
+            return bulk_create(objs, **kwargs)
+        
+        with mock.patch.object(StatusView.objects, 'bulk_create', side_effect=racing_bulk_create):
+            record_views(self.viewer.id, [self.public.id, self.selected.id])
+        
+        # The concurrent view was counted by its own signals; the batch only counts the one it inserted
+        self.assertEqual(Status.objects.get(id=self.public.id).view_count, 1)
+        self.assertEqual(Status.objects.get(id=self.selected.id).view_count, 1)
+        self.assertEqual(UserActivity.objects.get(user=self.viewer).status_views_given, 2)
+
+
+class StatusReaperTestCase(BaseTestCase):
+    def test_reaps_expired_statuses_in_batches(self):
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+        from .models import Status, StatusView, UserActivity
+        from . import counters, status_reaper
+        
+        owner = User.objects.create_user(username='owner', password='pw')
+        viewer = User.objects.create_user(username='viewer', password='pw')
+        now = timezone.now()
+        expired = [
+            Status.objects.create(user=owner, status_type='text', content=f'old {i}', expires_at=now - timedelta(hours=2))
+            for i in range(3)
+        ]
+        expired[0].hidden_from.add(viewer)
+        within_grace = Status.objects.create(user=owner, status_type='text', content='grace', expires_at=now - timedelta(minutes=5))
+        live = Status.objects.create(user=owner, status_type='text', content='live')
+        for status_obj in expired + [live]:
+            StatusView.objects.create(status=status_obj, user=viewer)
+        
+        # One id per DELETE statement, so the chunking is exercised too
+        with mock.patch.object(status_reaper, 'DELETE_CHUNK', 1):
+            metrics = status_reaper.reap(batch_size=2)
+        self.assertEqual((metrics['statuses'], metrics['views'], metrics['audience']), (3, 3, 1))
+        self.assertEqual(metrics['batches'], 2)
+        self.assertEqual(set(Status.objects.values_list('id', flat=True)), {within_grace.id, live.id})
+        self.assertEqual(StatusView.objects.count(), 1)
+        self.assertEqual(counters.get_counters()['statuses'], 2)
+        self.assertEqual(UserActivity.objects.get(user=owner).statuses_posted, 2)
+        self.assertEqual(UserActivity.objects.get(user=owner).status_views_received, 1)
+        self.assertEqual(UserActivity.objects.get(user=viewer).status_views_given, 1)
+        self.assertEqual(status_reaper.reap()['statuses'], 0)
+
+
+
+class ContactGraphTestCase(BaseTestCase):
+    def setUp(self):
+        from . import contact_graph
+        
+        contact_graph._entries.clear()
+        self.client = APIClient()
+        self.alice = User.objects.create_user(username='alice', password='pw')
+        self.bob = User.objects.create_user(username='bob', password='pw')
+    
+    def send(self, sender, receiver):
+        return self.client.post('/api/send-message/', {'sender': sender, 'receiver': receiver, 'content': 'hi'}, format='json')
+    
+    def test_blocks_stop_direct_messages(self):
+        from . import contact_graph
+        
+        self.client.post('/api/add-contact/', {'username': 'alice', 'contact': 'bob'}, format='json')
+        self.assertEqual(self.send('alice', 'bob').status_code, 201)
+        self.assertTrue(contact_graph.is_contact(self.alice.id, self.bob.id))
+        self.assertFalse(contact_graph.is_mutual(self.alice.id, self.bob.id))
+        
+        self.client.post('/api/block-contact/', {'username': 'bob', 'contact': 'alice'}, format='json')
+        self.assertTrue(contact_graph.is_blocked(self.alice.id, self.bob.id))
+        with self.assertNumQueries(0):
+            self.assertTrue(contact_graph.is_blocked(self.bob.id, self.alice.id))
+        self.assertEqual(self.send('alice', 'bob').status_code, 403)
+        self.assertEqual(self.send('bob', 'alice').status_code, 403)
+        
+        self.client.post('/api/block-contact/', {'username': 'bob', 'contact': 'alice', 'blocked': False}, format='json')
+        self.assertEqual(self.send('alice', 'bob').status_code, 201)
+        self.assertTrue(contact_graph.is_mutual(self.alice.id, self.bob.id))
+    
+    def test_entries_follow_version_changes_and_expire(self):
+        from django.core.cache import cache
+        from .models import Contact
+        from . import contact_graph
+        
+        Contact.objects.create(user=self.bob, contact=self.alice)
+        self.assertFalse(contact_graph.is_blocked(self.alice.id, self.bob.id))
+        # update() skips the signals, so the cached edges are kept until the version changes
+        Contact.objects.filter(user=self.bob).update(is_blocked=True)
+        self.assertFalse(contact_graph.is_blocked(self.alice.id, self.bob.id))
+        
+        # Another worker's invalidation, then its version evicted: neither matches the cached entry
+        cache.set(contact_graph._version_key(self.bob.id), 'other-worker', None)
+        self.assertTrue(contact_graph.is_blocked(self.alice.id, self.bob.id))
+        Contact.objects.filter(user=self.bob).update(is_blocked=False)
+        cache.delete(contact_graph._version_key(self.bob.id))
+        self.assertFalse(contact_graph.is_blocked(self.alice.id, self.bob.id))
+        
+        contact_graph._entries.clear()
+        with self.settings(CONTACT_GRAPH_CACHE_LOCAL_TTL=0):
+            contact_graph.blocked(self.bob.id)
+            Contact.objects.filter(user=self.bob).update(is_blocked=True)
+            self.assertTrue(contact_graph.is_blocked(self.alice.id, self.bob.id))
+    
+    def test_cache_is_bounded(self):
+        from . import contact_graph
+        
+        with self.settings(CONTACT_GRAPH_CACHE_SIZE=1):
+            contact_graph.load([self.alice.id, self.bob.id])
+            self.assertEqual(len(contact_graph._entries), 1)
+
+
+class AddressBookSyncTestCase(BaseTestCase):
+    def setUp(self):
+        from .models import UserProfile
+        
+        self.client = APIClient()
+        self.owner = User.objects.create_user(username='owner', password='pw')
+        UserProfile.objects.create(user=self.owner, phone_number='+91 98765 00000')
+        for username, number in [('ravi', '+91 98765 43210'), ('sam', '+1 (415) 555-0100'), ('zoe', '020 7946 0018')]:
+            UserProfile.objects.create(user=User.objects.create_user(username=username, password='pw'), phone_number=number)
+    
+    def sync(self, **data):
+        return self.client.post('/api/sync-contacts/', {'username': 'owner', **data}, format='json')
+    
+    def test_phone_normalization(self):
+        from .phone import to_e164
+        
+        self.assertEqual(to_e164('+1 (415) 555-0100'), '+14155550100')
+        self.assertEqual(to_e164('0044 20 7946 0018'), '+442079460018')
+        self.assertEqual(to_e164('919876543210'), '+919876543210')
+        self.assertEqual(to_e164('098765 43210', '91'), '+919876543210')
+        self.assertIsNone(to_e164('555-0100'))
+    
+    def test_full_and_incremental_sync(self):
+        from .models import Contact
+        
+        # Bare national numbers take the country code of the owner's own number
+        data = self.sync(numbers=['98765 43210', 'not a number', '+919876500000']).json()
+        self.assertEqual([m['username'] for m in data['matches']], ['ravi'])
+        self.assertEqual(data['invalid'], 1)
+        self.assertTrue(Contact.objects.filter(user=self.owner, contact__username='ravi').exists())
+        
+        same = self.sync(numbers=['+919876543210', '+91 98765 00000']).json()
+        self.assertTrue(same['unchanged'])
+        self.assertEqual(same['hash'], data['hash'])
+        
+        delta = self.sync(base_hash=data['hash'], added=['+14155550100'], removed=['+919876500000']).json()
+        self.assertEqual([m['username'] for m in delta['matches']], ['sam'])
+        self.assertEqual(delta['numbers'], 2)
+        self.assertEqual(Contact.objects.filter(user=self.owner).count(), 2)
+        
+        stale = self.sync(base_hash=data['hash'], added=['+442079460018'])
+        self.assertEqual(stale.status_code, 409)
+
+
+class UserCacheTestCase(BaseTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from .models import UserProfile
+        from . import user_cache
+        
+        cache.clear()
+        user_cache._entries.clear()
+        user_cache._usernames.clear()
+        self.client = APIClient()
+        self.boss = User.objects.create_user(username='boss', password='pw', first_name='Big')
+        UserProfile.objects.create(user=self.boss, role='admin')
+    
+    def test_lookups_are_cached_and_invalidated(self):
+        from .models import UserProfile
+        from . import user_cache
+        
+        user_cache.get_user('boss')
+        with self.assertNumQueries(0):
+            user = user_cache.get_user('boss')
+            self.assertEqual((user.id, user.first_name, user.profile.role), (self.boss.id, 'Big', 'admin'))
+        
+        profile = UserProfile.objects.get(user=self.boss)
+        profile.role = 'user'
+        profile.save()
+        self.assertEqual(user_cache.get_user('boss').profile.role, 'user')
+        
+        self.boss.username = 'chief'
+        self.boss.save()
+        with self.assertRaises(User.DoesNotExist):
+            user_cache.get_user('boss')
+        self.assertEqual(user_cache.get_user('chief').id, self.boss.id)
+        self.assertGreater(user_cache.stats()['hit_rate'], 0)
+    
+    def test_admin_check_uses_cache(self):
+        from .models import UserProfile
+        
+        self.assertEqual(self.client.get('/api/admin/anomalies/', {'username': 'boss'}).status_code, 200)
+        profile = UserProfile.objects.get(user=self.boss)
+        profile.role = 'user'
+        profile.save()
+        self.assertEqual(self.client.get('/api/admin/anomalies/', {'username': 'boss'}).status_code, 403)
+    
+    def test_send_message_counts_with_single_update(self):
+        from .models import UserProfile
+        
+        User.objects.create_user(username='friend', password='pw')
+        for _ in range(2):
+            self.client.post('/api/send-message/', {'sender': 'boss', 'receiver': 'friend', 'content': 'hi'}, format='json')
+        self.assertEqual(UserProfile.objects.get(user=self.boss).total_messages, 2)
+
+
+class TokenAuthTestCase(BaseTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='alice', password='pw')
+    
+    def test_login_issues_tokens_verified_without_queries(self):
+        from django.test import RequestFactory
+        from .middleware import TokenAuthenticationMiddleware
+        
+        response = self.client.post('/api/login/', {'username': 'alice', 'password': 'pw'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['token_type'], 'Bearer')
+        
+        request = RequestFactory().get('/api/users/', HTTP_AUTHORIZATION=f"Bearer {response.data['access_token']}")
+        middleware = TokenAuthenticationMiddleware(lambda request: request)
+        with self.assertNumQueries(0):
+            middleware(request)
+            self.assertTrue(request.user.is_authenticated)
+            self.assertEqual((request.user.id, request.user.username), (self.user.id, 'alice'))
+        
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(self.client.get('/api/users/').status_code, 401)
+    
+    def test_refresh_rotates_and_password_change_revokes(self):
+        from django.core.cache import cache
+        from . import tokens
+        
+        issued = tokens.issue(self.user)
+        response = self.client.post('/api/token/refresh/', {'refresh_token': issued['refresh_token']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(tokens.verify_access(response.data['access_token'])['uid'], self.user.id)
+        # The old refresh token was rotated out
+        response = self.client.post('/api/token/refresh/', {'refresh_token': issued['refresh_token']}, format='json')
+        self.assertEqual(response.status_code, 401)
+        
+        # Rotation is recorded in the database, not a per-process cache
+        cache.clear()
+        self.assertEqual(tokens.revoke(issued['refresh_token']), False)
+        
+        issued = tokens.issue(self.user)
+        self.user.set_password('new')
+        self.user.save()
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.refresh(issued['refresh_token'])
+    
+    def test_token_requests_must_name_the_token_user(self):
+        from django.test import override_settings
+        from .models import UserProfile
+        
+        UserProfile.objects.create(user=User.objects.create_user(username='bob', password='pw'))
+        access = self.client.post('/api/login/', {'username': 'alice', 'password': 'pw'}, format='json').data['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        
+        self.assertEqual(self.client.get('/api/groups/', {'username': 'alice'}).status_code, 200)
+        self.assertEqual(self.client.get('/api/groups/', {'username': 'bob'}).status_code, 403)
+        response = self.client.post('/api/send-message/', {
+            'sender': 'bob', 'receiver': 'alice', 'content': 'x' * 5000
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+        # Looking up someone else's profile is not acting as them
+        self.assertEqual(self.client.get('/api/user-profile/', {'username': 'bob'}).status_code, 200)
+        
+        with override_settings(REQUIRE_TOKEN_AUTH=True):
+            self.assertEqual(self.client.get('/api/groups/', {'username': 'alice'}).status_code, 200)
+            self.client.credentials()
+            self.assertEqual(self.client.get('/api/groups/', {'username': 'alice'}).status_code, 401)
+            self.assertEqual(self.client.get('/api/health/').status_code, 200)
+    
+    def test_acting_username_prefers_token_and_skips_the_session(self):
+        from django.test import RequestFactory
+        from django.utils.functional import SimpleLazyObject
+        from .middleware import TokenAuthenticationMiddleware, acting_username
+        from . import tokens
+        
+        def no_session():
+            raise AssertionError('session read')
+        
+        factory = RequestFactory()
+        request = factory.get('/api/groups/', HTTP_AUTHORIZATION=f"Bearer {tokens.issue(self.user)['access_token']}")
+        TokenAuthenticationMiddleware(lambda request: request)(request)
+        self.assertEqual(acting_username(request), 'alice')
+        
+        request = factory.get('/api/health/')
+        request.user = SimpleLazyObject(no_session)
+        TokenAuthenticationMiddleware(lambda request: request)(request)
+        self.assertIsNone(acting_username(request))
+    
+    def test_concurrent_refreshes_of_one_token_rotate_once(self):
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+        from .models import RevokedToken
+        from . import tokens
+        
+        issued = tokens.issue(self.user)
+        claims = tokens._verify_refresh(issued['refresh_token'])
+        # Both requests pass the revocation check before either records the token as used
+        with mock.patch.object(tokens, '_verify_refresh', return_value=claims):
+            tokens.refresh(issued['refresh_token'])
+            with self.assertRaises(tokens.InvalidToken):
+                tokens.refresh(issued['refresh_token'])
+        
+        self.assertEqual(tokens.prune_revoked(), 0)
+        later = timezone.now() + timedelta(seconds=86400 + 1)
+        self.assertEqual(tokens.prune_revoked(now=later), 1)
+        self.assertFalse(RevokedToken.objects.exists())
+
+
+class AuthorizationCacheTestCase(BaseTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from .models import UserProfile
+        from . import authz
+        
+        cache.clear()
+        authz._entries.clear()
+        self.client = APIClient()
+        self.boss = User.objects.create_user(username='boss', password='pw')
+        UserProfile.objects.create(user=self.boss, role='admin')
+        self.client.post('/api/signup/', {'username': 'newbie', 'password': 'pw'}, format='json')
+    
+    def test_role_checks_cached_and_invalidated_by_group_changes(self):
+        from django.contrib.auth.models import Group as DjangoGroup
+        from . import authz
+        
+        admins = DjangoGroup.objects.create(name='Admin')
+        self.boss.groups.add(admins)
+        self.assertTrue(authz.is_admin(self.boss.id))
+        with self.assertNumQueries(0):
+            self.assertTrue(authz.is_admin(self.boss.id))
+            self.assertTrue(authz.has_role(self.boss.id, 'admin'))
+        
+        admins.user_set.remove(self.boss)
+        self.assertFalse(authz.is_admin(self.boss.id))
+        
+        self.boss.groups.add(admins)
+        admins.name = 'Staff'
+        admins.save()
+        self.assertEqual(authz.groups(self.boss.id), {'Staff'})
+    
+    def test_entries_expire_and_survive_version_eviction(self):
+        from django.core.cache import cache
+        from django.test import override_settings
+        from .models import UserProfile
+        from . import authz
+        
+        self.assertEqual(authz.role(self.boss.id), 'admin')
+        # Writes that skip the signals leave the cached role in place until something changes
+        UserProfile.objects.filter(user=self.boss).update(role='user')
+        self.assertEqual(authz.role(self.boss.id), 'admin')
+        
+        # An evicted version reads as a change, not as the missing version the entry was loaded under
+        cache.delete(authz._version_key(self.boss.id))
+        self.assertEqual(authz.role(self.boss.id), 'user')
+        
+        # Entries are dropped once their local TTL runs out
+        authz._entries.clear()
+        with override_settings(AUTHZ_CACHE_LOCAL_TTL=0):
+            authz.role(self.boss.id)
+            UserProfile.objects.filter(user=self.boss).update(role='admin')
+            with self.assertNumQueries(2):
+                self.assertEqual(authz.role(self.boss.id), 'admin')
+    
+    def test_make_admin_invalidates_cached_role(self):
+        from django.contrib.auth.models import Group as DjangoGroup
+        
+        self.boss.groups.add(DjangoGroup.objects.create(name='Admin'))
+        response = self.client.post('/api/verify-admin/', {'username': 'newbie'}, format='json')
+        self.assertFalse(response.data['is_admin'])
+        self.assertEqual(self.client.get('/api/admin/anomalies/', {'username': 'newbie'}).status_code, 403)
+        
+        response = self.client.post('/api/make-admin/', {
+            'admin_username': 'boss', 'admin_password': 'pw', 'target_username': 'newbie'
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/api/verify-admin/', {'username': 'newbie'}, format='json')
+        self.assertEqual((response.data['is_admin'], response.data['groups']), (True, ['Admin']))
+        self.assertEqual(self.client.get('/api/admin/anomalies/', {'username': 'newbie'}).status_code, 200)
+
+
+class BulkGroupMembershipTestCase(BaseTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from . import user_cache
+        
+        cache.clear()
+        user_cache._entries.clear()
+        user_cache._usernames.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(username='owner', password='pw')
+        for i in range(30):
+            User.objects.create_user(username=f'member{i}', password='pw')
+    
+    def test_create_group_adds_members_in_bulk(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import GroupMembership, UserActivity
+        
+        members = [f'member{i}' for i in range(30)] + ['ghost']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/create-group/', {
+                'creator': 'owner', 'name': 'Community', 'members': members
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        # Independent of the number of members
+        self.assertLess(len(queries), 30)
+        self.assertEqual(response.data['group']['member_count'], 31)
+        self.assertEqual(response.data['unknown_members'], ['ghost'])
+        
+        group_id = response.data['group']['id']
+        self.assertTrue(GroupMembership.objects.get(group_id=group_id, user=self.owner).is_admin)
+        self.assertEqual(UserActivity.objects.get(user__username='member0').groups, 1)
+        self.assertEqual(UserActivity.objects.get(user=self.owner).groups, 1)
+    
+    def test_batch_add_and_remove_members(self):
+        from .models import GroupMembership, UserActivity
+        
+        group_id = self.client.post('/api/create-group/', {
+            'creator': 'owner', 'name': 'Team', 'members': ['member0']
+        }, format='json').data['group']['id']
+        
+        response = self.client.post('/api/add-group-member/', {
+            'group_id': group_id, 'admin': 'owner', 'members': ['member0', 'member1', 'member2', 'ghost']
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['added'], ['member1', 'member2'])
+        self.assertEqual(response.data['unknown_members'], ['ghost'])
+        self.assertEqual(response.data['member_count'], 4)
+        
+        response = self.client.post('/api/remove-group-member/', {
+            'group_id': group_id, 'admin': 'owner', 'members': ['member0', 'member1', 'member5']
+        }, format='json')
+        self.assertEqual(response.data['removed'], ['member0', 'member1'])
+        self.assertEqual(GroupMembership.objects.filter(group_id=group_id).count(), 2)
+        self.assertEqual(UserActivity.objects.get(user__username='member0').groups, 0)
+        
+        response = self.client.post('/api/add-group-member/', {
+            'group_id': group_id, 'admin': 'owner', 'member': 'ghost'
+        }, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class GroupMembershipCacheTestCase(BaseTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from . import group_cache, user_cache
+        
+        cache.clear()
+        group_cache._entries.clear()
+        user_cache._entries.clear()
+        user_cache._usernames.clear()
+        self.client = APIClient()
+        for username in ('owner', 'member', 'outsider'):
+            User.objects.create_user(username=username, password='pw')
+        self.group_id = self.client.post('/api/create-group/', {
+            'creator': 'owner', 'name': 'Team', 'members': ['member']
+        }, format='json').data['group']['id']
+    
+    def send(self, sender):
+        return self.client.post('/api/send-message/', {
+            'sender': sender, 'group_id': self.group_id, 'content': 'hi'
+        }, format='json')
+    
+    def test_group_send_checks_permissions_without_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import Group
+        
+        self.assertEqual(self.send('member').status_code, 201)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.send('member').status_code, 201)
+        tables = ('"api_group"', '"api_groupmembership"', '"api_group_admins"')
+        self.assertFalse([q['sql'] for q in queries if q['sql'].startswith('SELECT') and any(t in q['sql'] for t in tables)])
+        
+        self.assertEqual(self.send('outsider').status_code, 403)
+        group = Group.objects.get(id=self.group_id)
+        group.only_admins_can_send = True
+        group.save()
+        self.assertEqual(self.send('member').status_code, 403)
+        self.assertEqual(self.send('owner').status_code, 201)
+    
+    def test_reads_require_membership_and_follow_changes(self):
+        def read(username):
+            return self.client.get('/api/group-messages/', {'group_id': self.group_id, 'username': username})
+        
+        self.send('member')
+        response = read('member')
+        self.assertEqual((response.status_code, response.data['count']), (200, 1))
+        self.assertEqual(read('outsider').status_code, 403)
+        
+        self.client.post('/api/add-group-member/', {
+            'group_id': self.group_id, 'admin': 'owner', 'member': 'outsider'
+        }, format='json')
+        self.assertEqual(read('outsider').status_code, 200)
+        
+        self.client.post('/api/remove-group-member/', {
+            'group_id': self.group_id, 'admin': 'owner', 'member': 'member'
+        }, format='json')
+        self.assertEqual(read('member').status_code, 403)
+        self.assertEqual(self.send('member').status_code, 403)
+    
+    def test_entries_expire_and_survive_version_eviction(self):
+        from django.core.cache import cache
+        from django.test import override_settings
+        from .models import Group
+        from . import group_cache
+        
+        self.assertFalse(group_cache.get(self.group_id).only_admins_can_send)
+        # update() skips the signals, so the cached entry is kept until something changes
+        Group.objects.filter(id=self.group_id).update(only_admins_can_send=True)
+        self.assertFalse(group_cache.get(self.group_id).only_admins_can_send)
+        
+        cache.delete(group_cache._version_key(self.group_id))
+        self.assertTrue(group_cache.get(self.group_id).only_admins_can_send)
+        
+        group_cache._entries.clear()
+        with override_settings(GROUP_CACHE_LOCAL_TTL=0):
+            group_cache.get(self.group_id)
+            Group.objects.filter(id=self.group_id).update(only_admins_can_send=False)
+            self.assertFalse(group_cache.get(self.group_id).only_admins_can_send)
@@ -0,0 +1,363 @@
+"""
+Message volume time series
+Hourly and daily message counts and active senders per conversation, group, sender and globally,
+stored as compact uint32 arrays; committed messages are buffered per process and written in batches
+"""
+
+import logging
+import threading
+from datetime import timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from . import flusher
+from .models import Message, MessageVolumeSeries, SeriesSenderMark
+
+logger = logging.getLogger(__name__)
+
+BUCKET_DTYPE = np.dtype('<u4')
+# Buckets per stored row: hourly rows cover a day, daily rows a month
+BUCKETS = {'hour': 24, 'day': 31}
+STEPS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+TRUNC = {'hour': TruncHour, 'day': TruncDay}
+RESOLUTIONS = tuple(BUCKETS)
+
+# Active senders are tracked for shared scopes only; a sender's own series has one sender
+SENDER_SCOPES = ('global', 'conversation', 'group')
+SCOPE_FIELDS = {'conversation': 'conversation_id', 'group': 'group_id', 'user': 'sender_id'}
+
+# Sender marks are only consulted for the current bucket, so older ones can be pruned
+MARK_RETENTION = timedelta(days=2)
+# Sender marks looked up per query when flushing
+MARK_LOOKUP_CHUNK = 200
+
+# Messages recorded in this process and not yet written:
+# (scope, scope_id, resolution, period_start) -> counts, and (scope, scope_id, resolution, bucket_start, user_id) marks
+_pending_counts = {}
+_pending_marks = set()
+_pending_lock = threading.Lock()
+
+
+def bucket_start(resolution, at):
+    """Start (UTC) of the bucket containing at"""
+    at = at.astimezone(dt_timezone.utc)
+    if resolution == 'hour':
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def locate(resolution, at):
+    """(period_start, bucket index) of the stored row and slot holding time at"""
+    at = at.astimezone(dt_timezone.utc)
+    if resolution == 'hour':
+        return at.date(), at.hour
+    return at.date().replace(day=1), at.day - 1
+
+
+def _empty(resolution):
+    return np.zeros(BUCKETS[resolution], dtype=BUCKET_DTYPE)
+
+
+def _decode(blob, resolution):
+    if not blob:
+        return _empty(resolution)
+    return np.frombuffer(bytes(blob), dtype=BUCKET_DTYPE).copy()
+
+
+def _row_filter(keys):
+    condition = Q()
+    for scope, scope_id, resolution, period_start in keys:
+        condition |= Q(scope=scope, scope_id=scope_id, resolution=resolution, period_start=period_start)
+    return condition
+
+
+def message_scopes(sender_id, conversation_id=None, group_id=None):
+    """Series a message counts towards, as (scope, scope_id) pairs"""
+    scopes = [('global', 0), ('user', sender_id)]
+    if conversation_id:
+        scopes.append(('conversation', conversation_id))
+    if group_id:
+        scopes.append(('group', group_id))
+    return scopes
+
+
+def _insert_marks(marks):
+    """Insert sender marks that don't exist yet; returns those, i.e. first sends in their bucket"""
+    by_bucket = {}
+    for scope, scope_id, resolution, start, user_id in marks:
+        by_bucket.setdefault((scope, scope_id, resolution, start), set()).add(user_id)
+
+    existing = set()
+    buckets = list(by_bucket.items())
+    for i in range(0, len(buckets), MARK_LOOKUP_CHUNK):
+        condition = Q()
+        for (scope, scope_id, resolution, start), user_ids in buckets[i:i + MARK_LOOKUP_CHUNK]:
+            condition |= Q(scope=scope, scope_id=scope_id, resolution=resolution, bucket_start=start, user_id__in=user_ids)
+        existing.update(
+            SeriesSenderMark.objects.filter(condition).values_list('scope', 'scope_id', 'resolution', 'bucket_start', 'user_id')
+        )
+
+    new = [mark for mark in marks if mark not in existing]
+    SeriesSenderMark.objects.bulk_create([
+        SeriesSenderMark(scope=scope, scope_id=scope_id, resolution=resolution, bucket_start=start, user_id=user_id)
+        for scope, scope_id, resolution, start, user_id in new
+    ], ignore_conflicts=True)
+    return new
+
+
+def apply_deltas(deltas):
+    """
+    Add per-bucket deltas to series rows, creating missing rows
+
+    deltas maps (scope, scope_id, resolution, period_start) -> (counts, senders) arrays.
+    Rows are locked for the read-modify-write so concurrent senders don't lose updates.
+    """
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        rows = list(MessageVolumeSeries.objects.select_for_update().filter(_row_filter(deltas)))
+        found = {(row.scope, row.scope_id, row.resolution, row.period_start) for row in rows}
+        missing = [key for key in deltas if key not in found]
+
+        if missing:
+            MessageVolumeSeries.objects.bulk_create([
+                MessageVolumeSeries(
+                    scope=scope, scope_id=scope_id, resolution=resolution, period_start=period_start,
+                    counts=_empty(resolution).tobytes(), senders=_empty(resolution).tobytes()
+                )
+                for scope, scope_id, resolution, period_start in missing
+            ], ignore_conflicts=True)
+            rows += list(MessageVolumeSeries.objects.select_for_update().filter(_row_filter(missing)))
+
+        now = timezone.now()
+        for row in rows:
+            counts, senders = deltas[(row.scope, row.scope_id, row.resolution, row.period_start)]
+            row.counts = (_decode(row.counts, row.resolution) + counts).astype(BUCKET_DTYPE).tobytes()
+            row.senders = (_decode(row.senders, row.resolution) + senders).astype(BUCKET_DTYPE).tobytes()
+            row.updated_at = now
+
+        MessageVolumeSeries.objects.bulk_update(rows, ['counts', 'senders', 'updated_at'])
+
+
+def record_message(sender_id, created_at, conversation_id=None, group_id=None):
+    """
+    Count one sent message in every series it belongs to
+
+    The counts are buffered and written by flush(), which the background
+    flusher runs every MESSAGE_SERIES_FLUSH_INTERVAL seconds, so sends
+    neither queue on the global series row nor wait for a flush.
+    """
+    scopes = message_scopes(sender_id, conversation_id, group_id)
+
+    with _pending_lock:
+        for scope, scope_id in scopes:
+            for resolution in RESOLUTIONS:
+                period_start, index = locate(resolution, created_at)
+                key = (scope, scope_id, resolution, period_start)
+                counts = _pending_counts.get(key)
+                if counts is None:
+                    counts = _pending_counts[key] = _empty(resolution)
+                counts[index] += 1
+                if scope in SENDER_SCOPES:
+                    _pending_marks.add((scope, scope_id, resolution, bucket_start(resolution, created_at), sender_id))
+
+    flusher.register(flush, 'MESSAGE_SERIES_FLUSH_INTERVAL', 5)
+
+
+def flush():
+    """Write buffered message counts, and active senders from newly inserted sender marks"""
+    with _pending_lock:
+        counts = dict(_pending_counts)
+        marks = set(_pending_marks)
+        _pending_counts.clear()
+        _pending_marks.clear()
+
+    if not counts:
+        return
+
+    try:
+        with transaction.atomic():
+            deltas = {key: (block, _empty(key[2])) for key, block in counts.items()}
+            for scope, scope_id, resolution, start, _ in _insert_marks(marks):
+                period_start, index = locate(resolution, start)
+                deltas[(scope, scope_id, resolution, period_start)][1][index] += 1
+            # One locked read-modify-write per series row for the whole batch
+            apply_deltas(deltas)
+    except Exception as e:
+        # Put the counts back so the next flush retries them
+        logger.warning(f"Message volume flush failed: {e}")
+        with _pending_lock:
+            for key, block in counts.items():
+                _pending_counts[key] = _pending_counts.get(key, _empty(key[2])) + block
+            _pending_marks.update(marks)
+
+
+def record_message_on_commit(message):
+    """Schedule record_message for after the surrounding transaction commits"""
+    args = (message.sender_id, message.created_at, message.conversation_id, message.group_id)
+
+    def record():
+        try:
+            record_message(*args)
+        except Exception as e:
+            # The message itself is committed; a missed bucket is fixed by rebuild()
+            logger.warning(f"Message volume update failed: {e}")
+
+    transaction.on_commit(record)
+
+
+def _pending_blocks(scope, scope_id, resolution):
+    """This process's unwritten counts and senders for one series: {period_start: counts}, {bucket_start: user_ids}"""
+    with _pending_lock:
+        counts = {
+            key[3]: block.copy() for key, block in _pending_counts.items() if key[:3] == (scope, scope_id, resolution)
+        }
+        senders = {}
+        for mark_scope, mark_scope_id, mark_resolution, start, user_id in _pending_marks:
+            if (mark_scope, mark_scope_id, mark_resolution) == (scope, scope_id, resolution):
+                senders.setdefault(start, set()).add(user_id)
+    return counts, senders
+
+
+def series(scope, scope_id, resolution, since, until):
+    """
+    Dense list of buckets covering [since, until) for one series
+
+    Reads the stored rows plus this process's buffered messages, without
+    writing anything; other workers' messages appear once their flusher
+    writes them. A buffered sender may already be counted in the stored
+    row, so a bucket's active senders are the larger of the two counts.
+    """
+    step = STEPS[resolution]
+    starts = []
+    start = bucket_start(resolution, since)
+    while start < until:
+        starts.append(start)
+        start += step
+
+    if not starts:
+        return []
+
+    rows = MessageVolumeSeries.objects.filter(
+        scope=scope, scope_id=scope_id, resolution=resolution,
+        period_start__gte=locate(resolution, starts[0])[0],
+        period_start__lte=locate(resolution, starts[-1])[0]
+    ).only('period_start', 'counts', 'senders')
+    blocks = {
+        row.period_start: (_decode(row.counts, resolution), _decode(row.senders, resolution))
+        for row in rows
+    }
+    pending_counts, pending_senders = _pending_blocks(scope, scope_id, resolution)
+
+    buckets = []
+    for start in starts:
+        period_start, index = locate(resolution, start)
+        counts, senders = blocks.get(period_start, (None, None))
+        messages = int(counts[index]) if counts is not None else 0
+        if period_start in pending_counts:
+            messages += int(pending_counts[period_start][index])
+        bucket = {'start': start.isoformat(), 'messages': messages}
+        if scope in SENDER_SCOPES:
+            stored = int(senders[index]) if senders is not None else 0
+            bucket['active_senders'] = max(stored, len(pending_senders.get(start, ())))
+        buckets.append(bucket)
+    return buckets
+
+
+def recent_series(scope, scope_id, resolution, buckets):
+    """The last `buckets` buckets of a series, ending with the current one"""
+    step = STEPS[resolution]
+    current = bucket_start(resolution, timezone.now())
+    return series(scope, scope_id, resolution, current - step * (buckets - 1), current + step)
+
+
+def _aggregate(messages, scope, resolution):
+    """Grouped (scope_id, bucket, messages, senders) rows for one scope and resolution"""
+    bucket = TRUNC[resolution]('created_at', tzinfo=dt_timezone.utc)
+    field = SCOPE_FIELDS.get(scope)
+    if field:
+        messages = messages.filter(**{f'{field}__isnull': False})
+
+    group_by = [field, 'bucket'] if field else ['bucket']
+    annotations = {'messages': Count('id')}
+    if scope in SENDER_SCOPES:
+        annotations['senders'] = Count('sender', distinct=True)
+
+    rows = messages.annotate(bucket=bucket).values(*group_by).annotate(**annotations).order_by()
+    for row in rows.iterator():
+        yield row[field] if field else 0, row['bucket'], row['messages'], row.get('senders', 0)
+
+
+def rebuild(since=None, batch_size=500):
+    """
+    Recompute series from Message, from the start of since's month (or everything)
+
+    Also re-seeds sender marks for the current buckets. Returns rows written.
+    This process's buffered messages are already in Message, so they are
+    dropped; run it when other workers' buffers have been flushed.
+    """
+    with _pending_lock:
+        _pending_counts.clear()
+        _pending_marks.clear()
+
+    messages = Message.objects.all()
+    if since is not None:
+        since = bucket_start('day', since).replace(day=1)
+        messages = messages.filter(created_at__gte=since)
+
+    blocks = {}
+    for scope in ('global', 'user', 'conversation', 'group'):
+        for resolution in RESOLUTIONS:
+            for scope_id, bucket, count, senders in _aggregate(messages, scope, resolution):
+                period_start, index = locate(resolution, bucket)
+                key = (scope, scope_id, resolution, period_start)
+                if key not in blocks:
+                    blocks[key] = (_empty(resolution), _empty(resolution))
+                blocks[key][0][index] = count
+                blocks[key][1][index] = senders
+
+    now = timezone.now()
+    with transaction.atomic():
+        existing = MessageVolumeSeries.objects.all()
+        if since is not None:
+            existing = existing.filter(period_start__gte=since.date())
+        existing.delete()
+
+        MessageVolumeSeries.objects.bulk_create([
+            MessageVolumeSeries(
+                scope=scope, scope_id=scope_id, resolution=resolution, period_start=period_start,
+                counts=counts.tobytes(), senders=senders.tobytes()
+            )
+            for (scope, scope_id, resolution, period_start), (counts, senders) in blocks.items()
+        ], batch_size=batch_size)
+
+        SeriesSenderMark.objects.all().delete()
+        marks = []
+        for resolution in RESOLUTIONS:
+            current = bucket_start(resolution, now)
+            recent = Message.objects.filter(created_at__gte=current)
+            for scope in SENDER_SCOPES:
+                field = SCOPE_FIELDS.get(scope)
+                pairs = recent.filter(**{f'{field}__isnull': False}) if field else recent
+                pairs = pairs.values_list(field or 'sender_id', 'sender_id').distinct().order_by()
+                marks += [
+                    SeriesSenderMark(
+                        scope=scope, scope_id=scope_id if field else 0, resolution=resolution,
+                        bucket_start=current, user_id=sender_id
+                    )
+                    for scope_id, sender_id in pairs
+                ]
+        SeriesSenderMark.objects.bulk_create(marks, batch_size=batch_size, ignore_conflicts=True)
+
+    return len(blocks)
+
+
+def prune_marks():
+    """Delete sender marks for buckets that can no longer receive messages"""
+    deleted, _ = SeriesSenderMark.objects.filter(bucket_start__lt=timezone.now() - MARK_RETENTION).delete()
+    return deleted
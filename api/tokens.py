@@ -0,0 +1,133 @@
+"""
+Signed access tokens
+Stateless HMAC-signed access and refresh tokens, so requests are authenticated without
+a password hash or a session lookup
+"""
+
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .models import RevokedToken
+
+ACCESS_SALT = 'api.tokens.access'
+REFRESH_SALT = 'api.tokens.refresh'
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _password_fingerprint(user):
+    # Changing the password invalidates outstanding refresh tokens
+    return salted_hmac(REFRESH_SALT, user.password).hexdigest()[:16]
+
+
+def issue(user):
+    """{'access_token', 'refresh_token', 'token_type', 'expires_in'} for a user"""
+    access = signing.dumps({'uid': user.id, 'u': user.username}, salt=ACCESS_SALT)
+    refresh = signing.dumps(
+        {'uid': user.id, 'jti': uuid.uuid4().hex, 'pw': _password_fingerprint(user)},
+        salt=REFRESH_SALT
+    )
+    return {
+        'access_token': access,
+        'refresh_token': refresh,
+        'token_type': 'Bearer',
+        'expires_in': _setting('ACCESS_TOKEN_TTL', 900),
+    }
+
+
+def verify_access(token):
+    """Claims of a valid access token; raises InvalidToken. Never touches the database."""
+    try:
+        return signing.loads(token, salt=ACCESS_SALT, max_age=_setting('ACCESS_TOKEN_TTL', 900))
+    except signing.SignatureExpired:
+        raise InvalidToken('Access token expired')
+    except signing.BadSignature:
+        raise InvalidToken('Invalid access token')
+
+
+def token_user(claims):
+    """User carrying the token's id and username; other fields are deferred and load on access"""
+    return User.from_db('default', ('id', 'username', 'is_active'), (claims['uid'], claims['u'], True))
+
+
+def _verify_refresh(token):
+    try:
+        claims = signing.loads(token, salt=REFRESH_SALT, max_age=_setting('REFRESH_TOKEN_TTL', 86400))
+    except signing.SignatureExpired:
+        raise InvalidToken('Refresh token expired')
+    except signing.BadSignature:
+        raise InvalidToken('Invalid refresh token')
+    if RevokedToken.objects.filter(jti=claims['jti']).exists():
+        raise InvalidToken('Refresh token revoked')
+    return claims
+
+
+def _claim(claims):
+    """
+    Mark a refresh token used; False if another request already did
+
+    The unique jti makes the insert the single point of truth, so of two
+    concurrent uses of one token exactly one succeeds, in every worker and
+    across restarts.
+    """
+    expires_at = timezone.now() + timedelta(seconds=_setting('REFRESH_TOKEN_TTL', 86400))
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(jti=claims['jti'], expires_at=expires_at)
+    except IntegrityError:
+        return False
+    return True
+
+
+def revoke(refresh_token):
+    """Revoke a refresh token until it would have expired anyway; ignores invalid tokens"""
+    try:
+        claims = _verify_refresh(refresh_token)
+    except InvalidToken:
+        return False
+    return _claim(claims)
+
+
+def prune_revoked(now=None):
+    """Delete revocations of tokens that have expired anyway; returns how many"""
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
+
+
+def refresh(refresh_token):
+    """
+    New token pair for a refresh token, which is used up (rotated)
+
+    One query loads the user, so deactivated users and changed passwords
+    stop refreshing.
+    """
+    claims = _verify_refresh(refresh_token)
+    user = User.objects.filter(id=claims['uid'], is_active=True).first()
+    if user is None or not constant_time_compare(claims['pw'], _password_fingerprint(user)):
+        raise InvalidToken('Refresh token no longer valid')
+
+    if not _claim(claims):
+        raise InvalidToken('Refresh token revoked')
+    return user, issue(user)
+
+
+def bearer_token(request):
+    """Token from an 'Authorization: Bearer ...' header, if any"""
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    return token.strip()
@@ -7,6 +7,7 @@ urlpatterns = [
     path('signup/', views.signup, name='signup'),
     path('login/', views.login, name='login'),
     path('logout/', views.logout, name='logout'),
+    path('token/refresh/', views.refresh_token, name='token-refresh'),
     path('verify-admin/', views.verify_admin, name='verify-admin'),
     path('make-admin/', views.make_admin, name='make-admin'),
     path('remove-admin/', views.remove_admin, name='remove-admin'),
@@ -24,6 +25,7 @@ urlpatterns = [
     path('edit-message/', views.edit_message, name='edit-message'),
     path('react-message/', views.react_to_message, name='react-message'),
     path('mark-as-read/', views.mark_as_read, name='mark-as-read'),
+    path('search-messages/', views.search_messages, name='search-messages'),
     
     # ============= GROUPS =============
     path('create-group/', views.create_group, name='create-group'),
@@ -44,6 +46,8 @@ urlpatterns = [
     
     # ============= CONTACTS =============
     path('add-contact/', views.add_contact, name='add-contact'),
+    path('block-contact/', views.block_contact, name='block-contact'),
+    path('sync-contacts/', views.sync_contacts, name='sync-contacts'),
     path('contacts/', views.get_contacts, name='get-contacts'),
     
     # ============= ADMIN =============
@@ -51,7 +55,13 @@ urlpatterns = [
     
     # ============= DASHBOARD ANALYTICS =============
     path('admin/api-logs/', views_dashboard.get_api_logs, name='get-api-logs'),
+    path('admin/api-logs/export/', views_dashboard.export_api_logs, name='export-api-logs'),
     path('admin/system-stats/', views_dashboard.get_system_stats, name='get-system-stats'),
+    path('admin/latency/', views_dashboard.get_latency_stats, name='get-latency-stats'),
+    path('admin/message-volume/', views_dashboard.get_message_volume, name='get-message-volume'),
+    path('admin/cohorts/', views_dashboard.get_cohort_retention, name='get-cohort-retention'),
+    path('admin/heavy-hitters/', views_dashboard.get_heavy_hitters, name='get-heavy-hitters'),
+    path('admin/anomalies/', views_dashboard.get_anomalies, name='get-anomalies'),
     path('admin/update-stats/', views_dashboard.update_system_stats, name='update-system-stats'),
     path('analytics/', views_dashboard.get_user_analytics, name='get-user-analytics'),
     path('message-reactions/', views_dashboard.get_message_reactions, name='get-message-reactions'),
@@ -60,4 +70,5 @@ urlpatterns = [
     
     # ============= HEALTH =============
     path('health/', views.health_check, name='health'),
+    path('health/ready/', views.readiness_check, name='health-ready'),
 ]
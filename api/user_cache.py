@@ -0,0 +1,122 @@
+"""
+Username resolution cache
+Per-process LRU of username -> user and profile snapshot, backed by the shared Django cache,
+so identifying the caller (and the other party) doesn't cost a query per request
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from .models import UserProfile
+
+# Columns kept in the snapshot; everything else is deferred and loaded on access
+USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser')
+PROFILE_FIELDS = ('id', 'user_id', 'role', 'avatar', 'status', 'bio', 'phone_number')
+
+_entries = OrderedDict()
+# user id -> username, to drop local entries of renamed users
+_usernames = {}
+_lock = threading.Lock()
+_stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _key(username):
+    return f'user_cache:user:{username}'
+
+
+def _id_key(user_id):
+    return f'user_cache:id:{user_id}'
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def _load(username):
+    """(user values, profile values or None) from the database"""
+    user = User.objects.filter(username=username).values_list(*USER_FIELDS).first()
+    if user is None:
+        return None
+    profile = UserProfile.objects.filter(user_id=user[0]).values_list(*PROFILE_FIELDS).first()
+    return user, profile
+
+
+def _build(snapshot):
+    """
+    User instance (with .profile) from a snapshot
+
+    Fields outside the snapshot are deferred, so reading them queries the
+    database and save() only writes the snapshot columns. Views that modify a
+    user or profile should still fetch it from the database.
+    """
+    user_values, profile_values = snapshot
+    user = User.from_db('default', USER_FIELDS, user_values)
+    profile = None
+    if profile_values is not None:
+        profile = UserProfile.from_db('default', PROFILE_FIELDS, profile_values)
+        UserProfile.user.field.set_cached_value(profile, user)
+    User.profile.related.set_cached_value(user, profile)
+    return user
+
+
+def get_user(username):
+    """User for username (profile attached); raises User.DoesNotExist like User.objects.get"""
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(username)
+        if entry is not None and entry[0] > now:
+            _entries.move_to_end(username)
+            _stats['local_hits'] += 1
+            return _build(entry[1])
+
+    snapshot = cache.get(_key(username))
+    if snapshot is not None:
+        _count('shared_hits')
+    else:
+        _count('misses')
+        snapshot = _load(username)
+        if snapshot is None:
+            raise User.DoesNotExist(f'User {username} does not exist')
+        ttl = _setting('USER_CACHE_TTL', 300)
+        cache.set_many({_key(username): snapshot, _id_key(snapshot[0][0]): username}, ttl)
+
+    with _lock:
+        _entries[username] = (now + _setting('USER_CACHE_LOCAL_TTL', 30), snapshot)
+        _entries.move_to_end(username)
+        _usernames[snapshot[0][0]] = username
+        while len(_entries) > _setting('USER_CACHE_SIZE', 10000):
+            evicted, (_, evicted_snapshot) = _entries.popitem(last=False)
+            _usernames.pop(evicted_snapshot[0][0], None)
+    return _build(snapshot)
+
+
+def invalidate(user_id, username=None):
+    """Forget a user here and in the shared cache (under its current and previous username)"""
+    previous = cache.get(_id_key(user_id))
+    cache.delete_many([_key(name) for name in {username, previous} if name] + [_id_key(user_id)])
+
+    with _lock:
+        _stats['invalidations'] += 1
+        for name in {username, _usernames.pop(user_id, None)}:
+            if name:
+                _entries.pop(name, None)
+
+
+def stats():
+    """This worker's hit and miss counts, and the share of lookups served without a query"""
+    with _lock:
+        counts = dict(_stats)
+        counts['size'] = len(_entries)
+    lookups = counts['local_hits'] + counts['shared_hits'] + counts['misses']
+    counts['hit_rate'] = round((counts['local_hits'] + counts['shared_hits']) / lookups, 4) if lookups else None
+    return counts
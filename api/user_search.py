@@ -0,0 +1,133 @@
+"""
+User directory search
+Prefix index of username, name and email tokens, ranked with the caller's contacts first
+"""
+
+import re
+
+from django.db import transaction
+from django.db.models import Case, Exists, ExpressionWrapper, F, IntegerField, Max, OuterRef, Value, When
+
+from . import contact_graph
+from .models import Contact, UserSearchTerm
+
+# Relevance of the field a term came from
+USERNAME_WEIGHT = 6
+USERNAME_TOKEN_WEIGHT = 5
+NAME_WEIGHT = 4
+EMAIL_WEIGHT = 2
+# Added to contacts so they rank above any non-contact
+CONTACT_BONUS = 100
+
+INDEXED_FIELDS = {'username', 'first_name', 'last_name', 'email'}
+MAX_TERMS = 4
+# Shorter words would range-scan most of the index, so they are not searched on
+MIN_PREFIX_LENGTH = 2
+TERM_LENGTH = 150
+# Upper bound character for "starts with" range scans that can use a plain B-tree index
+_PREFIX_END = '\U0010ffff'
+
+
+def tokens(value):
+    return [token for token in re.split(r'[\W_]+', value.lower()) if token]
+
+
+def user_terms(user):
+    """{term: weight} indexed for a user"""
+    terms = {}
+
+    def add(value, weight):
+        value = value.lower().strip()[:TERM_LENGTH]
+        if value and terms.get(value, 0) < weight:
+            terms[value] = weight
+
+    add(user.username, USERNAME_WEIGHT)
+    for token in tokens(user.username):
+        add(token, USERNAME_TOKEN_WEIGHT)
+
+    full_name = f'{user.first_name} {user.last_name}'.strip()
+    add(full_name, NAME_WEIGHT)
+    for token in tokens(full_name):
+        add(token, NAME_WEIGHT)
+
+    if user.email:
+        add(user.email, EMAIL_WEIGHT)
+        for token in tokens(user.email.split('@')[0]):
+            add(token, EMAIL_WEIGHT)
+
+    return terms
+
+
+def index_user(user):
+    """Replace a user's search terms"""
+    with transaction.atomic():
+        UserSearchTerm.objects.filter(user=user).delete()
+        UserSearchTerm.objects.bulk_create([
+            UserSearchTerm(term=term, user=user, weight=weight) for term, weight in user_terms(user).items()
+        ])
+
+
+def rebuild(users, batch_size=1000):
+    """Re-index the given users queryset in batches; returns users indexed"""
+    total = 0
+    batch = []
+    ids = []
+
+    def write():
+        with transaction.atomic():
+            UserSearchTerm.objects.filter(user_id__in=ids).delete()
+            UserSearchTerm.objects.bulk_create(batch, batch_size=batch_size)
+        batch.clear()
+        ids.clear()
+
+    for user in users.only('id', *INDEXED_FIELDS).order_by('id').iterator(chunk_size=batch_size):
+        ids.append(user.id)
+        batch.extend(
+            UserSearchTerm(term=term, user_id=user.id, weight=weight)
+            for term, weight in user_terms(user).items()
+        )
+        total += 1
+        if len(ids) >= batch_size:
+            write()
+
+    if ids:
+        write()
+    return total
+
+
+def prefix(word):
+    """Range filter matching terms that start with word"""
+    return {'term__gte': word, 'term__lt': word + _PREFIX_END}
+
+
+def matches(query, viewer_id=None):
+    """
+    Grouped (user_id, rank) rows for users matching every word of query as a prefix
+
+    The longest word drives the index range scan; the others filter its users.
+    rank is the best field weight (doubled for exact terms), plus
+    CONTACT_BONUS when the user is in the viewer's contacts. Users the viewer
+    has blocked are left out. None when the query has no words; words shorter
+    than MIN_PREFIX_LENGTH are ignored, and ValueError is raised when that
+    leaves none.
+    """
+    words = sorted(set(tokens(query or '')), key=len, reverse=True)
+    if not words:
+        return None
+    words = [word for word in words if len(word) >= MIN_PREFIX_LENGTH][:MAX_TERMS]
+    if not words:
+        raise ValueError(f'Search needs at least {MIN_PREFIX_LENGTH} characters')
+
+    driving, others = words[0], words[1:]
+    rows = UserSearchTerm.objects.filter(**prefix(driving))
+    for word in others:
+        rows = rows.filter(user_id__in=UserSearchTerm.objects.filter(**prefix(word)).values('user_id'))
+
+    contact = Value(0)
+    if viewer_id is not None:
+        rows = rows.exclude(user_id=viewer_id).exclude(user_id__in=list(contact_graph.blocked(viewer_id)))
+        is_contact = Exists(Contact.objects.filter(user_id=viewer_id, contact_id=OuterRef('user_id'), is_blocked=False))
+        contact = Case(When(is_contact, then=Value(CONTACT_BONUS)), default=Value(0))
+
+    best = Max(Case(When(term=driving, then=F('weight') * 2), default=F('weight'), output_field=IntegerField()))
+    return rows.values('user_id').annotate(rank=ExpressionWrapper(best + contact, output_field=IntegerField()))
@@ -1,10 +1,11 @@
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from django.contrib.auth.models import User, Group as DjangoGroup
 from django.contrib.auth import authenticate
-from django.db.models import Count, Sum, Q, Max, Prefetch
+from django.db import connection, transaction
+from django.db.models import F, Q
 from django.utils import timezone
 from datetime import timedelta
 import traceback
@@ -13,9 +14,11 @@ import uuid
 
 from .models import (
     UserProfile, Conversation, Message, MessageReaction,
-    Call, Status, StatusView, Contact, Group, GroupMembership,
-    APILog, SystemStats
+    Call, Status, Contact, Group,
+    APILog
 )
+from . import address_book, anomaly, authz, contact_graph, count_cache, group_cache, hll, membership, pagination, response_cache, search, status_feed, timeseries, tokens, user_cache, user_search
+from .middleware import acting_username
 
 def log_api_request(request, endpoint, status_code, response_time):
     """Helper function to log API requests"""
@@ -33,12 +36,24 @@ def log_api_request(request, endpoint, status_code, response_time):
             ip_address=ip,
             user_agent=user_agent
         )
+        
+        # Per-endpoint rate/latency anomaly detection
+        anomaly.observe(endpoint, response_time)
+        
+        # Distinct active users (DAU/WAU/MAU) sketch; failed requests don't count
+        if status_code < 400:
+            hll.record_active(acting_username(request))
     except Exception as e:
         print(f"Error logging API request: {e}")
 
 def is_user_admin(user):
-    """Check if user is in Admin group"""
-    return user.groups.filter(name='Admin').exists()
+    """Check if user is in Admin group (from the authorization cache)"""
+    return authz.is_admin(user.id)
+
+def increment_total_messages(user):
+    """Bump a user's profile message total in one UPDATE, creating the profile if missing"""
+    if not UserProfile.objects.filter(user=user).update(total_messages=F('total_messages') + 1):
+        UserProfile.objects.get_or_create(user=user, defaults={'total_messages': 1})
 
 def get_or_create_conversation(user1, user2):
     """Get or create a conversation between two users"""
@@ -131,6 +146,7 @@ def signup(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@authentication_classes([])
 def login(request):
     """Handle user/admin login with Django authentication"""
     start_time = time.time()
@@ -166,6 +182,7 @@ def login(request):
         response_time = (time.time() - start_time) * 1000
         log_api_request(request, '/api/login/', 200, response_time)
         
+        # Later requests send the access token instead of re-authenticating
         return Response({
             'role': 'admin' if is_admin else 'user',
             'username': username,
@@ -178,7 +195,8 @@ def login(request):
                 'status': profile.status,
                 'phone_number': profile.phone_number,
                 'bio': profile.bio
-            }
+            },
+            **tokens.issue(user)
         })
     else:
         # Invalid credentials
@@ -192,9 +210,11 @@ def login(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def logout(request):
-    """Handle user logout"""
+    """Handle user logout, revoking the refresh token if one is given"""
     start_time = time.time()
     username = request.data.get('username')
+    if not username and request.user.is_authenticated:
+        username = request.user.username
     
     if not username:
         return Response({'error': 'Username required'}, status=status.HTTP_400_BAD_REQUEST)
@@ -210,53 +230,112 @@ def logout(request):
         response_time = (time.time() - start_time) * 1000
         log_api_request(request, '/api/logout/', 200, response_time)
         
+        if request.data.get('refresh_token'):
+            tokens.revoke(request.data['refresh_token'])
+        
         return Response({'success': True, 'message': 'Logged out successfully'})
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@authentication_classes([])
+def refresh_token(request):
+    """Exchange a refresh token for a new access/refresh token pair"""
+    start_time = time.time()
+    token = request.data.get('refresh_token')
+    
+    if not token:
+        return Response({'error': 'refresh_token required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        user, issued = tokens.refresh(token)
+    except tokens.InvalidToken as e:
+        response_time = (time.time() - start_time) * 1000
+        log_api_request(request, '/api/token/refresh/', 401, response_time)
+        return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+    
+    response_time = (time.time() - start_time) * 1000
+    log_api_request(request, '/api/token/refresh/', 200, response_time)
+    
+    return Response({'username': user.username, 'user_id': user.id, **issued})
+
 # ============= USER MANAGEMENT ENDPOINTS =============
 
+USERS_PAGE_MAX = 200
+
+# Directory fields selectable with ?fields=; profile fields need the profile join
+USER_FIELDS = {
+    'id': lambda user, profile: user.id,
+    'username': lambda user, profile: user.username,
+    'email': lambda user, profile: user.email,
+    'full_name': lambda user, profile: user.get_full_name() or user.username,
+    'avatar': lambda user, profile: profile.avatar if profile else None,
+    'status': lambda user, profile: profile.status if profile else 'Hey there! I am using White Beat',
+    'bio': lambda user, profile: profile.bio if profile else '',
+    'is_online': lambda user, profile: profile.is_online if profile else False,
+    'last_seen': lambda user, profile: profile.last_seen.isoformat() if profile and profile.last_seen else None,
+    'phone_number': lambda user, profile: profile.phone_number if profile else None,
+}
+USER_PROFILE_FIELDS = {'avatar', 'status', 'bio', 'is_online', 'last_seen', 'phone_number'}
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_users(request):
-    """Get list of all users for chat"""
+    """
+    Page through the user directory for chat
+    
+    Without search, users are listed by username. With search, every word must
+    prefix-match the username, name or email, and the caller's contacts rank first.
+    """
     start_time = time.time()
     current_username = request.GET.get('username')
-    search = request.GET.get('search', '')
+    search_query = request.GET.get('search', '')
+    cursor = request.GET.get('cursor')
     
     if not current_username:
         return Response({'error': 'Username required'}, status=status.HTTP_400_BAD_REQUEST)
     
+    fields = [field for field in request.GET.get('fields', '').split(',') if field] or list(USER_FIELDS)
+    unknown = [field for field in fields if field not in USER_FIELDS]
+    if unknown:
+        return Response({'error': f"Unknown fields: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+    
     try:
-        current_user = User.objects.get(username=current_username)
-        
-        # Get all users except current user
-        users = User.objects.exclude(id=current_user.id).select_related('profile')
-        
-        # Apply search filter
-        if search:
-            users = users.filter(
-                Q(username__icontains=search) | 
-                Q(email__icontains=search) |
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search)
-            )
+        limit = max(1, min(int(request.GET.get('limit', 50)), USERS_PAGE_MAX))
+        after = pagination.decode_cursor(cursor) if cursor else None
+        if after is not None and len(after) != 2:
+            raise ValueError('Invalid cursor')
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        current_user = user_cache.get_user(current_username)
+        
+        try:
+            ranked = user_search.matches(search_query, viewer_id=current_user.id)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if ranked is not None:
+            rows, next_cursor = pagination.paginate(ranked, ['rank', 'user_id'], cursor=cursor, limit=limit)
+            user_ids = [row['user_id'] for row in rows]
+        else:
+            users = User.objects.exclude(id=current_user.id).values('id', 'username')
+            rows, next_cursor = pagination.paginate(users, ['username', 'id'], cursor=cursor, limit=limit, descending=False)
+            user_ids = [row['id'] for row in rows]
+        
+        users = User.objects.all()
+        if USER_PROFILE_FIELDS.intersection(fields):
+            users = users.select_related('profile')
+        users = users.in_bulk(user_ids)
         
         users_list = []
-        for user in users:
-            profile = getattr(user, 'profile', None)
-            users_list.append({
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'full_name': user.get_full_name() or user.username,
-                'avatar': profile.avatar if profile else None,
-                'status': profile.status if profile else 'Hey there! I am using White Beat',
-                'bio': profile.bio if profile else '',
-                'is_online': profile.is_online if profile else False,
-                'last_seen': profile.last_seen.isoformat() if profile and profile.last_seen else None,
-                'phone_number': profile.phone_number if profile else None
-            })
+        for user_id in user_ids:
+            user = users.get(user_id)
+            if user is None:
+                continue
+            profile = getattr(user, 'profile', None) if USER_PROFILE_FIELDS.intersection(fields) else None
+            users_list.append({field: USER_FIELDS[field](user, profile) for field in fields})
         
         response_time = (time.time() - start_time) * 1000
         log_api_request(request, '/api/users/', 200, response_time)
@@ -264,7 +343,9 @@ def get_users(request):
         return Response({
             'success': True,
             'users': users_list,
-            'count': len(users_list)
+            'count': len(users_list),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
         })
         
     except User.DoesNotExist:
@@ -380,7 +461,7 @@ def get_conversations(request):
         return Response({'error': 'Username required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        user = User.objects.get(username=username)
+        user = user_cache.get_user(username)
         
         # Get all conversations where user is participant
         conversations = Conversation.objects.filter(
@@ -459,8 +540,8 @@ def get_messages(request):
         )
     
     try:
-        user = User.objects.get(username=username)
-        other_user = User.objects.get(username=other_username)
+        user = user_cache.get_user(username)
+        other_user = user_cache.get_user(other_username)
         
         # Get or create conversation
         conversation = get_or_create_conversation(user, other_user)
@@ -543,35 +624,31 @@ def send_message(request):
         return Response({'error': 'Either content or media_url required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        sender = User.objects.get(username=sender_username)
+        sender = user_cache.get_user(sender_username)
         
         # Handle group message
         if group_id:
-            group = Group.objects.get(id=group_id)
-            
-            # Check if sender is member
-            if not group.members.filter(id=sender.id).exists():
-                return Response({'error': 'You are not a member of this group'}, status=status.HTTP_403_FORBIDDEN)
+            group = group_cache.get(group_id)
             
-            # Check if only admins can send
-            if group.only_admins_can_send and not group.admins.filter(id=sender.id).exists():
-                return Response({'error': 'Only admins can send messages in this group'}, status=status.HTTP_403_FORBIDDEN)
+            # Membership and only_admins_can_send, from the cached member/admin ids
+            denial = group_cache.send_denial(group, sender.id)
+            if denial:
+                return Response({'error': denial}, status=status.HTTP_403_FORBIDDEN)
             
-            # Create message
-            message = Message.objects.create(
-                group=group,
-                sender=sender,
-                message_type=message_type,
-                content=content,
-                media_url=media_url,
-                thumbnail_url=thumbnail_url,
-                reply_to_id=reply_to_id
-            )
+            with transaction.atomic():
+                # Create message
+                message = Message.objects.create(
+                    group_id=int(group_id),
+                    sender=sender,
+                    message_type=message_type,
+                    content=content,
+                    media_url=media_url,
+                    thumbnail_url=thumbnail_url,
+                    reply_to_id=reply_to_id
+                )
             
-            # Update sender profile
-            sender_profile, _ = UserProfile.objects.get_or_create(user=sender)
-            sender_profile.total_messages += 1
-            sender_profile.save()
+                # Update sender profile
+                increment_total_messages(sender)
             
             response_time = (time.time() - start_time) * 1000
             log_api_request(request, '/api/send-message/', 201, response_time)
@@ -581,7 +658,7 @@ def send_message(request):
                 'message': {
                     'id': message.id,
                     'sender': sender.username,
-                    'group_id': group.id,
+                    'group_id': message.group_id,
                     'group_name': group.name,
                     'message_type': message.message_type,
                     'content': message.content,
@@ -592,27 +669,29 @@ def send_message(request):
         
         # Handle direct message
         else:
-            receiver = User.objects.get(username=receiver_username)
+            receiver = user_cache.get_user(receiver_username)
             
-            # Get or create conversation
-            conversation = get_or_create_conversation(sender, receiver)
+            if contact_graph.is_blocked(sender.id, receiver.id):
+                return Response({'error': 'You cannot message this user'}, status=status.HTTP_403_FORBIDDEN)
             
-            # Create message
-            message = Message.objects.create(
-                conversation=conversation,
-                sender=sender,
-                receiver=receiver,
-                message_type=message_type,
-                content=content,
-                media_url=media_url,
-                thumbnail_url=thumbnail_url,
-                reply_to_id=reply_to_id
-            )
+            with transaction.atomic():
+                # Get or create conversation
+                conversation = get_or_create_conversation(sender, receiver)
+            
+                # Create message
+                message = Message.objects.create(
+                    conversation=conversation,
+                    sender=sender,
+                    receiver=receiver,
+                    message_type=message_type,
+                    content=content,
+                    media_url=media_url,
+                    thumbnail_url=thumbnail_url,
+                    reply_to_id=reply_to_id
+                )
             
-            # Update sender profile
-            sender_profile, _ = UserProfile.objects.get_or_create(user=sender)
-            sender_profile.total_messages += 1
-            sender_profile.save()
+                # Update sender profile
+                increment_total_messages(sender)
             
             response_time = (time.time() - start_time) * 1000
             log_api_request(request, '/api/send-message/', 201, response_time)
@@ -649,7 +728,7 @@ def delete_message(request):
         return Response({'error': 'message_id and username required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        user = User.objects.get(username=username)
+        user = user_cache.get_user(username)
         message = Message.objects.get(id=message_id)
         
         # Check if user is sender
@@ -683,7 +762,7 @@ def edit_message(request):
         return Response({'error': 'message_id, username, and content required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        user = User.objects.get(username=username)
+        user = user_cache.get_user(username)
         message = Message.objects.get(id=message_id)
         
         # Check if user is sender
@@ -723,15 +802,16 @@ def react_to_message(request):
         return Response({'error': 'message_id, username, and reaction_type required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        user = User.objects.get(username=username)
+        user = user_cache.get_user(username)
         message = Message.objects.get(id=message_id)
         
-        # Create or update reaction
-        reaction, created = MessageReaction.objects.update_or_create(
-            message=message,
-            user=user,
-            defaults={'reaction_type': reaction_type}
-        )
+        with transaction.atomic():
+            # Create or update reaction
+            reaction, created = MessageReaction.objects.update_or_create(
+                message=message,
+                user=user,
+                defaults={'reaction_type': reaction_type}
+            )
         
         response_time = (time.time() - start_time) * 1000
         log_api_request(request, '/api/react-message/', 200, response_time)
@@ -764,7 +844,7 @@ def mark_as_read(request):
         )
     
     try:
-        user = User.objects.get(username=username)
+        user = user_cache.get_user(username)
         conversation = Conversation.objects.get(id=conversation_id)
         
         # Mark all messages from other user as read
@@ -786,6 +866,69 @@ def mark_as_read(request):
     except Conversation.DoesNotExist:
         return Response({'error': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
 
+SEARCH_PAGE_MAX = 100
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_messages(request):
+    """Full-text search over the messages in the user's conversations and groups"""
+    start_time = time.time()
+    username = request.GET.get('username')
+    query = request.GET.get('q', '')
+    cursor = request.GET.get('cursor')
+    
+    if not username or not search.terms(query):
+        return Response({'error': 'username and q required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), SEARCH_PAGE_MAX))
+        after = pagination.decode_cursor(cursor) if cursor else None
+        if after is not None and len(after) != 2:
+            raise ValueError('Invalid cursor')
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        user = user_cache.get_user(username)
+        
+        # One extra row tells whether there is a next page
+        ranked = search.search(query, user_id=user.id, after=after, limit=limit + 1)
+        page = ranked[:limit]
+        messages = Message.objects.select_related('sender', 'group').in_bulk([message_id for message_id, _ in page])
+        
+        results = []
+        for message_id, score in page:
+            msg = messages.get(message_id)
+            if msg is None:
+                continue
+            results.append({
+                'id': msg.id,
+                'sender': msg.sender.username,
+                'conversation_id': msg.conversation_id,
+                'group_id': msg.group_id,
+                'group_name': msg.group.name if msg.group else None,
+                'message_type': msg.message_type,
+                'content': msg.content,
+                'created_at': msg.created_at.isoformat(),
+                'score': round(-score, 4),
+                'is_mine': msg.sender_id == user.id
+            })
+        
+        next_cursor = pagination.encode_cursor(list(page[-1])) if len(ranked) > limit else None
+        
+        response_time = (time.time() - start_time) * 1000
+        log_api_request(request, '/api/search-messages/', 200, response_time)
+        
+        return Response({
+            'success': True,
+            'results': results,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
+    
+    except User.DoesNotExist:
+        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
 # ============= GROUP ENDPOINTS =============
 
 @api_view(['POST'])
@@ -801,29 +944,29 @@ def create_group(request):
     
     if not creator_username or not name:
         return Response({'error': 'creator and name required'}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(member_usernames, list) or len(member_usernames) > membership.MAX_MEMBERS:
+        return Response(
+            {'error': f'members must be a list of at most {membership.MAX_MEMBERS} usernames'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     try:
-        creator = User.objects.get(username=creator_username)
-        
-        # Create group
-        group = Group.objects.create(
-            name=name,
-            description=description,
-            avatar=avatar,
-            created_by=creator
-        )
-        
-        # Add creator as admin and member
-        group.admins.add(creator)
-        GroupMembership.objects.create(group=group, user=creator, is_admin=True)
+        creator = user_cache.get_user(creator_username)
+        # All members in one lookup
+        member_ids, unknown = membership.resolve(member_usernames)
+        
+        with transaction.atomic():
+            # Create group
+            group = Group.objects.create(
+                name=name,
+                description=description,
+                avatar=avatar,
+                created_by=creator
+            )
         
-        # Add other members
-        for username in member_usernames:
-            try:
-                member = User.objects.get(username=username)
-                GroupMembership.objects.create(group=group, user=member, is_admin=False)
-            except User.DoesNotExist:
-                pass
+            # Creator is an admin and a member; everyone else is added in one insert
+            group.admins.add(creator)
+            membership.add(group, {creator.id, *member_ids.values()}, admin_ids={creator.id})
         
         response_time = (time.time() - start_time) * 1000
         log_api_request(request, '/api/create-group/', 201, response_time)
@@ -838,7 +981,8 @@ def create_group(request):
                 'created_by': creator.username,
                 'member_count': group.members.count(),
                 'created_at': group.created_at.isoformat()
-            }
+            },
+            'unknown_members': unknown
         }, status=status.HTTP_201_CREATED)
         
     except User.DoesNotExist:
@@ -855,7 +999,7 @@ def get_groups(request):
         return Response({'error': 'Username required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        user = User.objects.get(username=username)
+        user = user_cache.get_user(username)
         
         # Get all groups where user is a member
         groups = Group.objects.filter(members=user).prefetch_related('members', 'admins', 'messages')
@@ -905,20 +1049,29 @@ def get_groups(request):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_group_messages(request):
-    """Get messages in a group"""
+    """Get messages in a group, for its members"""
     start_time = time.time()
     group_id = request.GET.get('group_id')
+    username = request.GET.get('username')
+    if not username and request.user.is_authenticated:
+        username = request.user.username
     limit = int(request.GET.get('limit', 50))
     offset = int(request.GET.get('offset', 0))
     
-    if not group_id:
-        return Response({'error': 'group_id required'}, status=status.HTTP_400_BAD_REQUEST)
+    if not group_id or not username:
+        return Response({'error': 'group_id and username required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        group = Group.objects.get(id=group_id)
+        group = group_cache.get(group_id)
+        user = user_cache.get_user(username)
+        
+        # Membership from the cached member ids
+        if not group_cache.is_member(group_id, user.id):
+            return Response({'error': 'You are not a member of this group'}, status=status.HTTP_403_FORBIDDEN)
         
         # Get messages with pagination
-        messages = group.messages.filter(
+        group_messages = Message.objects.filter(group_id=group_id)
+        messages = group_messages.filter(
             deleted_for_everyone=False
         ).select_related('sender', 'reply_to').prefetch_related('reactions')[offset:offset+limit]
         
@@ -959,46 +1112,60 @@ def get_group_messages(request):
         
         return Response({
             'success': True,
-            'group_id': group.id,
+            'group_id': int(group_id),
             'group_name': group.name,
             'messages': messages_list,
             'count': len(messages_list),
-            'has_more': group.messages.count() > offset + limit
+            'has_more': group_messages.count() > offset + limit
         })
         
     except Group.DoesNotExist:
         return Response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+    except User.DoesNotExist:
+        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def add_group_member(request):
-    """Add member to group"""
+    """Add a member (member) or many members (members) to group"""
     start_time = time.time()
     group_id = request.data.get('group_id')
     admin_username = request.data.get('admin')
     member_username = request.data.get('member')
+    member_usernames = request.data.get('members')
     
-    if not all([group_id, admin_username, member_username]):
-        return Response({'error': 'group_id, admin, and member required'}, status=status.HTTP_400_BAD_REQUEST)
+    if not group_id or not admin_username or not (member_username or member_usernames):
+        return Response({'error': 'group_id, admin, and member or members required'}, status=status.HTTP_400_BAD_REQUEST)
+    if member_usernames is not None and (
+        not isinstance(member_usernames, list) or len(member_usernames) > membership.MAX_MEMBERS
+    ):
+        return Response(
+            {'error': f'members must be a list of at most {membership.MAX_MEMBERS} usernames'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     try:
         group = Group.objects.get(id=group_id)
-        admin = User.objects.get(username=admin_username)
-        member = User.objects.get(username=member_username)
+        admin = user_cache.get_user(admin_username)
+        member_ids, unknown = membership.resolve(member_usernames or [member_username])
+        if member_username and not member_usernames and unknown:
+            raise User.DoesNotExist
         
         # Check if admin has permission
-        if not group.admins.filter(id=admin.id).exists():
+        if not group_cache.is_admin(group.id, admin.id):
             return Response({'error': 'Only admins can add members'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Add member
-        GroupMembership.objects.get_or_create(group=group, user=member, defaults={'is_admin': False})
+        changed = membership.add(group, member_ids.values())
         
         response_time = (time.time() - start_time) * 1000
         log_api_request(request, '/api/add-group-member/', 200, response_time)
         
+        id_names = {user_id: username for username, user_id in member_ids.items()}
         return Response({
             'success': True,
-            'message': f'{member_username} added to group',
+            'message': f'{member_username or f"{len(changed)} members"} added to group',
+            'added': sorted(id_names[user_id] for user_id in changed),
+            'unknown_members': unknown,
             'member_count': group.members.count()
         })
         
@@ -1010,33 +1177,45 @@ def add_group_member(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def remove_group_member(request):
-    """Remove member from group"""
+    """Remove a member (member) or many members (members) from group"""
     start_time = time.time()
     group_id = request.data.get('group_id')
     admin_username = request.data.get('admin')
     member_username = request.data.get('member')
+    member_usernames = request.data.get('members')
     
-    if not all([group_id, admin_username, member_username]):
-        return Response({'error': 'group_id, admin, and member required'}, status=status.HTTP_400_BAD_REQUEST)
+    if not group_id or not admin_username or not (member_username or member_usernames):
+        return Response({'error': 'group_id, admin, and member or members required'}, status=status.HTTP_400_BAD_REQUEST)
+    if member_usernames is not None and (
+        not isinstance(member_usernames, list) or len(member_usernames) > membership.MAX_MEMBERS
+    ):
+        return Response(
+            {'error': f'members must be a list of at most {membership.MAX_MEMBERS} usernames'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     try:
         group = Group.objects.get(id=group_id)
-        admin = User.objects.get(username=admin_username)
-        member = User.objects.get(username=member_username)
+        admin = user_cache.get_user(admin_username)
+        member_ids, unknown = membership.resolve(member_usernames or [member_username])
+        if member_username and not member_usernames and unknown:
+            raise User.DoesNotExist
         
         # Check if admin has permission
-        if not group.admins.filter(id=admin.id).exists():
+        if not group_cache.is_admin(group.id, admin.id):
             return Response({'error': 'Only admins can remove members'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Remove member
-        GroupMembership.objects.filter(group=group, user=member).delete()
+        changed = membership.remove(group, member_ids.values())
         
         response_time = (time.time() - start_time) * 1000
         log_api_request(request, '/api/remove-group-member/', 200, response_time)
         
+        id_names = {user_id: username for username, user_id in member_ids.items()}
         return Response({
             'success': True,
-            'message': f'{member_username} removed from group',
+            'message': f'{member_username or f"{len(changed)} members"} removed from group',
+            'removed': sorted(id_names[user_id] for user_id in changed),
+            'unknown_members': unknown,
             'member_count': group.members.count()
         })
         
@@ -1064,29 +1243,30 @@ def initiate_call(request):
         return Response({'error': 'Either receiver or group_id required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        caller = User.objects.get(username=caller_username)
+        caller = user_cache.get_user(caller_username)
         
         # Generate unique room ID
         room_id = str(uuid.uuid4())
         
-        if group_id:
-            group = Group.objects.get(id=group_id)
-            call = Call.objects.create(
-                caller=caller,
-                group=group,
-                call_type=call_type,
-                status='initiated',
-                room_id=room_id
-            )
-        else:
-            receiver = User.objects.get(username=receiver_username)
-            call = Call.objects.create(
-                caller=caller,
-                receiver=receiver,
-                call_type=call_type,
-                status='initiated',
-                room_id=room_id
-            )
+        with transaction.atomic():
+            if group_id:
+                group = Group.objects.get(id=group_id)
+                call = Call.objects.create(
+                    caller=caller,
+                    group=group,
+                    call_type=call_type,
+                    status='initiated',
+                    room_id=room_id
+                )
+            else:
+                receiver = user_cache.get_user(receiver_username)
+                call = Call.objects.create(
+                    caller=caller,
+                    receiver=receiver,
+                    call_type=call_type,
+                    status='initiated',
+                    room_id=room_id
+                )
         
         response_time = (time.time() - start_time) * 1000
         log_api_request(request, '/api/initiate-call/', 201, response_time)
@@ -1130,7 +1310,8 @@ def update_call_status(request):
             if call.answered_at:
                 call.duration = int((call.ended_at - call.answered_at).total_seconds())
         
-        call.save()
+        with transaction.atomic():
+            call.save()
         
         response_time = (time.time() - start_time) * 1000
         log_api_request(request, '/api/update-call-status/', 200, response_time)
@@ -1159,7 +1340,7 @@ def get_call_history(request):
         return Response({'error': 'Username required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        user = User.objects.get(username=username)
+        user = user_cache.get_user(username)
         
         # Get all calls where user is caller or receiver
         calls = Call.objects.filter(
@@ -1217,17 +1398,18 @@ def create_status(request):
         return Response({'error': 'Either content or media_url required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        user = User.objects.get(username=username)
+        user = user_cache.get_user(username)
         
-        # Create status
-        status_obj = Status.objects.create(
-            user=user,
-            status_type=status_type,
-            content=content,
-            media_url=media_url,
-            background_color=background_color,
-            privacy=privacy
-        )
+        with transaction.atomic():
+            # Create status
+            status_obj = Status.objects.create(
+                user=user,
+                status_type=status_type,
+                content=content,
+                media_url=media_url,
+                background_color=background_color,
+                privacy=privacy
+            )
         
         response_time = (time.time() - start_time) * 1000
         log_api_request(request, '/api/create-status/', 201, response_time)
@@ -1250,7 +1432,7 @@ def create_status(request):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_statuses(request):
-    """Get active statuses from contacts"""
+    """Get active statuses from contacts, grouped by author (most recent first)"""
     start_time = time.time()
     username = request.GET.get('username')
     
@@ -1258,84 +1440,65 @@ def get_statuses(request):
         return Response({'error': 'Username required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        user = User.objects.get(username=username)
+        user = user_cache.get_user(username)
         
-        # Get active statuses (not expired)
-        now = timezone.now()
-        statuses = Status.objects.filter(
-            expires_at__gt=now
-        ).exclude(user=user).select_related('user__profile').prefetch_related('viewed_by')
-        
-        # Group by user
-        statuses_by_user = {}
-        for status_obj in statuses:
-            user_key = status_obj.user.username
-            if user_key not in statuses_by_user:
-                statuses_by_user[user_key] = {
-                    'user': {
-                        'username': status_obj.user.username,
-                        'avatar': status_obj.user.profile.avatar if hasattr(status_obj.user, 'profile') else None
-                    },
-                    'statuses': []
-                }
-            
-            # Check if current user has viewed
-            has_viewed = status_obj.viewed_by.filter(id=user.id).exists()
-            
-            statuses_by_user[user_key]['statuses'].append({
-                'id': status_obj.id,
-                'status_type': status_obj.status_type,
-                'content': status_obj.content,
-                'media_url': status_obj.media_url,
-                'background_color': status_obj.background_color,
-                'created_at': status_obj.created_at.isoformat(),
-                'expires_at': status_obj.expires_at.isoformat(),
-                'has_viewed': has_viewed,
-                'view_count': status_obj.viewed_by.count()
-            })
+        statuses_by_user = status_feed.feed(user.id)
         
         response_time = (time.time() - start_time) * 1000
         log_api_request(request, '/api/statuses/', 200, response_time)
         
         return Response({
             'success': True,
-            'statuses': list(statuses_by_user.values()),
+            'statuses': statuses_by_user,
             'count': len(statuses_by_user)
         })
         
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
+STATUS_VIEW_BATCH_MAX = 500
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def view_status(request):
-    """Mark status as viewed"""
+    """Mark one status (status_id) or a batch of statuses (status_ids) as viewed"""
     start_time = time.time()
     status_id = request.data.get('status_id')
+    status_ids = request.data.get('status_ids')
     username = request.data.get('username')
     
-    if not status_id or not username:
-        return Response({'error': 'status_id and username required'}, status=status.HTTP_400_BAD_REQUEST)
+    if not (status_id or status_ids) or not username:
+        return Response({'error': 'status_id or status_ids, and username required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        user = User.objects.get(username=username)
-        status_obj = Status.objects.get(id=status_id)
+        ids = [int(value) for value in (status_ids if status_ids else [status_id])]
+    except (TypeError, ValueError):
+        return Response({'error': 'status ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > STATUS_VIEW_BATCH_MAX:
+        return Response({'error': f'At most {STATUS_VIEW_BATCH_MAX} status ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        user = user_cache.get_user(username)
+        # A single status_id keeps its original rules: any existing status can be marked viewed
+        view_counts = status_feed.record_views(user.id, ids, visible_only=bool(status_ids))
         
-        # Create view record
-        StatusView.objects.get_or_create(status=status_obj, user=user)
+        if not status_ids and not view_counts:
+            return Response({'error': 'Status not found'}, status=status.HTTP_404_NOT_FOUND)
         
         response_time = (time.time() - start_time) * 1000
         log_api_request(request, '/api/view-status/', 200, response_time)
         
+        if not status_ids:
+            return Response({'success': True, 'view_count': view_counts[ids[0]]})
+        
         return Response({
             'success': True,
-            'view_count': status_obj.viewed_by.count()
+            'view_counts': {str(key): value for key, value in view_counts.items()},
+            'not_found': [value for value in dict.fromkeys(ids) if value not in view_counts]
         })
         
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-    except Status.DoesNotExist:
-        return Response({'error': 'Status not found'}, status=status.HTTP_404_NOT_FOUND)
 
 # ============= CONTACT ENDPOINTS =============
 
@@ -1352,15 +1515,16 @@ def add_contact(request):
         return Response({'error': 'username and contact required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        user = User.objects.get(username=username)
-        contact = User.objects.get(username=contact_username)
-        
-        # Create contact
-        contact_obj, created = Contact.objects.get_or_create(
-            user=user,
-            contact=contact,
-            defaults={'nickname': nickname}
-        )
+        user = user_cache.get_user(username)
+        contact = user_cache.get_user(contact_username)
+        
+        with transaction.atomic():
+            # Create contact
+            contact_obj, created = Contact.objects.get_or_create(
+                user=user,
+                contact=contact,
+                defaults={'nickname': nickname}
+            )
         
         response_time = (time.time() - start_time) * 1000
         log_api_request(request, '/api/add-contact/', 201 if created else 200, response_time)
@@ -1377,6 +1541,101 @@ def add_contact(request):
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def block_contact(request):
+    """Block or unblock a user (blocked users can't message you or see your statuses)"""
+    start_time = time.time()
+    username = request.data.get('username')
+    contact_username = request.data.get('contact')
+    blocked = request.data.get('blocked', True)
+    
+    if not username or not contact_username:
+        return Response({'error': 'username and contact required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not isinstance(blocked, bool):
+        return Response({'error': 'blocked must be true or false'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        user = user_cache.get_user(username)
+        contact = user_cache.get_user(contact_username)
+        
+        with transaction.atomic():
+            contact_obj, created = Contact.objects.get_or_create(
+                user=user,
+                contact=contact,
+                defaults={'is_blocked': blocked}
+            )
+            if not created and contact_obj.is_blocked != blocked:
+                contact_obj.is_blocked = blocked
+                contact_obj.save(update_fields=['is_blocked'])
+        
+        response_time = (time.time() - start_time) * 1000
+        log_api_request(request, '/api/block-contact/', 200, response_time)
+        
+        return Response({
+            'success': True,
+            'message': 'Contact blocked' if blocked else 'Contact unblocked',
+            'contact': {
+                'username': contact.username,
+                'is_blocked': blocked
+            }
+        })
+    
+    except User.DoesNotExist:
+        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def sync_contacts(request):
+    """Match an uploaded address book against users' phone numbers and add the matches as contacts"""
+    start_time = time.time()
+    username = request.data.get('username')
+    numbers = request.data.get('numbers')
+    added = request.data.get('added', [])
+    removed = request.data.get('removed', [])
+    base_hash = request.data.get('base_hash')
+    country_code = request.data.get('country_code')
+    
+    if not username or (numbers is None and not base_hash):
+        return Response({'error': 'username and numbers (or base_hash with added/removed) required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not all(isinstance(value, list) for value in (numbers or [], added, removed)):
+        return Response({'error': 'numbers, added and removed must be lists'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if max(len(numbers or []), len(added) + len(removed)) > address_book.MAX_NUMBERS:
+        return Response({'error': f'At most {address_book.MAX_NUMBERS} numbers per sync'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        user = user_cache.get_user(username)
+        
+        result = address_book.sync(
+            user,
+            numbers=numbers,
+            added=added,
+            removed=removed,
+            base_digest=base_hash,
+            country_code=country_code
+        )
+        
+        response_time = (time.time() - start_time) * 1000
+        log_api_request(request, '/api/sync-contacts/', 200, response_time)
+        
+        return Response({
+            'success': True,
+            'hash': result['digest'],
+            'unchanged': result['unchanged'],
+            'numbers': result['numbers'],
+            'invalid': result['invalid'],
+            'matches': result['matches'],
+            'count': len(result['matches'])
+        })
+    
+    except User.DoesNotExist:
+        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+    except address_book.SyncConflict as e:
+        return Response({'error': str(e), 'full_sync_required': True}, status=status.HTTP_409_CONFLICT)
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_contacts(request):
@@ -1388,7 +1647,7 @@ def get_contacts(request):
         return Response({'error': 'Username required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        user = User.objects.get(username=username)
+        user = user_cache.get_user(username)
         
         # Get all contacts
         contacts = Contact.objects.filter(user=user).select_related('contact__profile')
@@ -1435,7 +1694,7 @@ def verify_admin(request):
         return Response({'is_admin': False, 'error': 'Username required'})
     
     try:
-        user = User.objects.get(username=username)
+        user = user_cache.get_user(username)
         is_admin = is_user_admin(user)
         
         response_time = (time.time() - start_time) * 1000
@@ -1445,7 +1704,7 @@ def verify_admin(request):
             'is_admin': is_admin,
             'is_admin_group': is_admin,
             'username': username,
-            'groups': list(user.groups.values_list('name', flat=True))
+            'groups': sorted(authz.groups(user.id))
         })
     except User.DoesNotExist:
         return Response({'is_admin': False, 'error': 'User not found'})
@@ -1569,6 +1828,102 @@ def remove_admin(request):
             status=status.HTTP_404_NOT_FOUND
         )
 
+def build_admin_stats():
+    """Compute the admin dashboard statistics payload"""
+    # Get today's date
+    today = timezone.now().date()
+    
+    # Table totals from the shared count cache
+    counts = count_cache.get_counts([
+        'users', 'api_calls_today', 'messages', 'groups', 'calls', 'active_statuses'
+    ])
+    total_users = counts['users']
+    
+    # Distinct active users from the HyperLogLog sketches (no COUNT(DISTINCT) over APILog)
+    active_users = hll.active_users()
+    active_sessions = active_users['daily']
+
+    api_calls_today = counts['api_calls_today']
+    total_messages = counts['messages']
+    total_groups = counts['groups']
+    total_calls = counts['calls']
+    total_statuses = counts['active_statuses']
+    
+    # Revenue (mock calculation based on messages)
+    revenue = total_messages * 0.002  # $0.002 per message
+    
+    # User growth (last 6 days)
+    user_growth = []
+    for i in range(6, 0, -1):
+        date = today - timedelta(days=i)
+        count = User.objects.filter(date_joined__date=date).count()
+        user_growth.append(count)
+    
+    # API usage (last 6 hours)
+    api_usage = []
+    for i in range(6, 0, -1):
+        hour_ago = timezone.now() - timedelta(hours=i)
+        count = APILog.objects.filter(
+            created_at__gte=hour_ago,
+            created_at__lt=hour_ago + timedelta(hours=1)
+        ).count()
+        api_usage.append(count)
+    
+    # Message volume charts from the precomputed series
+    message_volume = {
+        'hourly': timeseries.recent_series('global', 0, 'hour', 24),
+        'daily': timeseries.recent_series('global', 0, 'day', 30)
+    }
+    
+    # Recent users, with admin membership resolved for the page at once
+    recent = list(User.objects.select_related('profile').order_by('-date_joined')[:10])
+    admins = authz.admin_ids([user.id for user in recent])
+    recent_users = []
+    for user in recent:
+        profile = getattr(user, 'profile', None)
+        is_admin = user.id in admins
+        recent_users.append({
+            'id': user.id,
+            'name': user.get_full_name() or user.username,
+            'email': user.email,
+            'username': user.username,
+            'status': 'Active' if (profile and profile.is_active_session) else 'Inactive',
+            'joined': user.date_joined.strftime('%Y-%m-%d'),
+            'total_messages': profile.total_messages if profile else 0,
+            'is_admin': is_admin
+        })
+    
+    # Recent API logs
+    recent_logs = []
+    for log in APILog.objects.select_related('user').order_by('-created_at')[:20]:
+        recent_logs.append({
+            'id': log.id,
+            'endpoint': log.endpoint,
+            'method': log.method,
+            'status': log.status_code,
+            'time': f"{log.response_time:.0f}ms",
+            'user': log.user.username if log.user else 'Anonymous',
+            'created_at': log.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'ip_address': log.ip_address
+        })
+    
+    return {
+        'total_users': total_users,
+        'api_calls_today': api_calls_today,
+        'active_sessions': active_sessions,
+        'active_users': active_users,
+        'total_messages': total_messages,
+        'total_groups': total_groups,
+        'total_calls': total_calls,
+        'total_statuses': total_statuses,
+        'revenue': round(revenue, 2),
+        'user_growth': user_growth,
+        'api_usage': api_usage,
+        'message_volume': message_volume,
+        'recent_users': recent_users,
+        'recent_logs': recent_logs
+    }
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def admin_stats(request):
@@ -1576,103 +1931,12 @@ def admin_stats(request):
     start_time = time.time()
     
     try:
-        # Get today's date
-        today = timezone.now().date()
-        
-        # Total users
-        total_users = User.objects.count()
-        
-        # Active sessions (users active in last 24 hours)
-        yesterday = timezone.now() - timedelta(days=1)
-        active_sessions = UserProfile.objects.filter(
-            last_activity__gte=yesterday,
-            is_active_session=True
-        ).count()
-        
-        # API calls today
-        api_calls_today = APILog.objects.filter(
-            created_at__date=today
-        ).count()
-        
-        # Total messages
-        total_messages = Message.objects.count()
-        
-        # Total groups
-        total_groups = Group.objects.count()
-        
-        # Total calls
-        total_calls = Call.objects.count()
-        
-        # Total statuses
-        total_statuses = Status.objects.filter(expires_at__gt=timezone.now()).count()
-        
-        # Revenue (mock calculation based on messages)
-        revenue = total_messages * 0.002  # $0.002 per message
-        
-        # User growth (last 6 days)
-        user_growth = []
-        for i in range(6, 0, -1):
-            date = today - timedelta(days=i)
-            count = User.objects.filter(date_joined__date=date).count()
-            user_growth.append(count)
-        
-        # API usage (last 6 hours)
-        api_usage = []
-        for i in range(6, 0, -1):
-            hour_ago = timezone.now() - timedelta(hours=i)
-            count = APILog.objects.filter(
-                created_at__gte=hour_ago,
-                created_at__lt=hour_ago + timedelta(hours=1)
-            ).count()
-            api_usage.append(count)
-        
-        # Recent users
-        recent_users = []
-        for user in User.objects.select_related('profile').order_by('-date_joined')[:10]:
-            profile = getattr(user, 'profile', None)
-            is_admin = is_user_admin(user)
-            recent_users.append({
-                'id': user.id,
-                'name': user.get_full_name() or user.username,
-                'email': user.email,
-                'username': user.username,
-                'status': 'Active' if (profile and profile.is_active_session) else 'Inactive',
-                'joined': user.date_joined.strftime('%Y-%m-%d'),
-                'total_messages': profile.total_messages if profile else 0,
-                'is_admin': is_admin
-            })
-        
-        # Recent API logs
-        recent_logs = []
-        for log in APILog.objects.select_related('user').order_by('-created_at')[:20]:
-            recent_logs.append({
-                'id': log.id,
-                'endpoint': log.endpoint,
-                'method': log.method,
-                'status': log.status_code,
-                'time': f"{log.response_time:.0f}ms",
-                'user': log.user.username if log.user else 'Anonymous',
-                'created_at': log.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'ip_address': log.ip_address
-            })
+        stats = response_cache.get_or_compute('admin_stats', {}, build_admin_stats)
         
         response_time = (time.time() - start_time) * 1000
         log_api_request(request, '/api/admin/stats/', 200, response_time)
         
-        return Response({
-            'total_users': total_users,
-            'api_calls_today': api_calls_today,
-            'active_sessions': active_sessions,
-            'total_messages': total_messages,
-            'total_groups': total_groups,
-            'total_calls': total_calls,
-            'total_statuses': total_statuses,
-            'revenue': round(revenue, 2),
-            'user_growth': user_growth,
-            'api_usage': api_usage,
-            'recent_users': recent_users,
-            'recent_logs': recent_logs
-        })
+        return Response(stats)
         
     except Exception as e:
         print(f"Error getting admin stats: {e}")
@@ -1692,55 +1956,68 @@ def admin_stats(request):
             'revenue': 0,
             'user_growth': [0, 0, 0, 0, 0, 0],
             'api_usage': [0, 0, 0, 0, 0, 0],
+            'message_volume': {'hourly': [], 'daily': []},
             'recent_users': [],
             'recent_logs': [],
             'error': str(e)
         })
 
+HEALTH_FEATURES = {
+    'user_to_user_chat': True,
+    'group_chat': True,
+    'voice_calls': True,
+    'video_calls': True,
+    'status_updates': True,
+    'media_messages': True,
+    'message_reactions': True,
+    'contacts': True,
+    'group_based_admin': True,
+    'signup': True
+}
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def health_check(request):
-    """Health check endpoint"""
-    start_time = time.time()
-    
-    # Check database
-    db_connected = False
+    """Liveness check - answers without touching the database"""
+    return Response({
+        'status': 'healthy',
+        'service': 'White Beat Backend - Full Featured Chat',
+        'features': HEALTH_FEATURES
+    })
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def readiness_check(request):
+    """Readiness check - verifies the database and reports cached totals"""
     try:
-        User.objects.count()
-        db_connected = True
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
     except Exception as e:
         print(f"Database error: {e}")
+        return Response({
+            'status': 'unavailable',
+            'service': 'White Beat Backend - Full Featured Chat',
+            'database_connected': False
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     
-    # Check Admin group
-    admin_group_exists = DjangoGroup.objects.filter(name='Admin').exists()
-    
-    response_time = (time.time() - start_time) * 1000
-    log_api_request(request, '/api/health/', 200, response_time)
+    counts = count_cache.get_counts([
+        'users', 'messages', 'conversations', 'groups', 'calls', 'active_statuses', 'admin_users'
+    ])
     
     return Response({
-        'status': 'healthy',
+        'status': 'ready',
         'service': 'White Beat Backend - Full Featured Chat',
-        'database_connected': db_connected,
-        'admin_group_exists': admin_group_exists,
-        'features': {
-            'user_to_user_chat': True,
-            'group_chat': True,
-            'voice_calls': True,
-            'video_calls': True,
-            'status_updates': True,
-            'media_messages': True,
-            'message_reactions': True,
-            'contacts': True,
-            'group_based_admin': True,
-            'signup': True
-        },
+        'database_connected': True,
+        'admin_group_exists': DjangoGroup.objects.filter(name='Admin').exists(),
+        'features': HEALTH_FEATURES,
         'stats': {
-            'total_users': User.objects.count() if db_connected else 0,
-            'total_messages': Message.objects.count() if db_connected else 0,
-            'total_conversations': Conversation.objects.count() if db_connected else 0,
-            'total_groups': Group.objects.count() if db_connected else 0,
-            'total_calls': Call.objects.count() if db_connected else 0,
-            'active_statuses': Status.objects.filter(expires_at__gt=timezone.now()).count() if db_connected else 0,
-            'admin_users': User.objects.filter(groups__name='Admin').count() if db_connected else 0
-        }
+            'total_users': counts['users'],
+            'total_messages': counts['messages'],
+            'total_conversations': counts['conversations'],
+            'total_groups': counts['groups'],
+            'total_calls': counts['calls'],
+            'active_statuses': counts['active_statuses'],
+            'admin_users': counts['admin_users']
+        },
+        'user_cache': user_cache.stats()
     })
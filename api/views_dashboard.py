@@ -3,18 +3,97 @@ Dashboard-specific views for User Dashboard
 Handles API logs, system stats, conversations, and analytics
 """
 
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.models import User
-from django.db.models import Count, Q, Sum
+from django.db.models import Count, F
+from django.db.models.functions import Substr, TruncDate
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, timedelta
+import csv
 import json
 
 from .models import (
     UserProfile, APILog, SystemStats, Conversation, 
-    Message, MessageReaction, StatusView, Call, Status, Group, Contact
+    Message, MessageReaction, StatusView, Status,
+    UserActivity, MessageVolumeSeries, AnomalyAlert
 )
+from . import (
+    activity, anomaly, authz, cohorts, count_cache, counters, heavy_hitters, latency, pagination,
+    response_cache, timeseries, user_cache
+)
+
+
+API_LOG_PAGE_MAX = 500
+API_LOG_EXPORT_CHUNK = 2000
+API_LOG_EXPORT_FIELDS = [
+    ('id', 'id'),
+    ('created_at', 'created_at'),
+    ('method', 'method'),
+    ('endpoint', 'endpoint'),
+    ('status_code', 'status_code'),
+    ('response_time', 'response_time'),
+    ('user', 'user__username'),
+    ('ip_address', 'ip_address'),
+]
+
+
+def parse_datetime_param(value):
+    """Parse an ISO date or datetime query param into an aware datetime"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        parsed = datetime.combine(day, datetime.min.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_log_filters(params):
+    """Build APILog filter kwargs from query params (raises ValueError on bad input)"""
+    filters = {}
+    if params.get('since'):
+        filters['created_at__gte'] = parse_datetime_param(params['since'])
+    if params.get('until'):
+        filters['created_at__lt'] = parse_datetime_param(params['until'])
+    if params.get('endpoint'):
+        filters['endpoint'] = params['endpoint']
+    if params.get('method'):
+        filters['method'] = params['method'].upper()
+    if params.get('user'):
+        filters['user__username'] = params['user']
+    if params.get('status_code'):
+        filters['status_code'] = int(params['status_code'])
+    return filters
+
+
+def build_api_logs(filters, cursor, limit):
+    """Compute one keyset-paginated page of API logs, newest first"""
+    logs = APILog.objects.filter(**filters).select_related('user')
+    logs, next_cursor = pagination.paginate(logs, ['created_at', 'id'], cursor, limit)
+    
+    logs_data = [{
+        'id': log.id,
+        'endpoint': log.endpoint,
+        'method': log.method,
+        'user': log.user.username if log.user else 'Anonymous',
+        'status_code': log.status_code,
+        'response_time': log.response_time,
+        'ip_address': log.ip_address,
+        'created_at': log.created_at.isoformat()
+    } for log in logs]
+    
+    return {
+        'success': True,
+        'logs': logs_data,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+        # Exact totals are only kept for the whole table
+        'total': None if filters else count_cache.get_count('api_logs')
+    }
 
 
 @csrf_exempt
@@ -29,32 +108,130 @@ def get_api_logs(request):
             return JsonResponse({'error': 'Username required'}, status=400)
         
         # Verify user is admin
-        user = User.objects.get(username=username)
-        profile = UserProfile.objects.get(user=user)
+        user = user_cache.get_user(username)
+        
+        if not authz.has_role(user.id, 'admin'):
+            return JsonResponse({'error': 'Admin access required'}, status=403)
+        
+        # Get a page of API logs
+        try:
+            limit = max(1, min(int(request.GET.get('limit', 50)), API_LOG_PAGE_MAX))
+            filters = parse_log_filters(request.GET)
+            cursor = request.GET.get('cursor')
+            if cursor:
+                pagination.decode_cursor(cursor)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        params = {key: value for key, value in request.GET.items() if key != 'username'}
+        params['limit'] = limit
+        payload = response_cache.get_or_compute(
+            'api_logs', params, lambda: build_api_logs(filters, cursor, limit)
+        )
+        
+        return JsonResponse(payload)
+
+    except User.DoesNotExist:
+        return JsonResponse({'error': 'User not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+def build_system_stats(days):
+    """Compute the system stats payload for the last `days` snapshots"""
+    stats = SystemStats.objects.all().order_by('-date')[:days]
+    
+    stats_data = [{
+        'date': stat.date.isoformat(),
+        'total_users': stat.total_users,
+        'active_users': stat.active_users,
+        'total_messages': stat.total_messages,
+        'total_groups': stat.total_groups,
+        'total_calls': stat.total_calls,
+        'total_statuses': stat.total_statuses,
+        'total_api_calls': stat.total_api_calls,
+        'revenue': float(stat.revenue)
+    } for stat in stats]
+    
+    # Current stats from the incrementally maintained counters
+    totals = counters.get_counters()
+    current_stats = {
+        'total_users': totals['users'],
+        'active_users': totals['online_users'],
+        'total_messages': totals['messages'],
+        'total_groups': totals['groups'],
+        'total_calls': totals['calls'],
+        'total_statuses': counters.active_statuses(),
+        'total_api_calls': totals['api_calls'],
+        'total_conversations': totals['conversations'],
+        'total_reactions': totals['reactions']
+    }
+    
+    return {
+        'success': True,
+        'stats': stats_data,
+        'current': current_stats
+    }
+
+
+class _Echo:
+    """File-like object whose write() just returns the value, for streaming csv.writer output"""
+    
+    def write(self, value):
+        return value
+
+
+def _stream_api_logs(rows, export_format):
+    columns = [name for name, _ in API_LOG_EXPORT_FIELDS]
+    
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+        return
+    
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), default=str) + '\n'
+
+
+@csrf_exempt
+def export_api_logs(request):
+    """Stream API logs matching the filters as NDJSON or CSV (admin only)"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        username = request.GET.get('username')
+        if not username:
+            return JsonResponse({'error': 'Username required'}, status=400)
+        
+        # Verify user is admin
+        user = user_cache.get_user(username)
         
-        if profile.role != 'admin':
+        if not authz.has_role(user.id, 'admin'):
             return JsonResponse({'error': 'Admin access required'}, status=403)
         
-        # Get recent API logs
-        limit = int(request.GET.get('limit', 50))
-        logs = APILog.objects.all().order_by('-created_at')[:limit]
-        
-        logs_data = [{
-            'id': log.id,
-            'endpoint': log.endpoint,
-            'method': log.method,
-            'user': log.user.username if log.user else 'Anonymous',
-            'status_code': log.status_code,
-            'response_time': log.response_time,
-            'ip_address': log.ip_address,
-            'created_at': log.created_at.isoformat()
-        } for log in logs]
+        export_format = request.GET.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return JsonResponse({'error': 'format must be ndjson or csv'}, status=400)
         
-        return JsonResponse({
-            'success': True,
-            'logs': logs_data,
-            'total': APILog.objects.count()
-        })
+        try:
+            filters = parse_log_filters(request.GET)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        # Server-side cursor: rows are fetched chunk by chunk as the response streams
+        rows = APILog.objects.filter(**filters).order_by('created_at', 'id').values_list(
+            *[lookup for _, lookup in API_LOG_EXPORT_FIELDS]
+        ).iterator(chunk_size=API_LOG_EXPORT_CHUNK)
+        
+        response = StreamingHttpResponse(
+            _stream_api_logs(rows, export_format),
+            content_type='text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        )
+        response['Content-Disposition'] = f'attachment; filename="api-logs.{export_format}"'
+        return response
         
     except User.DoesNotExist:
         return JsonResponse({'error': 'User not found'}, status=404)
@@ -74,47 +251,159 @@ def get_system_stats(request):
             return JsonResponse({'error': 'Username required'}, status=400)
         
         # Verify user is admin
-        user = User.objects.get(username=username)
-        profile = UserProfile.objects.get(user=user)
+        user = user_cache.get_user(username)
         
-        if profile.role != 'admin':
+        if not authz.has_role(user.id, 'admin'):
             return JsonResponse({'error': 'Admin access required'}, status=403)
         
         # Get recent system stats
         days = int(request.GET.get('days', 30))
-        stats = SystemStats.objects.all().order_by('-date')[:days]
-        
-        stats_data = [{
-            'date': stat.date.isoformat(),
-            'total_users': stat.total_users,
-            'active_users': stat.active_users,
-            'total_messages': stat.total_messages,
-            'total_groups': stat.total_groups,
-            'total_calls': stat.total_calls,
-            'total_statuses': stat.total_statuses,
-            'total_api_calls': stat.total_api_calls,
-            'revenue': float(stat.revenue)
-        } for stat in stats]
-        
-        # Calculate current stats
-        current_stats = {
-            'total_users': User.objects.count(),
-            'active_users': UserProfile.objects.filter(is_online=True).count(),
-            'total_messages': Message.objects.count(),
-            'total_groups': Group.objects.count(),
-            'total_calls': Call.objects.count(),
-            'total_statuses': Status.objects.filter(expires_at__gt=timezone.now()).count(),
-            'total_api_calls': APILog.objects.count(),
-            'total_conversations': Conversation.objects.count(),
-            'total_reactions': MessageReaction.objects.count()
+        payload = response_cache.get_or_compute(
+            'system_stats', {'days': days}, lambda: build_system_stats(days)
+        )
+        
+        return JsonResponse(payload)
+        
+    except User.DoesNotExist:
+        return JsonResponse({'error': 'User not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+LATENCY_MAX_HOURS = 24 * 31
+
+
+@csrf_exempt
+def get_latency_stats(request):
+    """Latency percentiles and error rates per endpoint and per hour"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        username = request.GET.get('username')
+        if not username:
+            return JsonResponse({'error': 'Username required'}, status=400)
+        
+        # Verify user is admin
+        user = user_cache.get_user(username)
+        
+        if not authz.has_role(user.id, 'admin'):
+            return JsonResponse({'error': 'Admin access required'}, status=403)
+        
+        try:
+            if request.GET.get('until'):
+                until = parse_datetime_param(request.GET['until'])
+            else:
+                # Windows ending "now" move every request; round up to the next minute so
+                # they share a cache entry and still include the latest requests
+                until = timezone.now().replace(second=0, microsecond=0) + timedelta(minutes=1)
+            if request.GET.get('since'):
+                since = parse_datetime_param(request.GET['since'])
+            else:
+                since = until - timedelta(hours=int(request.GET.get('hours', 24)))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        if since >= until:
+            return JsonResponse({'error': 'since must be before until'}, status=400)
+        if until - since > timedelta(hours=LATENCY_MAX_HOURS):
+            return JsonResponse({'error': f'Window is limited to {LATENCY_MAX_HOURS} hours'}, status=400)
+        
+        endpoint = request.GET.get('endpoint')
+        by_endpoint = request.GET.get('hourly_by_endpoint') in ('1', 'true')
+        params = {
+            'since': since.isoformat(), 'until': until.isoformat(),
+            'endpoint': endpoint, 'hourly_by_endpoint': by_endpoint,
         }
         
+        def build():
+            stats = latency.latency_stats(since, until, endpoint, hourly_by_endpoint=by_endpoint)
+            return {'since': since.isoformat(), 'until': until.isoformat(), **stats}
+        
+        return JsonResponse(response_cache.get_or_compute('latency_stats', params, build))
+    
+    except User.DoesNotExist:
+        return JsonResponse({'error': 'User not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+SERIES_MAX_BUCKETS = {'hour': 24 * 31, 'day': 366}
+SERIES_DEFAULT_BUCKETS = {'hour': 24, 'day': 30}
+
+
+@csrf_exempt
+def get_message_volume(request):
+    """Hourly or daily message volume and active senders, globally or per conversation/group/user"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        username = request.GET.get('username')
+        if not username:
+            return JsonResponse({'error': 'Username required'}, status=400)
+        
+        # Verify user is admin
+        user = user_cache.get_user(username)
+        
+        if not authz.has_role(user.id, 'admin'):
+            return JsonResponse({'error': 'Admin access required'}, status=403)
+        
+        scope = request.GET.get('scope', 'global')
+        resolution = request.GET.get('resolution', 'hour')
+        if scope not in dict(MessageVolumeSeries.SCOPES):
+            return JsonResponse({'error': 'Invalid scope'}, status=400)
+        if resolution not in timeseries.RESOLUTIONS:
+            return JsonResponse({'error': 'Invalid resolution'}, status=400)
+        
+        try:
+            scope_id = int(request.GET.get('id', 0))
+            buckets = int(request.GET.get('buckets', SERIES_DEFAULT_BUCKETS[resolution]))
+        except ValueError:
+            return JsonResponse({'error': 'id and buckets must be integers'}, status=400)
+        
+        if scope != 'global' and not scope_id:
+            return JsonResponse({'error': 'id required for this scope'}, status=400)
+        buckets = max(1, min(buckets, SERIES_MAX_BUCKETS[resolution]))
+        
         return JsonResponse({
-            'success': True,
-            'stats': stats_data,
-            'current': current_stats
+            'scope': scope,
+            'id': scope_id if scope != 'global' else None,
+            'resolution': resolution,
+            'series': timeseries.recent_series(scope, scope_id if scope != 'global' else 0, resolution, buckets)
         })
+    
+    except User.DoesNotExist:
+        return JsonResponse({'error': 'User not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+def get_cohort_retention(request):
+    """Weekly signup cohort retention, as of the last build_cohorts run"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        username = request.GET.get('username')
+        if not username:
+            return JsonResponse({'error': 'Username required'}, status=400)
+        
+        # Verify user is admin
+        user = user_cache.get_user(username)
         
+        if not authz.has_role(user.id, 'admin'):
+            return JsonResponse({'error': 'Admin access required'}, status=403)
+        
+        # Served from the stored report; only the very first request builds one
+        report = cohorts.latest() or cohorts.build()
+        
+        return JsonResponse({
+            'generated_at': report.generated_at.isoformat(),
+            **report.data
+        })
+    
     except User.DoesNotExist:
         return JsonResponse({'error': 'User not found'}, status=404)
     except Exception as e:
@@ -122,8 +411,39 @@ def get_system_stats(request):
 
 
 @csrf_exempt
-def get_message_reactions(request):
-    """Get message reactions for a user"""
+def get_heavy_hitters(request):
+    """Top client IPs, users and endpoints over the last few minutes, across all workers"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        username = request.GET.get('username')
+        if not username:
+            return JsonResponse({'error': 'Username required'}, status=400)
+        
+        # Verify user is admin
+        user = user_cache.get_user(username)
+        
+        if not authz.has_role(user.id, 'admin'):
+            return JsonResponse({'error': 'Admin access required'}, status=403)
+        
+        try:
+            minutes = int(request.GET.get('minutes', 5))
+            limit = min(int(request.GET.get('limit', 10)), 100)
+        except ValueError:
+            return JsonResponse({'error': 'minutes and limit must be integers'}, status=400)
+        
+        return JsonResponse(heavy_hitters.top(minutes=minutes, limit=limit))
+    
+    except User.DoesNotExist:
+        return JsonResponse({'error': 'User not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+def get_anomalies(request):
+    """Recent rate/latency anomaly alerts, plus this worker's running averages"""
     if request.method != 'GET':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
     
@@ -132,30 +452,163 @@ def get_message_reactions(request):
         if not username:
             return JsonResponse({'error': 'Username required'}, status=400)
         
-        user = User.objects.get(username=username)
+        # Verify user is admin
+        user = user_cache.get_user(username)
+        
+        if not authz.has_role(user.id, 'admin'):
+            return JsonResponse({'error': 'Admin access required'}, status=403)
+        
+        try:
+            limit, cursor = _page_params(request)
+            alerts = AnomalyAlert.objects.all()
+            if request.GET.get('since'):
+                alerts = alerts.filter(created_at__gte=parse_datetime_param(request.GET['since']))
+            if request.GET.get('endpoint'):
+                alerts = alerts.filter(endpoint=request.GET['endpoint'])
+            if request.GET.get('metric'):
+                alerts = alerts.filter(metric=request.GET['metric'])
+            rows, next_cursor = pagination.paginate(
+                alerts.values('id', 'endpoint', 'metric', 'value', 'expected', 'z_score', 'window_start', 'created_at'),
+                ['created_at', 'id'], cursor=cursor, limit=limit
+            )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        for row in rows:
+            row['window_start'] = row['window_start'].isoformat()
+            row['created_at'] = row['created_at'].isoformat()
+        
+        return JsonResponse({
+            'alerts': rows,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'baselines': anomaly.snapshot()
+        })
+    
+    except User.DoesNotExist:
+        return JsonResponse({'error': 'User not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+DETAIL_PAGE_MAX = 200
+AGGREGATE_TOP_MESSAGES = 20
+REACTION_EMOJIS = dict(MessageReaction.REACTION_TYPES)
+
+
+def _page_params(request):
+    """Parse limit/cursor for detail pages (raises ValueError on bad input)"""
+    limit = max(1, min(int(request.GET.get('limit', 50)), DETAIL_PAGE_MAX))
+    cursor = request.GET.get('cursor')
+    if cursor:
+        pagination.decode_cursor(cursor)
+    return limit, cursor
+
+
+def _days_param(request):
+    """Parse days for aggregate views (raises ValueError on bad input)"""
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        raise ValueError('days must be an integer')
+    if days < 1:
+        raise ValueError('days must be positive')
+    return days
+
+
+def _daily_counts(queryset, date_field, days):
+    since = timezone.now() - timedelta(days=days)
+    rows = queryset.filter(**{f'{date_field}__gte': since}).annotate(
+        day=TruncDate(date_field)
+    ).values('day').annotate(count=Count('id')).order_by('day')
+    return [{'date': row['day'].isoformat(), 'count': row['count']} for row in rows]
+
+
+def _activity_totals(user):
+    counts = UserActivity.objects.filter(user=user).values(
+        'reactions_received', 'status_views_received'
+    ).first()
+    return counts or {'reactions_received': 0, 'status_views_received': 0}
+
+
+@csrf_exempt
+def get_message_reactions(request):
+    """Get reactions received on a user's messages (mode=detail pages, mode=aggregate counts)"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        username = request.GET.get('username')
+        if not username:
+            return JsonResponse({'error': 'Username required'}, status=400)
         
-        # Get reactions on user's messages
-        user_messages = Message.objects.filter(sender=user)
-        reactions = MessageReaction.objects.filter(message__in=user_messages)
+        user = user_cache.get_user(username)
+        mode = request.GET.get('mode', 'detail')
+        
+        # Join through the message instead of an IN (subquery) over all of the user's messages
+        reactions = MessageReaction.objects.filter(message__sender=user)
+        
+        if mode == 'aggregate':
+            try:
+                days = _days_param(request)
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            by_type = reactions.values('reaction_type').annotate(count=Count('id')).order_by('-count')
+            by_message = reactions.values('message_id').annotate(
+                message_content=Substr('message__content', 1, 50),
+                count=Count('id')
+            ).order_by('-count', 'message_id')[:AGGREGATE_TOP_MESSAGES]
+            
+            return JsonResponse({
+                'success': True,
+                'total': _activity_totals(user)['reactions_received'],
+                'counts': [
+                    {**row, 'reaction_emoji': REACTION_EMOJIS.get(row['reaction_type'])}
+                    for row in by_type
+                ],
+                'by_message': [
+                    {**row, 'message_content': row['message_content'] or ''}
+                    for row in by_message
+                ],
+                'by_day': _daily_counts(reactions, 'created_at', days)
+            })
+        
+        if mode != 'detail':
+            return JsonResponse({'error': 'mode must be detail or aggregate'}, status=400)
+        
+        try:
+            limit, cursor = _page_params(request)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        # Related fields come back in the same query
+        rows = reactions.values(
+            'id', 'message_id', 'reaction_type', 'created_at',
+            reactor=F('user__username'),
+            message_content=Substr('message__content', 1, 50)
+        )
+        rows, next_cursor = pagination.paginate(rows, ['created_at', 'id'], cursor, limit)
         
         reactions_data = [{
-            'id': reaction.id,
-            'message_id': reaction.message.id,
-            'message_content': reaction.message.content[:50] if reaction.message.content else '',
-            'user': reaction.user.username,
-            'reaction_type': reaction.reaction_type,
-            'reaction_emoji': reaction.get_reaction_type_display(),
-            'created_at': reaction.created_at.isoformat()
-        } for reaction in reactions]
-        
-        # Group by reaction type
-        reaction_counts = reactions.values('reaction_type').annotate(count=Count('id'))
+            'id': row['id'],
+            'message_id': row['message_id'],
+            'message_content': row['message_content'] or '',
+            'user': row['reactor'],
+            'reaction_type': row['reaction_type'],
+            'reaction_emoji': REACTION_EMOJIS.get(row['reaction_type']),
+            'created_at': row['created_at'].isoformat()
+        } for row in rows]
+        
+        # Per-type counts, as before pagination
+        reaction_counts = reactions.values('reaction_type').annotate(count=Count('id')).order_by('reaction_type')
         
         return JsonResponse({
             'success': True,
             'reactions': reactions_data,
-            'total': reactions.count(),
-            'counts': list(reaction_counts)
+            'total': _activity_totals(user)['reactions_received'],
+            'counts': list(reaction_counts),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
         })
         
     except User.DoesNotExist:
@@ -166,7 +619,7 @@ def get_message_reactions(request):
 
 @csrf_exempt
 def get_status_views(request):
-    """Get status views for a user"""
+    """Get views on a user's statuses (mode=detail pages, mode=aggregate counts)"""
     if request.method != 'GET':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
     
@@ -175,29 +628,63 @@ def get_status_views(request):
         if not username:
             return JsonResponse({'error': 'Username required'}, status=400)
         
-        user = User.objects.get(username=username)
+        user = user_cache.get_user(username)
+        mode = request.GET.get('mode', 'detail')
         
-        # Get views on user's statuses
-        user_statuses = Status.objects.filter(user=user)
-        views = StatusView.objects.filter(status__in=user_statuses)
+        views = StatusView.objects.filter(status__user=user)
+        
+        if mode == 'aggregate':
+            try:
+                days = _days_param(request)
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            by_status = Status.objects.filter(user=user, view_count__gt=0).values(
+                'status_type', status_id=F('id'), count=F('view_count')
+            ).order_by('-view_count', 'id')
+            
+            return JsonResponse({
+                'success': True,
+                'total': _activity_totals(user)['status_views_received'],
+                'status_counts': list(by_status),
+                'by_day': _daily_counts(views, 'viewed_at', days)
+            })
+        
+        if mode != 'detail':
+            return JsonResponse({'error': 'mode must be detail or aggregate'}, status=400)
+        
+        try:
+            limit, cursor = _page_params(request)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        rows = views.values(
+            'id', 'status_id', 'viewed_at',
+            status_type=F('status__status_type'),
+            viewer=F('user__username'),
+            viewer_first_name=F('user__first_name'),
+            viewer_last_name=F('user__last_name')
+        )
+        rows, next_cursor = pagination.paginate(rows, ['viewed_at', 'id'], cursor, limit)
         
         views_data = [{
-            'id': view.id,
-            'status_id': view.status.id,
-            'status_type': view.status.status_type,
-            'viewer': view.user.username,
-            'viewer_name': view.user.get_full_name() or view.user.username,
-            'viewed_at': view.viewed_at.isoformat()
-        } for view in views]
+            'id': row['id'],
+            'status_id': row['status_id'],
+            'status_type': row['status_type'],
+            'viewer': row['viewer'],
+            'viewer_name': f"{row['viewer_first_name']} {row['viewer_last_name']}".strip() or row['viewer'],
+            'viewed_at': row['viewed_at'].isoformat()
+        } for row in rows]
         
-        # Group by status
-        status_view_counts = views.values('status__id').annotate(count=Count('id'))
+        # Per-status counts, as before pagination, from the stored view counts
+        status_view_counts = Status.objects.filter(user=user, view_count__gt=0).values_list('id', 'view_count')
         
         return JsonResponse({
             'success': True,
             'views': views_data,
-            'total': views.count(),
-            'status_counts': list(status_view_counts)
+            'total': _activity_totals(user)['status_views_received'],
+            'status_counts': [{'status__id': status_id, 'count': count} for status_id, count in status_view_counts],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
         })
         
     except User.DoesNotExist:
@@ -217,40 +704,38 @@ def get_user_analytics(request):
         if not username:
             return JsonResponse({'error': 'Username required'}, status=400)
         
-        user = User.objects.get(username=username)
-        profile = UserProfile.objects.get(user=user)
+        # Single-row read of the per-user counters (and profile)
+        try:
+            counts = UserActivity.objects.select_related('user__profile').get(user__username=username)
+        except UserActivity.DoesNotExist:
+            user = User.objects.get(username=username)
+            activity.rebuild(user_ids=[user.id])
+            counts = UserActivity.objects.select_related('user__profile').get(user=user)
+        
+        profile = counts.user.profile
+        today = activity.today_counts(counts)
         
-        # Calculate various metrics
         analytics = {
             # Basic stats
-            'total_contacts': Contact.objects.filter(user=user).count(),
-            'total_groups': Group.objects.filter(members=user).count(),
-            'total_conversations': Conversation.objects.filter(
-                Q(user1=user) | Q(user2=user)
-            ).count(),
+            'total_contacts': counts.contacts,
+            'total_groups': counts.groups,
+            'total_conversations': counts.conversations,
             
             # Messaging stats
-            'messages_sent': Message.objects.filter(sender=user).count(),
-            'messages_received': Message.objects.filter(receiver=user).count(),
-            'total_reactions_given': MessageReaction.objects.filter(user=user).count(),
-            'total_reactions_received': MessageReaction.objects.filter(
-                message__sender=user
-            ).count(),
+            'messages_sent': counts.messages_sent,
+            'messages_received': counts.messages_received,
+            'total_reactions_given': counts.reactions_given,
+            'total_reactions_received': counts.reactions_received,
             
             # Call stats
-            'calls_made': Call.objects.filter(caller=user).count(),
-            'calls_received': Call.objects.filter(receiver=user).count(),
-            'total_call_duration': Call.objects.filter(
-                Q(caller=user) | Q(receiver=user),
-                status='completed'
-            ).aggregate(total=Sum('duration'))['total'] or 0,
+            'calls_made': counts.calls_made,
+            'calls_received': counts.calls_received,
+            'total_call_duration': counts.call_duration,
             
             # Status stats
-            'statuses_posted': Status.objects.filter(user=user).count(),
-            'status_views_received': StatusView.objects.filter(
-                status__user=user
-            ).count(),
-            'statuses_viewed': StatusView.objects.filter(user=user).count(),
+            'statuses_posted': counts.statuses_posted,
+            'status_views_received': counts.status_views_received,
+            'statuses_viewed': counts.status_views_given,
             
             # Activity stats
             'is_online': profile.is_online,
@@ -258,24 +743,22 @@ def get_user_analytics(request):
             'joined_date': profile.joined_date.isoformat(),
             'total_messages': profile.total_messages,
             
-            # Recent activity
-            'messages_today': Message.objects.filter(
-                sender=user,
-                created_at__gte=timezone.now() - timedelta(days=1)
-            ).count(),
-            'calls_today': Call.objects.filter(
-                caller=user,
-                started_at__gte=timezone.now() - timedelta(days=1)
-            ).count(),
-            'statuses_today': Status.objects.filter(
-                user=user,
-                created_at__gte=timezone.now() - timedelta(days=1)
-            ).count()
+            # Today's activity
+            'messages_today': today['messages_today'],
+            'calls_today': today['calls_today'],
+            'statuses_today': today['statuses_today']
+        }
+        
+        # Messages sent per bucket, read from the precomputed series
+        activity_chart = {
+            'hourly': timeseries.recent_series('user', counts.user_id, 'hour', 24),
+            'daily': timeseries.recent_series('user', counts.user_id, 'day', 30)
         }
         
         return JsonResponse({
             'success': True,
-            'analytics': analytics
+            'analytics': analytics,
+            'activity_chart': activity_chart
         })
         
     except User.DoesNotExist:
@@ -297,7 +780,7 @@ def get_conversation_details(request):
         if not username or not conversation_id:
             return JsonResponse({'error': 'Username and conversation_id required'}, status=400)
         
-        user = User.objects.get(username=username)
+        user = user_cache.get_user(username)
         conversation = Conversation.objects.get(id=conversation_id)
         
         # Verify user is part of conversation
@@ -364,25 +847,14 @@ def update_system_stats(request):
             return JsonResponse({'error': 'Username required'}, status=400)
         
         # Verify user is admin
-        user = User.objects.get(username=username)
-        profile = UserProfile.objects.get(user=user)
+        user = user_cache.get_user(username)
         
-        if profile.role != 'admin':
+        if not authz.has_role(user.id, 'admin'):
             return JsonResponse({'error': 'Admin access required'}, status=403)
         
-        # Get or create today's stats
-        today = timezone.now().date()
-        stats, created = SystemStats.objects.get_or_create(date=today)
-        
-        # Update stats
-        stats.total_users = User.objects.count()
-        stats.active_users = UserProfile.objects.filter(is_online=True).count()
-        stats.total_messages = Message.objects.count()
-        stats.total_groups = Group.objects.count()
-        stats.total_calls = Call.objects.count()
-        stats.total_statuses = Status.objects.filter(expires_at__gt=timezone.now()).count()
-        stats.total_api_calls = APILog.objects.count()
-        stats.save()
+        # Snapshot today's stats from the counters
+        stats = counters.snapshot_system_stats()
+        response_cache.invalidate()
         
         return JsonResponse({
             'success': True,
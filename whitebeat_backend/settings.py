@@ -36,8 +36,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.TokenAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.HeavyHitterMiddleware',
 ]
 
 ROOT_URLCONF = 'whitebeat_backend.urls'
@@ -68,6 +70,14 @@ DATABASES = {
     }
 }
 
+# Cache (set CACHE_BACKEND/CACHE_LOCATION to a shared backend such as Redis in production)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='whitebeat'),
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -108,6 +118,7 @@ CORS_ALLOW_CREDENTIALS = True
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.SignedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -116,4 +127,67 @@ REST_FRAMEWORK = {
 }
 
 # OpenAI Configuration
-OPENAI_API_KEY = config('OPENAI_API_KEY', default='')
\ No newline at end of file
+OPENAI_API_KEY = config('OPENAI_API_KEY', default='')
+
+# Filtered count cache (health checks and admin dashboards); table totals come from the counters
+COUNT_CACHE_TTL = config('COUNT_CACHE_TTL', default=60, cast=int)
+COUNT_CACHE_BACKGROUND_REFRESH = config('COUNT_CACHE_BACKGROUND_REFRESH', default=True, cast=bool)
+# Table totals estimated from database statistics instead of the counters, e.g. "messages,api_logs"
+COUNT_CACHE_APPROXIMATE = [
+    name for name in config('COUNT_CACHE_APPROXIMATE', default='').split(',') if name
+]
+
+# Admin dashboard response cache (seconds)
+RESPONSE_CACHE_TTL = config('RESPONSE_CACHE_TTL', default=30, cast=int)
+RESPONSE_CACHE_STALE_TTL = config('RESPONSE_CACHE_STALE_TTL', default=300, cast=int)
+RESPONSE_CACHE_WAIT = config('RESPONSE_CACHE_WAIT', default=10, cast=int)
+
+# In-process write buffers are flushed on a timer in a background thread (and at exit); the tests turn this off
+BACKGROUND_FLUSH = config('BACKGROUND_FLUSH', default=True, cast=bool)
+
+# Seconds between writes of buffered message volume counts to the series rows
+MESSAGE_SERIES_FLUSH_INTERVAL = config('MESSAGE_SERIES_FLUSH_INTERVAL', default=5, cast=int)
+
+# Seconds between flushes of in-process active-user sketches to the database
+ACTIVE_USER_SKETCH_FLUSH_INTERVAL = config('ACTIVE_USER_SKETCH_FLUSH_INTERVAL', default=10, cast=int)
+
+# Heavy-hitter tracking: counters per summary, and seconds between publishes to the cache
+HEAVY_HITTERS_CAPACITY = config('HEAVY_HITTERS_CAPACITY', default=100, cast=int)
+HEAVY_HITTERS_FLUSH_INTERVAL = config('HEAVY_HITTERS_FLUSH_INTERVAL', default=5, cast=int)
+
+# Anomaly detection on per-minute request rate and latency
+ANOMALY_ALPHA = config('ANOMALY_ALPHA', default=0.1, cast=float)
+ANOMALY_Z_THRESHOLD = config('ANOMALY_Z_THRESHOLD', default=4.0, cast=float)
+ANOMALY_WARMUP_MINUTES = config('ANOMALY_WARMUP_MINUTES', default=10, cast=int)
+ANOMALY_COOLDOWN_MINUTES = config('ANOMALY_COOLDOWN_MINUTES', default=5, cast=int)
+
+# Signed bearer tokens issued by login: access token and refresh token lifetimes (seconds)
+ACCESS_TOKEN_TTL = config('ACCESS_TOKEN_TTL', default=900, cast=int)
+REFRESH_TOKEN_TTL = config('REFRESH_TOKEN_TTL', default=86400, cast=int)
+# Reject API requests that name a caller (username=, sender=, ...) without a valid bearer token
+REQUIRE_TOKEN_AUTH = config('REQUIRE_TOKEN_AUTH', default=False, cast=bool)
+
+# Sessions are read from the cache, falling back to the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Username -> user/profile cache: per-worker entries and seconds they are trusted, shared cache TTL
+USER_CACHE_SIZE = config('USER_CACHE_SIZE', default=10000, cast=int)
+USER_CACHE_LOCAL_TTL = config('USER_CACHE_LOCAL_TTL', default=30, cast=int)
+USER_CACHE_TTL = config('USER_CACHE_TTL', default=300, cast=int)
+
+# Users whose role and auth groups are kept in each worker's authorization cache, and seconds they are trusted
+AUTHZ_CACHE_SIZE = config('AUTHZ_CACHE_SIZE', default=10000, cast=int)
+AUTHZ_CACHE_LOCAL_TTL = config('AUTHZ_CACHE_LOCAL_TTL', default=30, cast=int)
+
+# Groups whose member and admin ids are kept in each worker's group membership cache, and seconds they are trusted
+GROUP_CACHE_SIZE = config('GROUP_CACHE_SIZE', default=10000, cast=int)
+GROUP_CACHE_LOCAL_TTL = config('GROUP_CACHE_LOCAL_TTL', default=30, cast=int)
+
+# Users whose contact/block lists are kept in each worker's contact graph cache, and seconds they are trusted
+CONTACT_GRAPH_CACHE_SIZE = config('CONTACT_GRAPH_CACHE_SIZE', default=10000, cast=int)
+CONTACT_GRAPH_CACHE_LOCAL_TTL = config('CONTACT_GRAPH_CACHE_LOCAL_TTL', default=30, cast=int)
+
+# Expired status reaper: minutes kept after expiry, maximum age in days (0 = no cap), statuses per batch
+STATUS_REAPER_GRACE_MINUTES = config('STATUS_REAPER_GRACE_MINUTES', default=60, cast=int)
+STATUS_REAPER_RETENTION_DAYS = config('STATUS_REAPER_RETENTION_DAYS', default=7, cast=int)
+STATUS_REAPER_BATCH_SIZE = config('STATUS_REAPER_BATCH_SIZE', default=1000, cast=int)